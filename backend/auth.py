@@ -3,12 +3,13 @@ from datetime import datetime, timedelta
 from typing import Optional
 from dotenv import load_dotenv
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 import database, models
 from repositories import user_repo
+from services import user_cache
+from services.password_hashing import pwd_context
 
 # Load environment variables
 load_dotenv()
@@ -21,15 +22,23 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+# Blocking bcrypt calls for scripts; request handlers use services.password_hashing
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def token_claims(user) -> dict:
+    """
+    Claims identifying a user in an access token. user_id and the auth version let
+    get_current_user authenticate from the user cache; bumping users.auth_version (password
+    change, deletion) revokes the user's tokens.
+    """
+    return {"sub": user.name, "uid": user.user_id, "ver": user.auth_version or 0}
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -53,8 +62,21 @@ async def get_current_user(db: Session = Depends(database.get_db), token: str =
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = user_repo.get_user_by_name(db, name=username)
+
+    user_id = payload.get("uid")
+    if user_id is None:
+        # Tokens issued before user_id claims: look the user up by name
+        user = user_repo.get_user_by_name(db, name=username)
+        if user is None:
+            raise credentials_exception
+        return user
+
+    user = user_cache.get(user_id)
     if user is None:
+        db_user = user_repo.get_user_by_id(db, user_id)
+        if db_user is None:
+            raise credentials_exception
+        user = user_cache.put(db_user)
+    if user.auth_version != payload.get("ver"):
         raise credentials_exception
     return user
@@ -40,3 +40,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def dialect_insert(db):
+    """INSERT construct of the session's dialect (both support ON CONFLICT ... DO UPDATE)."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
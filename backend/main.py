@@ -3,8 +3,7 @@ import os
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request, Response, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from routers import auth as auth_router, purchases, ocr, payments, categories, mapping, projects, search, analytics # RENAMED to avoid conflict
+from routers import auth as auth_router, images, purchases, ocr, payments, categories, mapping, projects, search, analytics # RENAMED to avoid conflict
 import storage
 import database, models, auth # FIXED missing import
 from sqlalchemy.orm import Session
@@ -47,6 +46,8 @@ async def preflight_handler(request: Request, rest_of_path: str):
     return response
 
 app.include_router(auth_router.router, prefix="/api")
+# Before purchases, whose /purchases/{purchase_id} routes would shadow image paths
+app.include_router(images.router, prefix="/api")
 app.include_router(purchases.router, prefix="/api")
 app.include_router(ocr.router, prefix="/api")
 app.include_router(payments.router, prefix="/api")
@@ -56,16 +57,35 @@ app.include_router(projects.router, prefix="/api")
 app.include_router(search.router, prefix="/api")
 app.include_router(analytics.router, prefix="/api")
 
+@app.on_event("startup")
+async def start_background_jobs():
+    from services import mapping_service, ocr_queue, ocr_service, image_variants, image_store, image_archive
+    # Built once: request handlers share the storage (and its connection pool)
+    storage.init_storage()
+    mapping_service.start_background_jobs()
+    image_store.start_gc()
+    ocr_service.start_client()
+    ocr_queue.start_workers()
+    image_variants.start_worker()
+    image_archive.start_worker()
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    from services import ocr_queue, ocr_service, image_preprocessing, local_ocr, image_variants, image_archive, password_hashing
+    await ocr_queue.stop_workers()
+    await image_variants.stop_worker()
+    await image_archive.stop_worker()
+    await ocr_service.close_client()
+    image_preprocessing.shutdown()
+    local_ocr.shutdown()
+    password_hashing.shutdown()
+    storage.close_storage()
+
 @app.get("/api/purchases/users/all")
 async def get_all_users_for_purchases(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
     from repositories import user_repo
     return user_repo.get_all_users(db)
 
-# Mount static files directory for receipt images
-# This needs to be done after routers, but before the catch-all for OPTIONS if that exists
-image_storage = storage.get_storage()
-app.mount("/api/purchases/images", StaticFiles(directory=image_storage.base_path), name="purchase_images")
-
 @app.get("/")
 async def health_check():
     return {"status": "ok", "message": "Moneyflow API is running on port 8002"}
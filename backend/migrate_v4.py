@@ -0,0 +1,79 @@
+import sys
+import os
+from sqlalchemy import text, inspect
+
+# Ensure the app directory is in the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import engine
+
+def run_migration():
+    print("Starting Migration V4 (Counted Friendly Names)...")
+    
+    inspector = inspect(engine)
+    
+    with engine.connect() as connection:
+        # 1. Add 'hits' to 'friendly_names' if missing
+        columns_friendly = [c['name'] for c in inspector.get_columns('friendly_names')]
+        if 'hits' not in columns_friendly:
+            print("Adding 'hits' column to friendly_names table...")
+            try:
+                connection.execute(text("ALTER TABLE friendly_names ADD COLUMN hits INTEGER DEFAULT 1 NOT NULL"))
+                connection.commit()
+                print("Successfully added 'hits' column.")
+            except Exception as e:
+                print(f"Error adding hits: {e}")
+        else:
+            print("'hits' column already exists.")
+
+        # 2. Compact duplicate (user_id, substring, friendly_name) rows into the oldest row.
+        #    Rows without a user are left alone: the unique index treats NULLs as distinct,
+        #    and their hits would not be summed by the = comparison.
+        print("Compacting duplicate friendly name rows...")
+        try:
+            connection.execute(text("""
+                UPDATE friendly_names SET hits = (
+                    SELECT SUM(f2.hits) FROM friendly_names f2
+                    WHERE f2.user_id = friendly_names.user_id
+                      AND f2.substring = friendly_names.substring
+                      AND f2.friendly_name = friendly_names.friendly_name
+                )
+                WHERE user_id IS NOT NULL AND friendly_name_id IN (
+                    SELECT MIN(friendly_name_id) FROM friendly_names
+                    GROUP BY user_id, substring, friendly_name
+                    HAVING COUNT(*) > 1
+                )
+            """))
+            result = connection.execute(text("""
+                DELETE FROM friendly_names WHERE user_id IS NOT NULL AND friendly_name_id NOT IN (
+                    SELECT keep_id FROM (
+                        SELECT MIN(friendly_name_id) AS keep_id FROM friendly_names
+                        GROUP BY user_id, substring, friendly_name
+                    ) AS keepers
+                )
+            """))
+            connection.commit()
+            print(f"Removed {result.rowcount} duplicate rows.")
+        except Exception as e:
+            print(f"Error compacting friendly_names: {e}")
+
+        # 3. Enforce uniqueness (required by the ON CONFLICT upsert in set_friendly_name)
+        indexes = [i['name'] for i in inspector.get_indexes('friendly_names')]
+        if 'uq_friendly_names_user_substring_name' not in indexes:
+            print("Creating unique index on friendly_names (user_id, substring, friendly_name)...")
+            try:
+                connection.execute(text(
+                    "CREATE UNIQUE INDEX uq_friendly_names_user_substring_name "
+                    "ON friendly_names (user_id, substring, friendly_name)"
+                ))
+                connection.commit()
+                print("Successfully created unique index.")
+            except Exception as e:
+                print(f"Error creating unique index: {e}")
+        else:
+            print("Unique index already exists.")
+
+    print("Migration V4 completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
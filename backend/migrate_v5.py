@@ -0,0 +1,65 @@
+import sys
+import os
+from sqlalchemy import text, inspect
+
+# Ensure the app directory is in the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import engine
+from db_base import Base
+import models
+
+def _add_column(connection, table, column, ddl):
+    print(f"Adding '{column}' column to {table} table...")
+    try:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        connection.commit()
+        print(f"Successfully added '{column}' column.")
+    except Exception as e:
+        print(f"Error adding {column}: {e}")
+
+def run_migration():
+    print("Starting Migration V5 (Bulk Receipt Scanning)...")
+
+    # 1. New tables (ocr_batches, and ocr_jobs / ocr_results on older databases)
+    Base.metadata.create_all(bind=engine)
+
+    inspector = inspect(engine)
+
+    with engine.connect() as connection:
+        # 2. Draft flag on purchases
+        columns_purchases = [c['name'] for c in inspector.get_columns('purchases')]
+        if 'is_draft' not in columns_purchases:
+            _add_column(connection, 'purchases', 'is_draft', "BOOLEAN DEFAULT FALSE NOT NULL")
+            try:
+                connection.execute(text("CREATE INDEX ix_purchases_is_draft ON purchases (is_draft)"))
+                connection.commit()
+            except Exception as e:
+                print(f"Error creating is_draft index: {e}")
+        else:
+            print("'is_draft' column already exists.")
+
+        # 3. Batch fields on ocr_jobs
+        columns_jobs = [c['name'] for c in inspector.get_columns('ocr_jobs')]
+        for column, ddl in [
+            ('attempts', "INTEGER DEFAULT 0 NOT NULL"),
+            ('batch_id', "INTEGER REFERENCES ocr_batches(batch_id) ON DELETE CASCADE"),
+            ('label', "VARCHAR(255)"),
+            ('purchase_id', "INTEGER REFERENCES purchases(purchase_id) ON DELETE SET NULL"),
+        ]:
+            if column not in columns_jobs:
+                _add_column(connection, 'ocr_jobs', column, ddl)
+            else:
+                print(f"'{column}' column already exists.")
+
+        if 'ix_ocr_jobs_batch_id' not in [i['name'] for i in inspector.get_indexes('ocr_jobs')]:
+            try:
+                connection.execute(text("CREATE INDEX ix_ocr_jobs_batch_id ON ocr_jobs (batch_id)"))
+                connection.commit()
+            except Exception as e:
+                print(f"Error creating batch_id index: {e}")
+
+    print("Migration V5 completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,72 @@
+import sys
+import os
+import hashlib
+import io
+from collections import Counter
+
+# Ensure the app directory is in the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import engine, SessionLocal
+from db_base import Base
+import models
+from storage import get_storage, content_name, file_extension, is_content_name, variant_name
+from services import image_variants
+
+def _move_to_content_name(store, file_name, renamed):
+    """Moves a legacy file (purchase_<id>_<name>, project_img_..., ocr_job_...) to its content name."""
+    if file_name in renamed:
+        return renamed[file_name]
+    if is_content_name(file_name) or not store.exists(file_name):
+        renamed[file_name] = file_name
+        return file_name
+
+    content = store.read_file(file_name)
+    new_name = content_name(hashlib.sha256(content).hexdigest(), file_extension(file_name))
+    if not store.exists(new_name):
+        store.upload_fileobj(io.BytesIO(content), new_name)
+    store.delete_file(file_name)
+    for name in image_variants.sizes():
+        store.delete_file(variant_name(file_name, name))
+    renamed[file_name] = new_name
+    return new_name
+
+def run_migration():
+    print("Starting Migration V6 (Content-Addressed Image Storage)...")
+
+    # 1. stored_files table
+    Base.metadata.create_all(bind=engine)
+
+    store = get_storage()
+    db = SessionLocal()
+    try:
+        # 2. Rename stored images to their content hash (duplicates collapse into one file)
+        renamed = {}
+        for image in db.query(models.ReceiptImage).all():
+            image.file_path = _move_to_content_name(store, image.file_path, renamed)
+        for project in db.query(models.Project).filter(models.Project.image_path.isnot(None)).all():
+            project.image_path = _move_to_content_name(store, project.image_path, renamed)
+        for job in db.query(models.OcrJob).filter(models.OcrJob.status != "done").all():
+            job.images = [dict(img, file_path=_move_to_content_name(store, img["file_path"], renamed)) for img in job.images]
+        db.commit()
+        moved = sum(1 for old, new in renamed.items() if old != new)
+        print(f"Renamed {moved} of {len(renamed)} stored images; {len(renamed) - len(set(renamed.values()))} duplicates merged.")
+
+        # 3. Reference counts from the rows using each file
+        counts = Counter(image.file_path for image in db.query(models.ReceiptImage))
+        counts.update(p.image_path for p in db.query(models.Project).filter(models.Project.image_path.isnot(None)))
+        for job in db.query(models.OcrJob).filter(models.OcrJob.status != "done"):
+            counts.update(img["file_path"] for img in job.images)
+        db.query(models.StoredFile).delete()
+        for file_name, ref_count in counts.items():
+            size = len(store.read_file(file_name)) if store.exists(file_name) else 0
+            db.add(models.StoredFile(file_name=file_name, size_bytes=size, ref_count=ref_count))
+        db.commit()
+        print(f"Registered {len(counts)} stored files. Unreferenced files are removed by the image GC.")
+    finally:
+        db.close()
+
+    print("Migration V6 completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
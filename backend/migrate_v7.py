@@ -0,0 +1,46 @@
+import sys
+import os
+from sqlalchemy import text, inspect
+
+# Ensure the app directory is in the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import engine
+
+def _add_column(connection, table, column, ddl):
+    print(f"Adding '{column}' column to {table} table...")
+    try:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        connection.commit()
+        print(f"Successfully added '{column}' column.")
+    except Exception as e:
+        print(f"Error adding {column}: {e}")
+
+def run_migration():
+    print("Starting Migration V7 (Receipt Image Archival)...")
+
+    inspector = inspect(engine)
+
+    with engine.connect() as connection:
+        # Archival state of receipt images (services/image_archive.py)
+        columns = [c['name'] for c in inspector.get_columns('receipt_images')]
+        for column, ddl in [
+            ('archived_at', "TIMESTAMP"),
+            ('original_path', "TEXT"),
+        ]:
+            if column not in columns:
+                _add_column(connection, 'receipt_images', column, ddl)
+            else:
+                print(f"'{column}' column already exists.")
+
+        if 'ix_receipt_images_archived_at' not in [i['name'] for i in inspector.get_indexes('receipt_images')]:
+            try:
+                connection.execute(text("CREATE INDEX ix_receipt_images_archived_at ON receipt_images (archived_at)"))
+                connection.commit()
+            except Exception as e:
+                print(f"Error creating archived_at index: {e}")
+
+    print("Migration V7 completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
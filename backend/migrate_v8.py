@@ -0,0 +1,32 @@
+import sys
+import os
+from sqlalchemy import text, inspect
+
+# Ensure the app directory is in the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import engine
+
+def run_migration():
+    print("Starting Migration V8 (Token Auth Versions)...")
+
+    inspector = inspect(engine)
+    columns = [c['name'] for c in inspector.get_columns('users')]
+
+    with engine.connect() as connection:
+        # Auth version claim of access tokens; bumped to revoke a user's tokens
+        if 'auth_version' not in columns:
+            print("Adding 'auth_version' column to users table...")
+            try:
+                connection.execute(text("ALTER TABLE users ADD COLUMN auth_version INTEGER DEFAULT 0 NOT NULL"))
+                connection.commit()
+                print("Successfully added 'auth_version' column.")
+            except Exception as e:
+                print(f"Error adding auth_version: {e}")
+        else:
+            print("'auth_version' column already exists.")
+
+    print("Migration V8 completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
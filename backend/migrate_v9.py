@@ -0,0 +1,25 @@
+import sys
+import os
+from sqlalchemy import inspect
+
+# Ensure the app directory is in the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import engine
+import models
+
+def run_migration():
+    print("Starting Migration V9 (Refresh Tokens)...")
+
+    # Hashed, rotating refresh tokens for /auth/refresh
+    if 'refresh_tokens' not in inspect(engine).get_table_names():
+        print("Creating 'refresh_tokens' table...")
+        models.RefreshToken.__table__.create(bind=engine)
+        print("Successfully created 'refresh_tokens' table.")
+    else:
+        print("'refresh_tokens' table already exists.")
+
+    print("Migration V9 completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
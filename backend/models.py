@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, DateTime, Text, Numeric, JSON
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, DateTime, Text, Numeric, JSON, Index, Float
 from sqlalchemy.orm import relationship
 from db_base import Base
 import datetime
@@ -12,6 +12,7 @@ class User(Base):
     is_dummy = Column(Boolean, default=False, nullable=False) # For removed project participants
     default_tax_rate = Column(Numeric(5, 2), default=0.00)
     common_tax_rates = Column(String(255), default="0,20") # Comma-separated list
+    auth_version = Column(Integer, default=0, nullable=False) # Claim in access tokens; bumped to revoke them
 
     # Relationships
     created_purchases = relationship("Purchase", back_populates="creator", foreign_keys="[Purchase.creator_user_id]")
@@ -23,6 +24,7 @@ class User(Base):
     logs = relationship("PurchaseLog", back_populates="user", cascade="all, delete-orphan")
     projects = relationship("ProjectParticipant", back_populates="user", cascade="all, delete-orphan")
     saved_filters = relationship("SavedFilter", back_populates="user", cascade="all, delete-orphan")
+    refresh_tokens = relationship("RefreshToken", cascade="all, delete-orphan")
 
 class Project(Base):
     __tablename__ = "projects"
@@ -71,6 +73,7 @@ class Purchase(Base):
     purchase_date = Column(Date, nullable=False)
     tax_is_added = Column(Boolean, default=False)
     discount_is_applied = Column(Boolean, default=False)
+    is_draft = Column(Boolean, default=False, nullable=False, index=True) # Created by a bulk scan, not yet reviewed
 
     # Relationships
     project = relationship("Project", back_populates="purchases")
@@ -136,10 +139,25 @@ class FriendlyName(Base):
     user_id = Column(Integer, ForeignKey("users.user_id"))
     substring = Column(Text, nullable=False)
     friendly_name = Column(Text, nullable=False)
+    hits = Column(Integer, default=1, nullable=False) # How often the user confirmed this mapping
+
+    __table_args__ = (
+        Index("uq_friendly_names_user_substring_name", "user_id", "substring", "friendly_name", unique=True),
+    )
 
     # Relationships
     user = relationship("User", back_populates="friendly_names")
 
+class FriendlyNameConsensus(Base):
+    """Materialized global winner per substring across all users' friendly_names rows."""
+    __tablename__ = "friendly_name_consensus"
+    substring = Column(Text, primary_key=True)
+    friendly_name = Column(Text, nullable=False)
+    hits = Column(Integer, nullable=False) # Summed hits of the winning friendly name
+    confidence = Column(Float, nullable=False) # Winner's share of all hits for this substring
+    is_tie = Column(Boolean, default=False, nullable=False)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
 class CategoryMapping(Base):
     __tablename__ = "category_mappings"
     mapping_id = Column(Integer, primary_key=True, index=True)
@@ -159,6 +177,17 @@ class PasswordResetToken(Base):
     token_hash = Column(String(255), unique=True, nullable=False)
     expires_at = Column(DateTime, nullable=False)
 
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    token_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, nullable=False) # SHA-256 of the token sent to the client
+    family_id = Column(String(32), nullable=False, index=True) # Shared by the tokens rotated from one login
+    auth_version = Column(Integer, nullable=False) # users.auth_version when issued
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    used_at = Column(DateTime) # Set when rotated; presenting it again revokes the family
+
 class ReceiptImage(Base):
     __tablename__ = "receipt_images"
     image_id = Column(Integer, primary_key=True, index=True)
@@ -166,10 +195,88 @@ class ReceiptImage(Base):
     file_path = Column(Text, nullable=False) # Local or relative path
     original_filename = Column(String(255))
     uploaded_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # Archival (services/image_archive.py): file_path then names the compact copy; the
+    # original is kept (and referenced) until storage.archive.keep_originals_days pass
+    archived_at = Column(DateTime, index=True)
+    original_path = Column(Text)
 
     # Relationships
     purchase = relationship("Purchase", back_populates="images")
 
+class StoredFile(Base):
+    """A content-addressed file in the image storage and the number of rows referencing it."""
+    __tablename__ = "stored_files"
+    file_name = Column(String(255), primary_key=True) # storage.content_name: <sha256 shards>/<sha256><ext>
+    size_bytes = Column(Integer, nullable=False, default=0)
+    ref_count = Column(Integer, nullable=False, default=0) # Receipt images, project images and OCR jobs
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    unreferenced_since = Column(DateTime, index=True) # Set while ref_count is 0; the GC deletes after a grace period
+
+class OcrBatch(Base):
+    """A bulk scan: many receipts (one OCR job each) that become draft purchases in a project."""
+    __tablename__ = "ocr_batches"
+    batch_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.project_id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    jobs = relationship("OcrJob", back_populates="batch", order_by="OcrJob.job_id")
+
+class OcrJob(Base):
+    __tablename__ = "ocr_jobs"
+    job_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
+    status = Column(String(20), nullable=False, default="queued", index=True) # queued, processing, done, failed
+    images = Column(JSON, nullable=False) # [{"file_path": ..., "content_type": ..., "filename": ...}]
+    result = Column(JSON)
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    # Bulk scans only: the batch, the receipt's label and the draft purchase it produced
+    batch_id = Column(Integer, ForeignKey("ocr_batches.batch_id", ondelete="CASCADE"), nullable=True, index=True)
+    label = Column(String(255))
+    purchase_id = Column(Integer, ForeignKey("purchases.purchase_id", ondelete="SET NULL"), nullable=True)
+
+    batch = relationship("OcrBatch", back_populates="jobs")
+
+class OcrResult(Base):
+    """Vision AI result cache, keyed by the SHA-256 of the scanned images."""
+    __tablename__ = "ocr_results"
+    cache_key = Column(String(64), primary_key=True) # SHA-256 over the sorted image hashes
+    image_hashes = Column(JSON, nullable=False)
+    model = Column(String(50), nullable=False)
+    raw_response = Column(Text, nullable=False)
+    items = Column(JSON, nullable=False) # Parsed items, before name/category mapping
+    size_bytes = Column(Integer, nullable=False, default=0)
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+    last_used_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+
+class OcrScanMetric(Base):
+    """Timings, sizes and token usage of one scan, kept for capacity planning (ocr.metrics)."""
+    __tablename__ = "ocr_scan_metrics"
+    metric_id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer) # No foreign key: jobs are purged long before their metrics
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="SET NULL"), nullable=True)
+    source = Column(String(20), nullable=False) # job, stream
+    status = Column(String(20), nullable=False) # done, partial, failed
+    engine = Column(String(50))
+    images = Column(Integer, nullable=False, default=0)
+    image_bytes = Column(Integer, nullable=False, default=0)
+    upload_bytes = Column(Integer, nullable=False, default=0) # base64 payload sent to the Vision AI
+    model_requests = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    cost = Column(Float, nullable=False, default=0.0) # Estimate from ocr.metrics pricing
+    cache_hit = Column(Boolean, nullable=False, default=False)
+    queue_ms = Column(Float) # Jobs: time from upload to a worker picking them up
+    total_ms = Column(Float, nullable=False)
+    timings = Column(JSON) # {"read_ms": ..., "model_ms": ..., "mapping_ms": ...}
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+
 class Payment(Base):
     __tablename__ = "payments"
     payment_id = Column(Integer, primary_key=True, index=True)
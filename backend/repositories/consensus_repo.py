@@ -0,0 +1,106 @@
+import sys
+import os
+import datetime
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Ensure the parent directory is in the path so we can import models/database etc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import models
+from database import dialect_insert
+
+# Keep IN lists comfortably below the bind-parameter limits
+CHUNK_SIZE = 500
+
+def _aggregated_hits(db: Session, substrings: Optional[List[str]] = None):
+    query = db.query(
+        models.FriendlyName.substring, models.FriendlyName.friendly_name, func.sum(models.FriendlyName.hits)
+    ).filter(models.FriendlyName.user_id.isnot(None))
+    if substrings is not None:
+        query = query.filter(models.FriendlyName.substring.in_(substrings))
+    return query.group_by(models.FriendlyName.substring, models.FriendlyName.friendly_name).all()
+
+def _consensus_rows(aggregated) -> Dict[str, Dict]:
+    """Picks the winning friendly name per substring from (substring, friendly_name, hits) rows."""
+    per_substring = defaultdict(Counter)
+    for substring, friendly_name, hits in aggregated:
+        per_substring[substring][friendly_name] += int(hits or 0)
+
+    now = datetime.datetime.utcnow()
+    rows = {}
+    for substring, counts in per_substring.items():
+        top = counts.most_common(2)
+        total = sum(counts.values())
+        rows[substring] = {
+            "substring": substring,
+            "friendly_name": top[0][0],
+            "hits": top[0][1],
+            "confidence": top[0][1] / total if total else 0.0,
+            "is_tie": len(top) > 1 and top[0][1] == top[1][1],
+            "updated_at": now
+        }
+    return rows
+
+def _upsert(db: Session, rows: List[Dict]):
+    if not rows:
+        return
+    insert = dialect_insert(db)
+    stmt = insert(models.FriendlyNameConsensus).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["substring"],
+        set_={
+            "friendly_name": stmt.excluded.friendly_name,
+            "hits": stmt.excluded.hits,
+            "confidence": stmt.excluded.confidence,
+            "is_tie": stmt.excluded.is_tie,
+            "updated_at": stmt.excluded.updated_at
+        }
+    )
+    db.execute(stmt)
+
+def rebuild_consensus(db: Session) -> Dict[str, Dict]:
+    """Recomputes the whole consensus table from friendly_names."""
+    rows = _consensus_rows(_aggregated_hits(db))
+    db.query(models.FriendlyNameConsensus).delete()
+    values = list(rows.values())
+    for i in range(0, len(values), CHUNK_SIZE):
+        _upsert(db, values[i:i + CHUNK_SIZE])
+    db.commit()
+    return rows
+
+def refresh_consensus(db: Session, substrings: Iterable[str]) -> Dict[str, Optional[Dict]]:
+    """
+    Recomputes the consensus rows of the given substrings only.
+    Returns the new row per substring (None if no mapping is left for it).
+    """
+    substrings = list(dict.fromkeys(substrings))
+    result = {}
+    for i in range(0, len(substrings), CHUNK_SIZE):
+        chunk = substrings[i:i + CHUNK_SIZE]
+        rows = _consensus_rows(_aggregated_hits(db, chunk))
+        _upsert(db, list(rows.values()))
+
+        gone = [sub for sub in chunk if sub not in rows]
+        if gone:
+            db.query(models.FriendlyNameConsensus).filter(
+                models.FriendlyNameConsensus.substring.in_(gone)
+            ).delete(synchronize_session=False)
+
+        for sub in chunk:
+            result[sub] = rows.get(sub)
+    db.commit()
+    return result
+
+def count_consensus(db: Session) -> int:
+    return db.query(func.count(models.FriendlyNameConsensus.substring)).scalar() or 0
+
+def get_consensus_winners(db: Session) -> List[Tuple[str, str, int]]:
+    """(substring, friendly_name, hits) of every substring with a clear winner."""
+    return db.query(
+        models.FriendlyNameConsensus.substring,
+        models.FriendlyNameConsensus.friendly_name,
+        models.FriendlyNameConsensus.hits
+    ).filter(models.FriendlyNameConsensus.is_tie == False).all()
@@ -0,0 +1,101 @@
+import sys
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+# Ensure the parent directory is in the path so we can import models/database etc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import models
+from database import dialect_insert
+
+def get_result(db: Session, cache_key: str, ttl_hours: float, engines: Optional[List[str]] = None):
+    """
+    Returns the cached result for cache_key (and marks it as used), or None if
+    missing/expired or produced by an engine not in engines.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=ttl_hours)
+    query = db.query(models.OcrResult).filter(
+        models.OcrResult.cache_key == cache_key,
+        models.OcrResult.created_at >= cutoff
+    )
+    if engines is not None:
+        query = query.filter(models.OcrResult.model.in_(engines))
+    result = query.first()
+    if result is None:
+        return None
+
+    result.hit_count = (result.hit_count or 0) + 1
+    result.last_used_at = datetime.utcnow()
+    db.commit()
+    return result
+
+def store_result(db: Session, cache_key: str, image_hashes: List[str], model: str, raw_response: str, items: List[Dict]):
+    now = datetime.utcnow()
+    insert = dialect_insert(db)
+    stmt = insert(models.OcrResult).values(
+        cache_key=cache_key,
+        image_hashes=image_hashes,
+        model=model,
+        raw_response=raw_response,
+        items=items,
+        size_bytes=len(raw_response.encode("utf-8")),
+        hit_count=0,
+        created_at=now,
+        last_used_at=now
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["cache_key"],
+        set_={
+            "model": stmt.excluded.model,
+            "raw_response": stmt.excluded.raw_response,
+            "items": stmt.excluded["items"],
+            "size_bytes": stmt.excluded.size_bytes,
+            "created_at": stmt.excluded.created_at,
+            "last_used_at": stmt.excluded.last_used_at
+        }
+    )
+    db.execute(stmt)
+    db.commit()
+
+def get_all_results(db: Session):
+    return db.query(models.OcrResult).order_by(models.OcrResult.created_at).all()
+
+def update_items(db: Session, cache_key: str, items: List[Dict]):
+    db.query(models.OcrResult).filter(models.OcrResult.cache_key == cache_key).update(
+        {"items": items}, synchronize_session=False
+    )
+    db.commit()
+
+def evict_results(db: Session, ttl_hours: float, max_entries: int, max_bytes: Optional[int] = None) -> int:
+    """
+    Deletes expired results, then the least recently used ones until at most
+    max_entries results and max_bytes of raw responses remain.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=ttl_hours)
+    deleted = db.query(models.OcrResult).filter(
+        models.OcrResult.created_at < cutoff
+    ).delete(synchronize_session=False)
+
+    count, total_bytes = db.query(func.count(models.OcrResult.cache_key), func.sum(models.OcrResult.size_bytes)).one()
+    total_bytes = total_bytes or 0
+    if count > max_entries or (max_bytes is not None and total_bytes > max_bytes):
+        evict = []
+        rows = db.query(models.OcrResult.cache_key, models.OcrResult.size_bytes).order_by(
+            models.OcrResult.last_used_at
+        ).all()
+        for cache_key, size_bytes in rows:
+            if count <= max_entries and (max_bytes is None or total_bytes <= max_bytes):
+                break
+            evict.append(cache_key)
+            count -= 1
+            total_bytes -= size_bytes or 0
+        if evict:
+            deleted += db.query(models.OcrResult).filter(
+                models.OcrResult.cache_key.in_(evict)
+            ).delete(synchronize_session=False)
+
+    db.commit()
+    return deleted
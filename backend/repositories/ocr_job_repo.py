@@ -0,0 +1,142 @@
+import sys
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+# Ensure the parent directory is in the path so we can import models/database etc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import case
+from sqlalchemy.orm import Session
+import models
+from repositories import stored_file_repo
+
+STATUS_QUEUED = "queued"
+STATUS_PROCESSING = "processing"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+def create_job(db: Session, user_id: int, images: List[Dict], batch_id: int = None, label: str = None, commit: bool = True):
+    db_job = models.OcrJob(
+        user_id=user_id, status=STATUS_QUEUED, images=images, created_at=datetime.utcnow(),
+        batch_id=batch_id, label=label
+    )
+    db.add(db_job)
+    # Released when the job is done (drafts acquire their own) or purged after failing
+    stored_file_repo.acquire(db, [img["file_path"] for img in images], commit=False)
+    if commit:
+        db.commit()
+        db.refresh(db_job)
+    return db_job
+
+def get_job(db: Session, job_id: int):
+    return db.query(models.OcrJob).filter(models.OcrJob.job_id == job_id).first()
+
+def create_batch(db: Session, user_id: int, project_id: int):
+    db_batch = models.OcrBatch(user_id=user_id, project_id=project_id, created_at=datetime.utcnow())
+    db.add(db_batch)
+    db.flush()
+    return db_batch
+
+def get_batch(db: Session, batch_id: int):
+    return db.query(models.OcrBatch).filter(models.OcrBatch.batch_id == batch_id).first()
+
+def claim_next_job(db: Session, max_batch_jobs: Optional[int] = None):
+    """
+    Atomically moves the next queued job to 'processing' and returns it.
+    Single scans go before bulk-scan jobs (someone is waiting for them), and at most
+    max_batch_jobs bulk-scan jobs are processed at a time, so a large batch never
+    occupies every worker. The status condition in the UPDATE makes concurrent claims
+    (other workers or processes) safe: only one of them changes the row.
+    """
+    while True:
+        query = db.query(models.OcrJob.job_id).filter(models.OcrJob.status == STATUS_QUEUED)
+        if max_batch_jobs is not None:
+            running = db.query(models.OcrJob).filter(
+                models.OcrJob.status == STATUS_PROCESSING,
+                models.OcrJob.batch_id.isnot(None)
+            ).count()
+            if running >= max_batch_jobs:
+                query = query.filter(models.OcrJob.batch_id.is_(None))
+
+        candidate = query.order_by(
+            case((models.OcrJob.batch_id.is_(None), 0), else_=1), models.OcrJob.job_id
+        ).first()
+        if candidate is None:
+            return None
+
+        claimed = db.query(models.OcrJob).filter(
+            models.OcrJob.job_id == candidate.job_id,
+            models.OcrJob.status == STATUS_QUEUED
+        ).update(
+            {"status": STATUS_PROCESSING, "started_at": datetime.utcnow(), "attempts": models.OcrJob.attempts + 1},
+            synchronize_session=False
+        )
+        db.commit()
+        if claimed:
+            return get_job(db, candidate.job_id)
+
+def complete_job(db: Session, job_id: int, result: Dict, purchase_id: int = None):
+    values = {"status": STATUS_DONE, "result": result, "error": None, "finished_at": datetime.utcnow()}
+    if purchase_id is not None:
+        values["purchase_id"] = purchase_id
+    db.query(models.OcrJob).filter(models.OcrJob.job_id == job_id).update(values, synchronize_session=False)
+    db.commit()
+
+def fail_job(db: Session, job_id: int, error: str):
+    db.query(models.OcrJob).filter(models.OcrJob.job_id == job_id).update(
+        {"status": STATUS_FAILED, "error": error, "finished_at": datetime.utcnow()}, synchronize_session=False
+    )
+    db.commit()
+
+def retry_job(db: Session, job_id: int) -> bool:
+    """Puts a failed job back into the queue; False if it is not (or no longer) failed."""
+    count = db.query(models.OcrJob).filter(
+        models.OcrJob.job_id == job_id,
+        models.OcrJob.status == STATUS_FAILED
+    ).update(
+        {"status": STATUS_QUEUED, "error": None, "started_at": None, "finished_at": None},
+        synchronize_session=False
+    )
+    db.commit()
+    return bool(count)
+
+def requeue_stale_jobs(db: Session, timeout_seconds: int) -> int:
+    """Puts jobs whose worker died mid-processing back into the queue."""
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout_seconds)
+    count = db.query(models.OcrJob).filter(
+        models.OcrJob.status == STATUS_PROCESSING,
+        models.OcrJob.started_at < cutoff
+    ).update({"status": STATUS_QUEUED, "started_at": None}, synchronize_session=False)
+    db.commit()
+    return count
+
+def requeue_job(db: Session, job_id: int) -> bool:
+    """Puts a job back into the queue if it is still processing (e.g. its worker was stopped)."""
+    count = db.query(models.OcrJob).filter(
+        models.OcrJob.job_id == job_id,
+        models.OcrJob.status == STATUS_PROCESSING
+    ).update({"status": STATUS_QUEUED, "started_at": None}, synchronize_session=False)
+    db.commit()
+    return count > 0
+
+def get_expired_failed_jobs(db: Session, older_than_hours: int):
+    """Failed jobs that delete_finished_jobs will purge (their images are kept for retries until then)."""
+    cutoff = datetime.utcnow() - timedelta(hours=older_than_hours)
+    return db.query(models.OcrJob).filter(
+        models.OcrJob.status == STATUS_FAILED,
+        models.OcrJob.finished_at < cutoff
+    ).all()
+
+def delete_finished_jobs(db: Session, older_than_hours: int) -> int:
+    cutoff = datetime.utcnow() - timedelta(hours=older_than_hours)
+    count = db.query(models.OcrJob).filter(
+        models.OcrJob.status.in_([STATUS_DONE, STATUS_FAILED]),
+        models.OcrJob.finished_at < cutoff
+    ).delete(synchronize_session=False)
+    # Batches whose receipts are all purged
+    db.query(models.OcrBatch).filter(
+        ~db.query(models.OcrJob).filter(models.OcrJob.batch_id == models.OcrBatch.batch_id).exists()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return count
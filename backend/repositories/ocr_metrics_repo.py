@@ -0,0 +1,33 @@
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Ensure the parent directory is in the path so we can import models/database etc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import Session
+import models
+
+def create_record(db: Session, **fields):
+    db_record = models.OcrScanMetric(created_at=datetime.utcnow(), **fields)
+    db.add(db_record)
+    db.commit()
+    return db_record
+
+def get_records_since(db: Session, since: datetime):
+    return db.query(models.OcrScanMetric).filter(
+        models.OcrScanMetric.created_at >= since
+    ).order_by(models.OcrScanMetric.metric_id).all()
+
+def get_record_for_job(db: Session, job_id: int):
+    return db.query(models.OcrScanMetric).filter(
+        models.OcrScanMetric.job_id == job_id
+    ).order_by(models.OcrScanMetric.metric_id.desc()).first()
+
+def delete_old_records(db: Session, older_than_days: float) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    count = db.query(models.OcrScanMetric).filter(
+        models.OcrScanMetric.created_at < cutoff
+    ).delete(synchronize_session=False)
+    db.commit()
+    return count
@@ -74,7 +74,8 @@ def get_money_flow_balances(db: Session, user_id: int = None, project_id: int =
     # 1. Process Purchases (Items)
     # If calculating for a specific project, we don't filter items by user participation record
     # because we want to see debts of removed users too.
-    item_query = db.query(models.Item).join(models.Purchase)
+    # Draft purchases (unreviewed bulk scans) do not create debts until they are saved
+    item_query = db.query(models.Item).join(models.Purchase).filter(models.Purchase.is_draft == False)
     
     if project_id:
         item_query = item_query.filter(models.Purchase.project_id == project_id)
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 import models
+from repositories import stored_file_repo
 import datetime
 import uuid
 
@@ -12,6 +13,7 @@ def create_project(db: Session, name: str, description: str, image_path: str, cr
         created_by_user_id=creator_id
     )
     db.add(new_project)
+    stored_file_repo.acquire(db, [image_path], commit=False)
     db.commit()
     db.refresh(new_project)
     
@@ -39,6 +41,8 @@ def update_project(db: Session, project_id: int, name: str = None, description:
         if description is not None:
             project.description = description
         if image_path is not None:
+            stored_file_repo.acquire(db, [image_path], commit=False)
+            stored_file_repo.release(db, [project.image_path], commit=False)
             project.image_path = image_path
         db.commit()
         db.refresh(project)
@@ -78,6 +82,11 @@ def delete_project(db: Session, project_id: int):
     # Use object-based deletion to trigger SQLAlchemy cascades
     project = get_project_by_id(db, project_id)
     if project:
+        # Purchases (and their receipt images) are deleted by the cascade
+        stored_file_repo.release(
+            db, [project.image_path] + [name for p in project.purchases for img in p.images
+                                        for name in (img.file_path, img.original_path)], commit=False
+        )
         db.delete(project)
         db.commit()
 
@@ -86,7 +95,8 @@ def get_project_stats(db: Session, project_id: int):
     total = db.query(func.sum(
         (models.Item.price * models.Item.quantity) - models.Item.discount
     )).join(models.Purchase).filter(
-        models.Purchase.project_id == project_id
+        models.Purchase.project_id == project_id,
+        models.Purchase.is_draft == False
     ).scalar() or 0.0
     
     return {"total_spending": float(total)}
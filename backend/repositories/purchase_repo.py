@@ -9,6 +9,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from sqlalchemy.orm import Session
 import models
+from repositories import stored_file_repo
 
 def create_purchase(db: Session, creator_user_id: int, payer_user_id: int, 
                     purchase_name: str, purchase_date, 
@@ -28,6 +29,52 @@ def create_purchase(db: Session, creator_user_id: int, payer_user_id: int,
     db.refresh(db_purchase)
     return db_purchase
 
+def create_draft_purchase(db: Session, creator_user_id: int, project_id: int, purchase_name: str, purchase_date,
+                          items: list, contributor_ids: list, images: list, tax_rate: float = 0.0,
+                          commit: bool = True):
+    """
+    Creates a draft purchase from scanned receipt items (already mapped to friendly names
+    and categories) in one transaction: the creator is the payer, every item is shared by
+    contributor_ids, and images ({"file_path", "filename"}) become its receipt images.
+    Drafts do not count towards balances or statistics until they are saved. With
+    commit=False the purchase is only flushed, for callers committing it with other changes.
+    """
+    db_purchase = models.Purchase(
+        creator_user_id=creator_user_id,
+        payer_user_id=creator_user_id,
+        purchase_name=purchase_name,
+        purchase_date=purchase_date,
+        project_id=project_id,
+        is_draft=True
+    )
+    for item in items:
+        db_item = models.Item(
+            original_name=item["extracted_name"],
+            friendly_name=item.get("friendly_name"),
+            quantity=item.get("quantity", 1),
+            price=item.get("price", 0.0),
+            discount=item.get("discount", 0.0),
+            tax_rate=tax_rate,
+            category_level_1=item.get("category_level_1"),
+            category_level_2=item.get("category_level_2"),
+            category_level_3=item.get("category_level_3")
+        )
+        db_item.contributors = [models.Contributor(user_id=user_id) for user_id in contributor_ids]
+        db_purchase.items.append(db_item)
+    for image in images:
+        db_purchase.images.append(models.ReceiptImage(file_path=image["file_path"], original_filename=image.get("filename")))
+    stored_file_repo.acquire(db, [image["file_path"] for image in images], commit=False)
+    db_purchase.logs.append(models.PurchaseLog(
+        user_id=creator_user_id, log_message="Draft created from bulk receipt scan", timestamp=datetime.utcnow()
+    ))
+    db.add(db_purchase)
+    if commit:
+        db.commit()
+        db.refresh(db_purchase)
+    else:
+        db.flush()
+    return db_purchase
+
 def get_purchase_by_id(db: Session, purchase_id: int):
     return db.query(models.Purchase).filter(models.Purchase.purchase_id == purchase_id).first()
 
@@ -40,6 +87,7 @@ def update_purchase(db: Session, purchase_id: int, purchase_name: str, purchase_
         db_purchase.payer_user_id = payer_user_id
         db_purchase.tax_is_added = tax_is_added
         db_purchase.discount_is_applied = discount_is_applied
+        db_purchase.is_draft = False # Saving a draft confirms it
         db.commit()
         db.refresh(db_purchase)
     return db_purchase
@@ -54,6 +102,10 @@ def delete_purchase(db: Session, purchase_id: int):
             db.delete(item)
         # Delete logs
         db.query(models.PurchaseLog).filter(models.PurchaseLog.purchase_id == purchase_id).delete()
+        # Receipt images go with the purchase (cascade); their files once nothing else uses them
+        stored_file_repo.release(
+            db, [name for img in db_purchase.images for name in (img.file_path, img.original_path)], commit=False
+        )
         db.delete(db_purchase)
         db.commit()
         return True
@@ -66,6 +118,7 @@ def create_receipt_image(db: Session, purchase_id: int, file_path: str, original
         original_filename=original_filename
     )
     db.add(db_image)
+    stored_file_repo.acquire(db, [file_path], commit=False)
     db.commit()
     db.refresh(db_image)
     return db_image
@@ -163,10 +216,11 @@ def get_analytics_data(db: Session, user_id: int,
     query = db.query(models.Purchase).distinct().join(models.Item, isouter=True)
     query = query.join(models.Project).join(models.ProjectParticipant)
     
-    # Filter by user participation (must be active)
+    # Filter by user participation (must be active); drafts are not spending yet
     query = query.filter(
         models.ProjectParticipant.user_id == user_id,
-        models.ProjectParticipant.is_active == True
+        models.ProjectParticipant.is_active == True,
+        models.Purchase.is_draft == False
     )
     
     if project_ids:
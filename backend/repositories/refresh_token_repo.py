@@ -0,0 +1,59 @@
+import sys
+import os
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+# Ensure the parent directory is in the path so we can import models/database etc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import Session
+import models
+
+def hash_token(token: str) -> str:
+    # Tokens are 256 random bits, a plain SHA-256 is enough (no bcrypt needed)
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def create_token(db: Session, user, lifetime: timedelta, family_id: Optional[str] = None) -> Tuple[str, models.RefreshToken]:
+    """Stores a new refresh token (a new family unless family_id is given) and returns the plain token with its row."""
+    token = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    db_token = models.RefreshToken(
+        user_id=user.user_id,
+        token_hash=hash_token(token),
+        family_id=family_id or uuid.uuid4().hex,
+        auth_version=user.auth_version or 0,
+        created_at=now,
+        expires_at=now + lifetime
+    )
+    db.add(db_token)
+    db.commit()
+    return token, db_token
+
+def get_token(db: Session, token: str) -> Optional[models.RefreshToken]:
+    return db.query(models.RefreshToken).filter(models.RefreshToken.token_hash == hash_token(token)).first()
+
+def mark_used(db: Session, token_id: int) -> bool:
+    """Marks the token as rotated. False if another request already did (concurrent refresh)."""
+    count = db.query(models.RefreshToken).filter(
+        models.RefreshToken.token_id == token_id,
+        models.RefreshToken.used_at.is_(None)
+    ).update({models.RefreshToken.used_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return count == 1
+
+def revoke_family(db: Session, family_id: str) -> int:
+    count = db.query(models.RefreshToken).filter(
+        models.RefreshToken.family_id == family_id
+    ).delete(synchronize_session="fetch")
+    db.commit()
+    return count
+
+def delete_expired_tokens(db: Session) -> int:
+    count = db.query(models.RefreshToken).filter(
+        models.RefreshToken.expires_at < datetime.utcnow()
+    ).delete(synchronize_session="fetch")
+    db.commit()
+    return count
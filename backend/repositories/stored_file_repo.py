@@ -0,0 +1,132 @@
+import sys
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+# Ensure the parent directory is in the path so we can import models/database etc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import case
+from sqlalchemy.orm import Session
+import models
+from database import dialect_insert
+
+# Reference counts are changed with single statements (ref_count = ref_count + n), never
+# read and written back: uploads run concurrently in separate sessions, and a lost
+# increment would let the GC delete a file that is still referenced.
+
+def _insert_missing(db: Session, file_name: str, now: datetime):
+    insert = dialect_insert(db)
+    stmt = insert(models.StoredFile).values(
+        file_name=file_name, size_bytes=0, ref_count=0, created_at=now, unreferenced_since=now
+    )
+    db.execute(stmt.on_conflict_do_nothing(index_elements=["file_name"]))
+
+def register_file(db: Session, file_name: str, size_bytes: int):
+    """
+    Registers a just-stored file. Unreferenced files restart their grace period, so the GC
+    does not delete a file between its upload and the row that will reference it.
+    """
+    now = datetime.utcnow()
+    _insert_missing(db, file_name, now)
+    db.query(models.StoredFile).filter(models.StoredFile.file_name == file_name).update({
+        models.StoredFile.size_bytes: size_bytes,
+        models.StoredFile.unreferenced_since: case(
+            (models.StoredFile.ref_count == 0, now), else_=models.StoredFile.unreferenced_since
+        )
+    }, synchronize_session="fetch")
+    db.commit()
+    return get_file(db, file_name)
+
+def acquire(db: Session, file_names: Iterable[str], commit: bool = True):
+    """Adds one reference per name (names may repeat)."""
+    now = datetime.utcnow()
+    for file_name, count in Counter(name for name in file_names if name).items():
+        _insert_missing(db, file_name, now)
+        db.query(models.StoredFile).filter(models.StoredFile.file_name == file_name).update({
+            models.StoredFile.ref_count: models.StoredFile.ref_count + count,
+            models.StoredFile.unreferenced_since: None
+        }, synchronize_session="fetch")
+    if commit:
+        db.commit()
+
+def release(db: Session, file_names: Iterable[str], commit: bool = True):
+    """Drops one reference per name; files left without references become collectable."""
+    now = datetime.utcnow()
+    for file_name, count in Counter(name for name in file_names if name).items():
+        # Both values are computed from the row before the update
+        released = models.StoredFile.ref_count <= count
+        db.query(models.StoredFile).filter(models.StoredFile.file_name == file_name).update({
+            models.StoredFile.ref_count: case((released, 0), else_=models.StoredFile.ref_count - count),
+            models.StoredFile.unreferenced_since: case((released, now), else_=models.StoredFile.unreferenced_since)
+        }, synchronize_session="fetch")
+    if commit:
+        db.commit()
+
+def get_file(db: Session, file_name: str) -> Optional[models.StoredFile]:
+    return db.query(models.StoredFile).filter(models.StoredFile.file_name == file_name).first()
+
+def get_unreferenced(db: Session, before: datetime) -> List[str]:
+    return [row.file_name for row in db.query(models.StoredFile.file_name).filter(
+        models.StoredFile.ref_count == 0,
+        models.StoredFile.unreferenced_since < before
+    )]
+
+def delete_unreferenced(db: Session, file_name: str, before: datetime) -> bool:
+    """Deletes the row if it is still unreferenced (not committed: the caller removes the file first)."""
+    return db.query(models.StoredFile).filter(
+        models.StoredFile.file_name == file_name,
+        models.StoredFile.ref_count == 0,
+        models.StoredFile.unreferenced_since < before
+    ).delete(synchronize_session=False) > 0
+
+def get_file_names(db: Session) -> set:
+    return {row.file_name for row in db.query(models.StoredFile.file_name)}
+
+def get_project_usage(db: Session, project_ids: Optional[List[int]] = None) -> Dict[int, Dict]:
+    """
+    Storage used per project: receipt images (current files, and originals still kept after
+    archival) and the project image. A file shared by several images counts once per project.
+    """
+    rows = db.query(
+        models.Purchase.project_id, models.ReceiptImage.file_path, models.ReceiptImage.original_path
+    ).join(models.ReceiptImage, models.ReceiptImage.purchase_id == models.Purchase.purchase_id)
+    projects = db.query(models.Project.project_id, models.Project.image_path)
+    if project_ids is not None:
+        rows = rows.filter(models.Purchase.project_id.in_(project_ids))
+        projects = projects.filter(models.Project.project_id.in_(project_ids))
+
+    usage = {}
+    files, originals = {}, {}
+    for project in projects:
+        usage[project.project_id] = {"images": 0}
+        files[project.project_id] = {project.image_path} - {None}
+        originals[project.project_id] = set()
+    for row in rows:
+        if row.project_id not in usage:
+            continue
+        usage[row.project_id]["images"] += 1
+        files[row.project_id].add(row.file_path)
+        if row.original_path:
+            originals[row.project_id].add(row.original_path)
+
+    names = set().union(*files.values(), *originals.values()) if usage else set()
+    sizes = {row.file_name: row.size_bytes for row in db.query(models.StoredFile.file_name, models.StoredFile.size_bytes)
+             .filter(models.StoredFile.file_name.in_(names))} if names else {}
+    for project_id, entry in usage.items():
+        entry["files"] = len(files[project_id])
+        entry["bytes"] = sum(sizes.get(name, 0) for name in files[project_id])
+        entry["originals"] = len(originals[project_id] - files[project_id])
+        entry["original_bytes"] = sum(sizes.get(name, 0) for name in originals[project_id] - files[project_id])
+    return usage
+
+def get_referenced_names(db: Session) -> set:
+    """Names used by receipt images, project images and OCR jobs that still hold their images."""
+    names = set()
+    for row in db.query(models.ReceiptImage.file_path, models.ReceiptImage.original_path):
+        names |= {row.file_path, row.original_path} - {None}
+    names |= {row.image_path for row in db.query(models.Project.image_path).filter(models.Project.image_path.isnot(None))}
+    for job in db.query(models.OcrJob.images).filter(models.OcrJob.status != "done"):
+        names |= {img["file_path"] for img in job.images or []}
+    return names
@@ -6,6 +6,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from sqlalchemy.orm import Session
 import models
+from services import user_cache
 
 def create_user(db: Session, name: str, password_hash: str):
     db_user = models.User(name=name, password_hash=password_hash)
@@ -29,14 +30,19 @@ def set_administrator_rights(db: Session, user_id: int, is_admin: bool):
         user.administrator = is_admin
         db.commit()
         db.refresh(user)
+        user_cache.invalidate(user_id)
     return user
 
 def update_user_password(db: Session, user_id: int, new_password_hash: str):
     user = get_user_by_id(db, user_id)
     if user:
         user.password_hash = new_password_hash
+        # Tokens issued before the change stop working
+        user.auth_version = (user.auth_version or 0) + 1
+        _delete_refresh_tokens(db, user_id)
         db.commit()
         db.refresh(user)
+        user_cache.invalidate(user_id)
         return True
     return False
 
@@ -46,6 +52,7 @@ def update_user_name(db: Session, user_id: int, new_name: str):
         user.name = new_name
         db.commit()
         db.refresh(user)
+        user_cache.invalidate(user_id)
         return True
     return False
 
@@ -56,9 +63,15 @@ def update_user_tax_settings(db: Session, user_id: int, default_tax_rate: float,
         user.common_tax_rates = common_tax_rates
         db.commit()
         db.refresh(user)
+        user_cache.invalidate(user_id)
         return True
     return False
 
+def _delete_refresh_tokens(db: Session, user_id: int):
+    db.query(models.RefreshToken).filter(
+        models.RefreshToken.user_id == user_id
+    ).delete(synchronize_session="fetch")
+
 def _has_dependencies(db: Session, user_id: int) -> bool:
     # Check if user has historical financial data (payer, creator, or contributor)
     has_purchases = db.query(models.Purchase).filter(
@@ -93,17 +106,21 @@ def delete_user(db: Session, user_id: int):
         user.password_hash = "DELETED"
         user.is_dummy = True
         user.administrator = False
+        user.auth_version = (user.auth_version or 0) + 1
+        _delete_refresh_tokens(db, user_id)
         
         # Cascades in models.py will handle:
         # - Categories, FriendlyNames, CategoryMappings, PurchaseLogs, ProjectParticipants, SavedFilters
         
         db.commit()
         db.refresh(user)
+        user_cache.invalidate(user_id)
         return user
     else:
         # Truly no shared data, safe to hard delete
         db.delete(user)
         db.commit()
+        user_cache.invalidate(user_id)
         return None
 
 def cleanup_unreferenced_dummy_users(db: Session) -> int:
@@ -121,5 +138,6 @@ def cleanup_unreferenced_dummy_users(db: Session) -> int:
             
     if deleted_count > 0:
         db.commit()
+        user_cache.invalidate()
         
     return deleted_count
@@ -1,11 +1,12 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 import auth, database, models
-from repositories import user_repo
+from repositories import refresh_token_repo, user_repo
+from services import password_hashing, user_cache
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -35,21 +36,101 @@ class TaxSettingsUpdate(BaseModel):
     default_tax_rate: float
     common_tax_rates: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+def _hashing_busy(e: password_hashing.HashingBusyError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+async def _verify_password(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return await password_hashing.verify(plain_password, hashed_password)
+    except password_hashing.HashingBusyError as e:
+        raise _hashing_busy(e)
+
+async def _hash_password(password: str) -> str:
+    try:
+        return await password_hashing.hash(password)
+    except password_hashing.HashingBusyError as e:
+        raise _hashing_busy(e)
+
+def _auth_config() -> Dict:
+    return (database.config or {}).get("auth") or {}
+
+def _issue_tokens(db: Session, user, family_id: Optional[str] = None) -> Dict:
+    """
+    A new access token and refresh token for the user. The refresh token continues the
+    given family (rotation) or starts a new one (login, password change).
+    """
+    access_token = auth.create_access_token(
+        data=auth.token_claims(user), expires_delta=timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    lifetime = timedelta(days=float(_auth_config().get("refresh_token_days", 30)))
+    refresh_token, _ = refresh_token_repo.create_token(db, user, lifetime, family_id=family_id)
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": auth.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "refresh_token": refresh_token
+    }
+
+def _refresh_rejected(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
 @router.post("/token")
 async def login_for_access_token(db: Session = Depends(database.get_db), form_data: OAuth2PasswordRequestForm = Depends()):
     user = user_repo.get_user_by_name(db, name=form_data.username)
-    if not user or not auth.verify_password(form_data.password, user.password_hash):
+    if not user or not await _verify_password(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Account not known, not validated, or wrong password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = auth.create_access_token(
-        data={"sub": user.name}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+
+    refresh_token_repo.delete_expired_tokens(db)
+    return _issue_tokens(db, user)
+
+@router.post("/refresh")
+async def refresh_access_token(data: RefreshRequest, db: Session = Depends(database.get_db)):
+    """
+    Exchanges a refresh token for a new access token and a new refresh token. Needs only a
+    SHA-256 lookup, so clients renew their session without the password (and bcrypt).
+    """
+    token = refresh_token_repo.get_token(db, data.refresh_token)
+    if token is None or token.expires_at < datetime.utcnow():
+        raise _refresh_rejected("Session expired, please log in again")
+
+    if token.used_at is not None or not refresh_token_repo.mark_used(db, token.token_id):
+        used_at = token.used_at or datetime.utcnow()
+        grace = float(_auth_config().get("refresh_reuse_grace_seconds", 30))
+        if datetime.utcnow() - used_at > timedelta(seconds=grace):
+            # An old token came back: it was copied, so end the session everywhere
+            print(f"DEBUG: Reused refresh token of user {token.user_id}, revoking its session")
+            refresh_token_repo.revoke_family(db, token.family_id)
+        # Otherwise another request (e.g. a second tab) just rotated it
+        raise _refresh_rejected("Refresh token already used")
+
+    user = user_cache.get(token.user_id)
+    if user is None:
+        db_user = user_repo.get_user_by_id(db, token.user_id)
+        user = user_cache.put(db_user) if db_user is not None else None
+    if user is None or (user.auth_version or 0) != token.auth_version:
+        refresh_token_repo.revoke_family(db, token.family_id)
+        raise _refresh_rejected("Session expired, please log in again")
+
+    return _issue_tokens(db, user, family_id=token.family_id)
+
+@router.post("/logout")
+async def logout(data: RefreshRequest, db: Session = Depends(database.get_db)):
+    """Revokes the session of the refresh token (the access token expires on its own)."""
+    token = refresh_token_repo.get_token(db, data.refresh_token)
+    if token is not None:
+        refresh_token_repo.revoke_family(db, token.family_id)
+    return {"status": "success"}
 
 @router.get("/me")
 async def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
@@ -61,6 +142,13 @@ async def read_users_me(current_user: models.User = Depends(auth.get_current_use
         "common_tax_rates": current_user.common_tax_rates
     }
 
+@router.get("/metrics")
+async def get_auth_metrics(current_user: models.User = Depends(auth.get_current_user)):
+    """Password hashing pool figures of this process: calls, rejections, wait and compute times."""
+    if not current_user.administrator:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return password_hashing.snapshot()
+
 @router.get("/users", response_model=List[UserResponse])
 async def list_users(
     db: Session = Depends(database.get_db),
@@ -103,6 +191,10 @@ async def delete_user(
         raise HTTPException(status_code=404, detail="User not found")
 
     result = user_repo.delete_user(db, user_id=user_id)
+    # The user's mapping rows are gone (cascade), drop them from the in-memory lookups
+    from services import mapping_service
+    mapping_service.invalidate_friendly_name_cache(user_id)
+    mapping_service.invalidate_category_cache(user_id)
     if result is None:
         return {"status": "deleted"}
     else:
@@ -126,16 +218,19 @@ async def change_password(
     current_user: models.User = Depends(auth.get_current_user)
 ):
     # 1. Verify current password
-    if not auth.verify_password(data.current_password, current_user.password_hash):
+    if not await _verify_password(data.current_password, current_user.password_hash):
         raise HTTPException(status_code=400, detail="Incorrect current password")
     
-    # 2. Update to new password
+    # 2. Update to new password (revokes the user's tokens)
     success = user_repo.update_user_password(
         db, 
         user_id=current_user.user_id, 
-        new_password_hash=auth.get_password_hash(data.new_password)
+        new_password_hash=await _hash_password(data.new_password)
     )
-    return {"status": "success"}
+
+    # 3. Tokens for this session, valid with the new auth version
+    user = user_repo.get_user_by_id(db, current_user.user_id)
+    return {"status": "success", **_issue_tokens(db, user)}
 
 @router.post("/update-name")
 async def update_name(
@@ -152,9 +247,8 @@ async def update_name(
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
         
-    # Since the JWT is based on the username, the user will need to re-login 
-    # to get a new valid token with the correct 'sub' claim.
-    return {"status": "success", "message": "Name updated. please re-login."}
+    # Tokens identify the user by user_id, so they stay valid after the rename
+    return {"status": "success", "message": "Name updated."}
 
 @router.post("/tax-settings")
 async def update_tax_settings(
@@ -188,7 +282,7 @@ async def create_user(
     user = user_repo.create_user(
         db, 
         name=user_in.name, 
-        password_hash=auth.get_password_hash(user_in.password)
+        password_hash=await _hash_password(user_in.password)
     )
     return user
 
@@ -205,7 +299,7 @@ async def admin_override_password(
     success = user_repo.update_user_password(
         db, 
         user_id=user_id, 
-        new_password_hash=auth.get_password_hash(data.new_password)
+        new_password_hash=await _hash_password(data.new_password)
     )
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
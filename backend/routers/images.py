@@ -0,0 +1,72 @@
+import sys
+import os
+import mimetypes
+from typing import Dict, Optional
+from urllib.parse import quote
+
+# Ensure the parent directory is in the path so we can import models/database etc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+import storage
+
+# Serves locally stored images. Access is checked here (the signature of URLs handed out by
+# the API, see LocalStorage.get_file_url); with storage.local.serve 'x-accel' the file itself
+# is sent by nginx (X-Accel-Redirect to an internal location), so no worker time goes into
+# streaming bytes. Content-addressed files never change, so they are cached for good.
+router = APIRouter(prefix="/purchases/images", tags=["images"])
+
+IMMUTABLE = "private, max-age=31536000, immutable"
+
+def _content_etag(file_name: str) -> Optional[str]:
+    """ETag derived from the content hash in a file name (None for legacy names)."""
+    if storage.is_content_name(file_name):
+        return f'"{os.path.splitext(os.path.basename(file_name))[0]}"'
+    parts = file_name.split("/", 2)
+    if len(parts) == 3 and parts[0] == storage.VARIANTS_DIR:
+        original = os.path.splitext(parts[2])[0]
+        if storage.is_content_name(original):
+            return f'"{os.path.splitext(os.path.basename(original))[0]}-{parts[1]}"'
+    return None
+
+def _cache_headers(file_name: str, path: str) -> Dict[str, str]:
+    etag = _content_etag(file_name)
+    if etag is not None:
+        return {"ETag": etag, "Cache-Control": IMMUTABLE}
+    # Files stored before content addressing can be replaced under the same name
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return {"ETag": f'W/"{int(stat.st_mtime)}-{stat.st_size}"', "Cache-Control": "private, no-cache"}
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+@router.get("/{file_name:path}")
+async def get_image(file_name: str, request: Request, expires: Optional[int] = None, signature: Optional[str] = None):
+    store = storage.get_storage()
+    path = store.file_path(file_name) if isinstance(store, storage.LocalStorage) else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    if not store.verify_file_url(file_name, expires, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired image URL")
+
+    headers = _cache_headers(file_name, path)
+    # Revalidations are answered without touching the disk
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    if store.serve == "x-accel":
+        headers["X-Accel-Redirect"] = store.accel_prefix + quote(file_name)
+        media_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+        return Response(headers=headers, media_type=media_type)
+
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(path, headers=headers)
@@ -4,6 +4,7 @@ import database
 import auth
 from services import mapping_service
 from pydantic import BaseModel
+from typing import List
 
 router = APIRouter(prefix="/mapping", tags=["mapping"])
 
@@ -14,6 +15,9 @@ class MappingRequest(BaseModel):
 class LookupRequest(BaseModel):
     name: str
 
+class ResolveRequest(BaseModel):
+    names: List[str]
+
 @router.post("/set")
 async def set_mapping(req: MappingRequest, db: Session = Depends(database.get_db), current_user = Depends(auth.get_current_user)):
     mapping_service.set_friendly_name(db, req.original_name, req.friendly_name, current_user.user_id)
@@ -23,3 +27,13 @@ async def set_mapping(req: MappingRequest, db: Session = Depends(database.get_db
 async def get_mapping(req: LookupRequest, db: Session = Depends(database.get_db), current_user = Depends(auth.get_current_user)):
     name = mapping_service.get_friendly_name(db, req.name, current_user.user_id)
     return {"friendly_name": name}
+
+@router.post("/resolve")
+async def resolve_mappings(req: ResolveRequest, db: Session = Depends(database.get_db), current_user = Depends(auth.get_current_user)):
+    resolved = mapping_service.resolve_names(db, req.names, current_user.user_id)
+    return {
+        "results": [
+            {"original_name": name, **resolved.get(name, {"friendly_name": name})}
+            for name in req.names
+        ]
+    }
@@ -4,15 +4,21 @@ import os
 # Ensure the parent directory is in the path so we can import models/database etc
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+import asyncio
+import json
+import time
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import database, auth, models
-import services.ocr_service as ocr_service
+from repositories import ocr_job_repo, project_repo
+from services import mapping_service, ocr_metrics, ocr_queue, ocr_service
+from storage import UploadTooLargeError, max_upload_bytes, read_upload
 
 router = APIRouter(prefix="/ocr", tags=["ocr"])
 
-@router.post("/upload")
+@router.post("/upload", status_code=202)
 async def scan_receipt(
     files: List[UploadFile] = File(...),
     db: Session = Depends(database.get_db),
@@ -22,35 +28,257 @@ async def scan_receipt(
         raise HTTPException(status_code=400, detail="Maximum 5 images allowed")
 
     try:
-        # Step 1-3: Preprocess, Extract, Analyze (now using process_receipts_with_pixtral)
-        items = await ocr_service.process_receipts_with_pixtral(files)
-        print(f"DEBUG: Extracted items from Pixtral: {items}")
-        
-        # Step 4: Apply Friendly Name Mapping (Logic from Section 9.1)
-        if items and isinstance(items, list):
-            # Local import to avoid circular dependencies
-            from services import mapping_service
-            
-            for item in items:
-                original_name = item.get("extracted_name")
-                if original_name:
-                    try:
-                        friendly_name = mapping_service.get_friendly_name(db, original_name, current_user.user_id)
-                        item["friendly_name"] = friendly_name
-                        
-                        # Auto-fill categories from database
-                        cat_mapping = mapping_service.get_category_mapping(db, friendly_name, current_user.user_id)
-                        if cat_mapping:
-                            item["category_level_1"] = cat_mapping.get("category_level_1")
-                            item["category_level_2"] = cat_mapping.get("category_level_2")
-                            item["category_level_3"] = cat_mapping.get("category_level_3")
-                    except Exception as me:
-                        print(f"DEBUG: Mapping service error for {original_name}: {me}")
-                        item["friendly_name"] = original_name
-        
-        return {"items": items}
+        # Store images and enqueue; extraction + mapping run in the OCR worker pool
+        job = await ocr_queue.submit_job(db, files, current_user.user_id)
+        return {"job_id": job.job_id, "status": job.status}
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         print(f"OCR Scan Error: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/upload/stream")
+async def scan_receipt_stream(
+    files: List[UploadFile] = File(...),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Scans the receipt images within the request and streams the items as Server-Sent
+    Events while they are extracted: one 'item' event per item (already mapped to
+    friendly names and categories), then 'done' (or 'error').
+    """
+    if len(files) > 5:
+        raise HTTPException(status_code=400, detail="Maximum 5 images allowed")
+
+    started = time.perf_counter()
+    stats = {}
+    images = []
+    max_bytes = max_upload_bytes()
+    try:
+        with ocr_metrics.span("read", stats):
+            for file in files:
+                images.append((await read_upload(file, max_bytes), file.content_type or "image/jpeg"))
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    user_id = current_user.user_id
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def scan():
+        # Own session: the stream outlives the request's dependencies
+        db = database.SessionLocal()
+        error = None
+        try:
+            async def on_item(item):
+                with ocr_metrics.span("mapping", stats):
+                    mapping_service.map_extracted_items(db, [item], user_id)
+                await events.put(("item", item))
+
+            items = await ocr_service.process_receipt_images(images, stats, db, on_item=on_item)
+            await events.put(("done", {"count": len(items), "failed_images": stats.get("failed_images", [])}))
+        except Exception as e:
+            print(f"OCR Stream Error: {e}")
+            error = str(e)
+            await events.put(("error", {"detail": str(e)}))
+        finally:
+            ocr_metrics.record_scan(db, stats, "stream", (time.perf_counter() - started) * 1000, user_id=user_id, error=error)
+            db.close()
+
+    async def event_stream():
+        task = asyncio.create_task(scan())
+        try:
+            while True:
+                event, data = await events.get()
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+                if event in ("done", "error"):
+                    break
+        finally:
+            # Client went away: stop scanning
+            task.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/jobs/{job_id}")
+async def get_scan_job(
+    job_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    job = ocr_job_repo.get_job(db, job_id)
+    if not job or (job.user_id != current_user.user_id and not current_user.administrator):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    response = {
+        "job_id": job.job_id,
+        "status": job.status,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at
+    }
+    if job.status == ocr_job_repo.STATUS_DONE:
+        result = job.result or {}
+        response["items"] = result.get("items", [])
+        # Stage timings and bytes/tokens of this scan (see GET /ocr/metrics)
+        response["timings"] = result.get("timings", {})
+        response["usage"] = result.get("usage", {})
+        response["cached"] = bool(result.get("cache")) and not result["cache"].get("misses")
+        if result.get("failed_images"):
+            # Partial result: these images (0-based upload order) could not be read
+            response["failed_images"] = result["failed_images"]
+    elif job.status == ocr_job_repo.STATUS_FAILED:
+        response["error"] = job.error
+    if job.batch_id:
+        response["batch_id"] = job.batch_id
+        response["purchase_id"] = job.purchase_id
+    return response
+
+@router.post("/jobs/{job_id}/retry", status_code=202)
+async def retry_scan_job(
+    job_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Re-queues a failed scan (single or bulk) with its stored images."""
+    job = ocr_job_repo.get_job(db, job_id)
+    if not job or (job.user_id != current_user.user_id and not current_user.administrator):
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not ocr_queue.retry_job(db, job_id):
+        raise HTTPException(status_code=409, detail="Only failed jobs can be retried")
+    return {"job_id": job_id, "status": ocr_job_repo.STATUS_QUEUED}
+
+def _parse_receipts(receipts: Optional[str], files: List[UploadFile]):
+    """
+    Groups the uploaded files into receipts. 'receipts' is a JSON list like
+    [{"label": "Supermarket", "images": [0, 1]}, {"images": [2]}] (indexes into files);
+    without it every file is a receipt of its own.
+    """
+    if not receipts:
+        return [(None, [file]) for file in files]
+
+    try:
+        groups = json.loads(receipts)
+        parsed = [(str(group.get("label") or "")[:255] or None, [int(i) for i in group["images"]]) for group in groups]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid receipts: {e}")
+
+    indexes = [i for _, images in parsed for i in images]
+    if sorted(indexes) != list(range(len(files))):
+        raise HTTPException(status_code=400, detail="Every file must belong to exactly one receipt")
+    if any(not images for _, images in parsed):
+        raise HTTPException(status_code=400, detail="Every receipt needs at least one image")
+    return [(label, [files[i] for i in images]) for label, images in parsed]
+
+@router.post("/batches", status_code=202)
+async def scan_receipt_batch(
+    files: List[UploadFile] = File(...),
+    project_id: int = Form(...),
+    receipts: Optional[str] = Form(None),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Bulk scan: enqueues one OCR job per receipt. Each scanned receipt becomes a draft
+    purchase in the project (mapped names and categories, the uploader as payer and
+    contributor) that is confirmed by saving it in the editor.
+    """
+    project = project_repo.get_project_by_id(db, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if not any(p.user_id == current_user.user_id for p in project.participants) and not current_user.administrator:
+        raise HTTPException(status_code=403, detail="Not authorized for this project")
+
+    grouped = _parse_receipts(receipts, files)
+    config = ocr_queue.batch_config()
+    max_receipts = int(config.get("max_receipts", 50))
+    max_images = int(config.get("max_images_per_receipt", 5))
+    if len(grouped) > max_receipts:
+        raise HTTPException(status_code=400, detail=f"Maximum {max_receipts} receipts per batch allowed")
+    if any(len(images) > max_images for _, images in grouped):
+        raise HTTPException(status_code=400, detail=f"Maximum {max_images} images per receipt allowed")
+
+    try:
+        batch = await ocr_queue.submit_batch(db, grouped, current_user.user_id, project_id)
+        return {"batch_id": batch.batch_id, "job_ids": [job.job_id for job in batch.jobs]}
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        print(f"OCR Batch Error: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/batches/{batch_id}")
+async def get_scan_batch(
+    batch_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Progress of a bulk scan: counts per status and one entry per receipt."""
+    batch = ocr_job_repo.get_batch(db, batch_id)
+    if not batch or (batch.user_id != current_user.user_id and not current_user.administrator):
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    counts = {status: 0 for status in (
+        ocr_job_repo.STATUS_QUEUED, ocr_job_repo.STATUS_PROCESSING, ocr_job_repo.STATUS_DONE, ocr_job_repo.STATUS_FAILED
+    )}
+    receipts = []
+    for job in batch.jobs:
+        counts[job.status] = counts.get(job.status, 0) + 1
+        receipt = {
+            "job_id": job.job_id,
+            "label": job.label,
+            "status": job.status,
+            "images": len(job.images),
+            "attempts": job.attempts
+        }
+        if job.status == ocr_job_repo.STATUS_DONE:
+            receipt["purchase_id"] = job.purchase_id
+            receipt["item_count"] = len((job.result or {}).get("items", []))
+        elif job.status == ocr_job_repo.STATUS_FAILED:
+            receipt["error"] = job.error
+        receipts.append(receipt)
+
+    total = len(receipts)
+    finished = counts[ocr_job_repo.STATUS_DONE] + counts[ocr_job_repo.STATUS_FAILED]
+    return {
+        "batch_id": batch.batch_id,
+        "project_id": batch.project_id,
+        "created_at": batch.created_at,
+        "total": total,
+        "finished": finished,
+        "complete": finished == total,
+        "counts": counts,
+        "receipts": receipts
+    }
+
+@router.get("/metrics")
+async def get_ocr_metrics(
+    hours: float = 24,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    OCR capacity figures: stage timings, bytes, tokens, estimated cost and failures of
+    the scans of the last `hours` (all processes), plus this process's totals.
+    """
+    if not current_user.administrator:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {
+        "window": ocr_metrics.summarize(db, hours),
+        "process": ocr_metrics.snapshot()
+    }
+
+@router.post("/cache/reparse")
+async def reparse_ocr_cache(
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Re-parses all cached Vision AI responses with the current parser, without calling the model."""
+    if not current_user.administrator:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return ocr_service.reparse_cached_results(db)
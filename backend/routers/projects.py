@@ -15,12 +15,22 @@ import repositories.purchase_repo as purchase_repo
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
+def _image_variants(store, image_path: Optional[str]) -> dict:
+    """Thumbnail URL and srcset of a project image (both None without an image)."""
+    if not image_path:
+        return {"image_thumbnail": None, "image_srcset": None}
+    from storage import get_image_urls
+    urls = get_image_urls(store, image_path)
+    return {"image_thumbnail": urls["thumbnail_url"], "image_srcset": urls["srcset"] or None}
+
 @router.get("", response_model=List[schemas.ProjectResponse])
 async def list_projects(
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     projects = project_repo.get_user_projects(db, current_user.user_id)
+    from storage import get_storage
+    store = get_storage()
     # Convert to response model format (manually handling participants)
     result = []
     for p in projects:
@@ -37,7 +47,8 @@ async def list_projects(
             project_id=p.project_id,
             name=p.name,
             description=p.description,
-            image_path=p.image_path,
+            image_path=store.get_file_url(p.image_path) if p.image_path else None,
+            **_image_variants(store, p.image_path),
             created_at=p.created_at,
             created_by_user_id=p.created_by_user_id,
             participants=participants
@@ -56,17 +67,13 @@ async def create_project(
     # Handle Image Upload
     image_path = None
     if file:
-        from storage import get_storage
-        store = get_storage()
+        from services import image_store
+        from storage import UploadTooLargeError
         try:
-            # Use temporary filename first, we don't have project ID yet
-            # Better: create project first, then upload.
-            # Or use random uuid for filename.
-            import uuid
-            unique_id = uuid.uuid4().hex
-            file_name = f"project_img_{unique_id}_{file.filename}"
-            store.upload_fileobj(file.file, file_name)
-            image_path = file_name
+            # Content-addressed name: a new image always gets a new URL (no stale browser caches)
+            image_path = await image_store.save_upload(db, file, variants=True)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
         except Exception as e:
             print(f"DEBUG: Failed to save project image: {e}")
 
@@ -131,6 +138,7 @@ async def get_project(
         name=project.name,
         description=project.description,
         image_path=image_url or project.image_path, # Return URL if possible, else path
+        **_image_variants(storage, project.image_path),
         created_at=project.created_at,
         created_by_user_id=project.created_by_user_id,
         participants=participants
@@ -156,15 +164,12 @@ async def update_project(
 
     image_path = None
     if file:
-        from storage import get_storage
-        store = get_storage()
+        from services import image_store
+        from storage import UploadTooLargeError
         try:
-            # Generate a unique filename to avoid browser caching issues or name collisions
-            import uuid
-            unique_id = uuid.uuid4().hex[:8]
-            file_name = f"project_img_{project_id}_{unique_id}_{file.filename}"
-            store.upload_fileobj(file.file, file_name)
-            image_path = file_name
+            image_path = await image_store.save_upload(db, file, variants=True)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
         except Exception as e:
             print(f"DEBUG: Image upload failed: {e}")
 
@@ -186,7 +191,8 @@ async def update_project(
             "project_id": updated.project_id,
             "name": updated.name,
             "description": updated.description,
-            "image_path": image_url or updated.image_path
+            "image_path": image_url or updated.image_path,
+            **_image_variants(storage, updated.image_path)
         }
     }
 
@@ -218,6 +224,8 @@ async def list_all_projects_admin(
     
     # Get ALL projects from DB
     projects = db.query(models.Project).order_by(models.Project.created_at.desc()).all()
+    from storage import get_storage
+    store = get_storage()
     
     result = []
     for p in projects:
@@ -234,13 +242,29 @@ async def list_all_projects_admin(
             project_id=p.project_id,
             name=p.name,
             description=p.description,
-            image_path=p.image_path,
+            image_path=store.get_file_url(p.image_path) if p.image_path else None,
+            **_image_variants(store, p.image_path),
             created_at=p.created_at,
             created_by_user_id=p.created_by_user_id,
             participants=participants
         ))
     return result
 
+@router.get("/admin/storage", response_model=List[schemas.ProjectStorageUsage])
+async def list_storage_usage_admin(
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Image storage used by every project, largest first."""
+    if not current_user.administrator:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    from repositories import stored_file_repo
+    names = dict(db.query(models.Project.project_id, models.Project.name))
+    usage = stored_file_repo.get_project_usage(db)
+    result = [schemas.ProjectStorageUsage(project_id=project_id, name=names.get(project_id, ""), **entry)
+              for project_id, entry in usage.items()]
+    return sorted(result, key=lambda entry: entry.bytes + entry.original_bytes, reverse=True)
+
 @router.post("/{project_id}/participants")
 async def add_participant(
     project_id: int,
@@ -335,7 +359,8 @@ async def get_project_statistics(
     payer_stats = db.query(models.Purchase.payer_user_id, func.sum(
         (models.Item.price * models.Item.quantity) - models.Item.discount
     )).join(models.Item).filter(
-        models.Purchase.project_id == project_id
+        models.Purchase.project_id == project_id,
+        models.Purchase.is_draft == False
     ).group_by(models.Purchase.payer_user_id).all()
     
     user_spending = []
@@ -353,3 +378,21 @@ async def get_project_statistics(
         
     stats["user_spending"] = user_spending
     return stats
+
+@router.get("/{project_id}/storage", response_model=schemas.ProjectStorageUsage)
+async def get_project_storage_usage(
+    project_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    # Verify access
+    project = project_repo.get_project_by_id(db, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    is_participant = any(p.user_id == current_user.user_id for p in project.participants)
+    if not is_participant and not current_user.administrator:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    from repositories import stored_file_repo
+    usage = stored_file_repo.get_project_usage(db, [project_id])[project_id]
+    return schemas.ProjectStorageUsage(project_id=project_id, name=project.name, **usage)
@@ -113,18 +113,25 @@ async def update_purchase(
         db.delete(old_item)
     
     # Add new items
-    for item_in in purchase_in.items:
-        from services import mapping_service
+    from services import mapping_service
+
+    # Auto-fill categories if empty (Logic: Check DB) - one lookup for all items
+    uncategorized = [
+        item_in.friendly_name or item_in.original_name
+        for item_in in purchase_in.items
+        if not item_in.category_level_1 and not item_in.category_level_2 and not item_in.category_level_3
+    ]
+    cat_maps = mapping_service.get_category_mappings(db, uncategorized, current_user.user_id)
 
-        # Auto-fill categories if empty (Logic: Check DB)
+    friendly_pairs = []
+    learned_categories = {}
+    for item_in in purchase_in.items:
         if not item_in.category_level_1 and not item_in.category_level_2 and not item_in.category_level_3:
-            fname = item_in.friendly_name or item_in.original_name
-            if fname:
-                cat_map = mapping_service.get_category_mapping(db, fname, current_user.user_id)
-                if cat_map:
-                    item_in.category_level_1 = cat_map.get("category_level_1")
-                    item_in.category_level_2 = cat_map.get("category_level_2")
-                    item_in.category_level_3 = cat_map.get("category_level_3")
+            cat_map = cat_maps.get(item_in.friendly_name or item_in.original_name)
+            if cat_map:
+                item_in.category_level_1 = cat_map.get("category_level_1")
+                item_in.category_level_2 = cat_map.get("category_level_2")
+                item_in.category_level_3 = cat_map.get("category_level_3")
 
         db_item = item_repo.add_item_to_purchase(
             db,
@@ -146,18 +153,21 @@ async def update_purchase(
             
         # Section 9.2: Storing Friendly Name Logic
         if item_in.friendly_name:
-            mapping_service.set_friendly_name(db, item_in.original_name, item_in.friendly_name, current_user.user_id)
+            friendly_pairs.append((item_in.original_name, item_in.friendly_name))
         
         # Update Category Mapping (Learning Logic)
         if item_in.category_level_1 or item_in.category_level_2 or item_in.category_level_3:
             fname = item_in.friendly_name or item_in.original_name
             if fname:
-                categories = {
+                learned_categories[fname] = {
                     "category_level_1": item_in.category_level_1,
                     "category_level_2": item_in.category_level_2,
                     "category_level_3": item_in.category_level_3
                 }
-                mapping_service.set_category_mapping(db, fname, categories, current_user.user_id)
+
+    # Store the learned mappings for all items in one go
+    mapping_service.set_friendly_names(db, friendly_pairs, current_user.user_id)
+    mapping_service.set_category_mappings(db, learned_categories, current_user.user_id)
 
     # 3. Log Action
     purchase_repo.create_purchase_log(db, purchase_id, current_user.user_id, "Purchase updated")
@@ -200,7 +210,19 @@ async def create_purchase(
             if contributor_id not in participant_ids:
                 raise HTTPException(status_code=400, detail=f"Selected contributor (ID: {contributor_id}) is not a participant of this project")
 
-    # 1. Create Purchase Metadata
+    # 1. Store images first (concurrently), so an oversized upload rejects the whole request
+    image_names = []
+    if files:
+        from services import image_store
+        from storage import UploadTooLargeError
+        try:
+            image_names = await image_store.save_uploads(db, files, variants=True)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except Exception as e:
+            print(f"DEBUG: Failed to save images: {e}")
+
+    # 1b. Create Purchase Metadata
     db_purchase = purchase_repo.create_purchase(
         db,
         creator_user_id=current_user.user_id,
@@ -212,31 +234,32 @@ async def create_purchase(
         project_id=purchase_in.project_id
     )
 
-    # 1b. Handle Images
-    if files:
-        from storage import get_storage
-        store = get_storage()
-        for file in files:
-            try:
-                file_name = f"purchase_{db_purchase.purchase_id}_{file.filename}"
-                store.upload_fileobj(file.file, file_name)
-                purchase_repo.create_receipt_image(db, db_purchase.purchase_id, file_name, file.filename)
-            except Exception as e:
-                print(f"DEBUG: Failed to save image {file.filename}: {e}")
+    # 1c. Link Images (archived to a compact format in the background)
+    from services import image_archive
+    for file, file_name in zip(files, image_names):
+        image = purchase_repo.create_receipt_image(db, db_purchase.purchase_id, file_name, file.filename)
+        image_archive.schedule(image.image_id)
 
     # 2. Add Items and Contributors
+    from services import mapping_service
+
+    # Auto-fill categories if empty (Logic: Check DB) - one lookup for all items
+    uncategorized = [
+        item_in.friendly_name or item_in.original_name
+        for item_in in purchase_in.items
+        if not item_in.category_level_1 and not item_in.category_level_2 and not item_in.category_level_3
+    ]
+    cat_maps = mapping_service.get_category_mappings(db, uncategorized, current_user.user_id)
+
+    friendly_pairs = []
+    learned_categories = {}
     for item_in in purchase_in.items:
-        from services import mapping_service
-        
-        # Auto-fill categories if empty (Logic: Check DB)
         if not item_in.category_level_1 and not item_in.category_level_2 and not item_in.category_level_3:
-            fname = item_in.friendly_name or item_in.original_name
-            if fname:
-                cat_map = mapping_service.get_category_mapping(db, fname, current_user.user_id)
-                if cat_map:
-                    item_in.category_level_1 = cat_map.get("category_level_1")
-                    item_in.category_level_2 = cat_map.get("category_level_2")
-                    item_in.category_level_3 = cat_map.get("category_level_3")
+            cat_map = cat_maps.get(item_in.friendly_name or item_in.original_name)
+            if cat_map:
+                item_in.category_level_1 = cat_map.get("category_level_1")
+                item_in.category_level_2 = cat_map.get("category_level_2")
+                item_in.category_level_3 = cat_map.get("category_level_3")
 
         db_item = item_repo.add_item_to_purchase(
             db,
@@ -258,18 +281,21 @@ async def create_purchase(
             
         # Section 9.2: Storing Friendly Name Logic
         if item_in.friendly_name:
-            mapping_service.set_friendly_name(db, item_in.original_name, item_in.friendly_name, current_user.user_id)
-
+            friendly_pairs.append((item_in.original_name, item_in.friendly_name))
+        
         # Update Category Mapping (Learning Logic)
         if item_in.category_level_1 or item_in.category_level_2 or item_in.category_level_3:
             fname = item_in.friendly_name or item_in.original_name
             if fname:
-                categories = {
+                learned_categories[fname] = {
                     "category_level_1": item_in.category_level_1,
                     "category_level_2": item_in.category_level_2,
                     "category_level_3": item_in.category_level_3
                 }
-                mapping_service.set_category_mapping(db, fname, categories, current_user.user_id)
+
+    # Store the learned mappings for all items in one go
+    mapping_service.set_friendly_names(db, friendly_pairs, current_user.user_id)
+    mapping_service.set_category_mappings(db, learned_categories, current_user.user_id)
 
     # 3. Log Action
     purchase_repo.create_purchase_log(db, db_purchase.purchase_id, current_user.user_id, "Purchase created")
@@ -464,6 +490,7 @@ async def get_recent_purchases(
             "tax_is_added": p.tax_is_added,
             "discount_is_applied": p.discount_is_applied,
             "project_id": p.project_id,
+            "is_draft": p.is_draft,
             "items": [
                 {
                     "item_id": item.item_id,
@@ -514,7 +541,7 @@ async def get_purchase(
     involved_users = [{"user_id": u.user_id, "name": u.name, "is_dummy": u.is_dummy} for u in users]
 
     # Serialize purchase with properly formatted images
-    from storage import get_storage
+    from storage import get_storage, get_image_urls
     storage_interface = get_storage()
     
     return {
@@ -527,9 +554,10 @@ async def get_purchase(
         "tax_is_added": purchase.tax_is_added,
         "discount_is_applied": purchase.discount_is_applied,
         "project_id": purchase.project_id,
+        "is_draft": purchase.is_draft,
         "images": [
             {
-                "url": storage_interface.get_file_url(img.file_path),
+                **get_image_urls(storage_interface, img.file_path),
                 "file_path": img.file_path,
                 "original_filename": img.original_filename
             }
@@ -619,6 +647,7 @@ async def list_purchases(
             "tax_is_added": p.tax_is_added,
             "discount_is_applied": p.discount_is_applied,
             "project_id": p.project_id,
+            "is_draft": p.is_draft,
             "items": [
                 {
                     "item_id": item.item_id,
@@ -660,6 +689,7 @@ async def list_all_purchases_admin(
             "tax_is_added": p.tax_is_added,
             "discount_is_applied": p.discount_is_applied,
             "project_id": p.project_id,
+            "is_draft": p.is_draft,
             "items": [
                 {
                     "item_id": item.item_id,
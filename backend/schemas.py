@@ -48,6 +48,9 @@ class ProjectResponse(ProjectBase):
     project_id: int
     created_at: datetime
     created_by_user_id: Optional[int]
+    # Downscaled image variants (URLs); see storage.get_image_urls
+    image_thumbnail: Optional[str] = None
+    image_srcset: Optional[str] = None
     participants: List[ProjectParticipantResponse] = []
 
     class Config:
@@ -56,6 +59,15 @@ class ProjectResponse(ProjectBase):
 class ProjectParticipantAdd(BaseModel):
     user_id: int
 
+class ProjectStorageUsage(BaseModel):
+    project_id: int
+    name: str
+    images: int # Receipt images
+    files: int # Distinct stored files (receipt images and the project image)
+    bytes: int
+    originals: int # Originals of archived receipt images, kept until storage.archive.keep_originals_days pass
+    original_bytes: int
+
 # --- Search Schemas ---
 
 class SearchResultItem(BaseModel):
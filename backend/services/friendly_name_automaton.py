@@ -0,0 +1,110 @@
+from collections import Counter, deque
+from typing import Dict, List, Optional, Set
+
+
+class FriendlyNameAutomaton:
+    """
+    Word-level Aho-Corasick automaton over FriendlyName substrings.
+
+    Every stored substring is a pattern of lower-cased words. A lookup scans the
+    words of the input once and yields the weighted friendly names of every
+    pattern that occurs in it, which is exactly what the IN-list query over
+    generate_all_substrings() used to return.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Nearest node on the failure chain that terminates a pattern (-1 = none)
+        self._output: List[int] = [-1]
+        self._weights: List[Counter] = [Counter()]
+        self._dirty = False
+
+    def add(self, substring: str, friendly_name: str, weight: int = 1):
+        """Adds (or strengthens) a substring -> friendly_name pattern."""
+        node = self._node_for(substring)
+        if node is None:
+            return
+
+        if not self._weights[node]:
+            self._dirty = True
+        self._weights[node][friendly_name] += weight
+
+    def set_weights(self, substring: str, weights: Dict[str, int]):
+        """Replaces the friendly-name weights of a pattern (empty weights disable it)."""
+        node = self._node_for(substring)
+        if node is None:
+            return
+
+        if bool(self._weights[node]) != bool(weights):
+            self._dirty = True
+        self._weights[node] = Counter(weights)
+
+    def _node_for(self, substring: str) -> Optional[int]:
+        """Walks (and extends) the trie along the words of substring."""
+        words = substring.lower().split()
+        if not words:
+            return None
+
+        node = 0
+        for word in words:
+            nxt = self._goto[node].get(word)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][word] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(-1)
+                self._weights.append(Counter())
+                self._dirty = True
+            node = nxt
+        return node
+
+    def _build(self):
+        """Recomputes failure and output links (BFS over the trie)."""
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._output[child] = -1
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for word, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(word, 0)
+                self._fail[child] = target if target != child else 0
+                fail_node = self._fail[child]
+                self._output[child] = fail_node if self._weights[fail_node] else self._output[fail_node]
+                queue.append(child)
+
+        self._dirty = False
+
+    def _matched_nodes(self, text: str) -> Set[int]:
+        if self._dirty:
+            self._build()
+
+        matched = set()
+        node = 0
+        for word in text.lower().split():
+            while node and word not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(word, 0)
+
+            hit = node if self._weights[node] else self._output[node]
+            while hit > 0 and hit not in matched:
+                matched.add(hit)
+                hit = self._output[hit]
+        return matched
+
+    def match(self, text: str) -> Counter:
+        """
+        Returns the summed friendly-name weights of all distinct patterns found in text.
+        A pattern occurring several times counts once, like a SQL IN list would.
+        """
+        counts = Counter()
+        for node in self._matched_nodes(text):
+            counts.update(self._weights[node])
+        return counts
@@ -0,0 +1,196 @@
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import cv2
+import numpy as np
+
+# Archival copies of receipt images: once a receipt is saved (its OCR is done), the phone
+# photo is transcoded in a process pool to a compact format at a still readable resolution
+# and the receipt image points to the archival copy. The original keeps its reference for
+# storage.archive.keep_originals_days and is then released to the image GC.
+_pool: Optional[ProcessPoolExecutor] = None
+_queue: Optional[asyncio.Queue] = None
+_worker: Optional[asyncio.Task] = None
+
+# Format -> (extension, encoder, quality flag, grayscale)
+_FORMATS = {
+    "webp": (".webp", ".webp", cv2.IMWRITE_WEBP_QUALITY, False),
+    "jpeg_gray": (".jpg", ".jpg", cv2.IMWRITE_JPEG_QUALITY, True),
+}
+if hasattr(cv2, "IMWRITE_AVIF_QUALITY"):
+    _FORMATS["avif"] = (".avif", ".avif", cv2.IMWRITE_AVIF_QUALITY, False)
+
+def _archive_config() -> Dict:
+    from database import config
+    return ((config or {}).get("storage") or {}).get("archive") or {}
+
+def enabled() -> bool:
+    return bool(_archive_config().get("enabled", False))
+
+def archive_format() -> str:
+    name = _archive_config().get("format", "webp")
+    if name not in _FORMATS:
+        print(f"DEBUG: Archive format '{name}' is not supported by this OpenCV build, using webp")
+        return "webp"
+    return name
+
+def transcode(content: bytes, format: str = "webp", quality: int = 60, max_width: int = 1600) -> bytes:
+    """Re-encodes one image for archival (runs in the pool); never upscales."""
+    _, encoder, quality_flag, grayscale = _FORMATS[format]
+    image = cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Image could not be decoded")
+    width = image.shape[1]
+    if width > max_width:
+        scale = max_width / width
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode(encoder, image, [quality_flag, int(quality)])
+    if not ok:
+        raise ValueError(f"Could not encode {format} archive")
+    return buffer.tobytes()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=max(1, int(_archive_config().get("workers", 1))),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+async def archive_image(image_id: int) -> Optional[str]:
+    """
+    Transcodes one receipt image and points it to the archival copy; returns the new name,
+    or None if the image is archived already, gone, or would not get smaller.
+    """
+    import database, models
+    from repositories import stored_file_repo
+    from storage import get_storage
+    store = get_storage()
+    loop = asyncio.get_running_loop()
+    config = _archive_config()
+    format = archive_format()
+
+    db = database.SessionLocal()
+    try:
+        image = db.query(models.ReceiptImage).filter(models.ReceiptImage.image_id == image_id).first()
+        if image is None or image.archived_at is not None:
+            return None
+        original = image.file_path
+        content = await loop.run_in_executor(None, store.read_file, original)
+        try:
+            archived = await loop.run_in_executor(
+                _get_pool(), transcode, content, format, int(config.get("quality", 60)), int(config.get("max_width", 1600))
+            )
+        except ValueError as e:
+            # Not an image OpenCV can read (e.g. a PDF receipt): keep it as it is
+            print(f"DEBUG: Receipt image {image_id} is not archived: {e}")
+            archived = None
+
+        # The purchase may have been deleted (or the image archived) while transcoding
+        db.expire_all()
+        image = db.query(models.ReceiptImage).filter(models.ReceiptImage.image_id == image_id).first()
+        if image is None or image.archived_at is not None or image.file_path != original:
+            return None
+        min_savings = float(config.get("min_savings_percent", 20)) / 100
+        if archived is None or len(archived) > len(content) * (1 - min_savings):
+            image.archived_at = datetime.utcnow()
+            db.commit()
+            if archived is not None:
+                print(f"DEBUG: Kept receipt image {image_id} as is: archive would be {len(archived) / 1024:.0f} KB "
+                      f"of {len(content) / 1024:.0f} KB")
+            return None
+
+        file_name, _ = await loop.run_in_executor(
+            None, lambda: store.store_content(
+                io.BytesIO(archived), _FORMATS[format][0],
+                register=lambda name, size: stored_file_repo.register_file(db, name, size)
+            )
+        )
+        image.archived_at = datetime.utcnow()
+        image.file_path = file_name
+        stored_file_repo.acquire(db, [file_name], commit=False)
+        if float(config.get("keep_originals_days", 30)) > 0:
+            image.original_path = original
+        else:
+            stored_file_repo.release(db, [original], commit=False)
+        db.commit()
+    finally:
+        db.close()
+
+    store.generate_variants(file_name)
+    print(f"DEBUG: Archived receipt image {image_id}: {len(content) / 1024:.0f} KB -> {len(archived) / 1024:.0f} KB ({format})")
+    return file_name
+
+def release_originals(db) -> int:
+    """Releases the originals of images archived more than keep_originals_days ago (the GC deletes them)."""
+    import models
+    from repositories import stored_file_repo
+    cutoff = datetime.utcnow() - timedelta(days=float(_archive_config().get("keep_originals_days", 30)))
+    images = db.query(models.ReceiptImage).filter(
+        models.ReceiptImage.original_path.isnot(None),
+        models.ReceiptImage.archived_at < cutoff
+    ).all()
+    stored_file_repo.release(db, [image.original_path for image in images], commit=False)
+    for image in images:
+        image.original_path = None
+    db.commit()
+    return len(images)
+
+def schedule(image_id: int) -> bool:
+    """Queues archival of a receipt image; False if the worker is not running."""
+    if _queue is None or not enabled():
+        return False
+    _queue.put_nowait(image_id)
+    return True
+
+def backfill(db) -> int:
+    """Schedules receipt images saved before archival was enabled (or whose archival was interrupted)."""
+    import models
+    scheduled = 0
+    for row in db.query(models.ReceiptImage.image_id).filter(models.ReceiptImage.archived_at.is_(None)):
+        if schedule(row.image_id):
+            scheduled += 1
+    return scheduled
+
+async def _run():
+    while True:
+        image_id = await _queue.get()
+        try:
+            await archive_image(image_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"DEBUG: Failed to archive receipt image {image_id}: {e}")
+
+def start_worker():
+    """Starts the archival worker on the running loop and schedules unarchived receipt images."""
+    global _queue, _worker
+    if _worker is not None or not enabled():
+        return
+    _queue = asyncio.Queue()
+    _worker = asyncio.create_task(_run())
+
+    import database
+    db = database.SessionLocal()
+    try:
+        scheduled = backfill(db)
+        if scheduled:
+            print(f"DEBUG: Scheduled archival of {scheduled} receipt image(s)")
+    except Exception as e:
+        print(f"DEBUG: Archive backfill failed: {e}")
+    finally:
+        db.close()
+
+async def stop_worker():
+    global _queue, _worker, _pool
+    if _worker is not None:
+        _worker.cancel()
+        await asyncio.gather(_worker, return_exceptions=True)
+    _queue = _worker = None
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,133 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+
+# Receipt photos are shrunk before they are sent to the Vision AI: smaller requests,
+# faster uploads to the model and fewer image tokens. The CPU work runs in a process
+# pool (spawned, so the children do not inherit the server's threads).
+_pool: Optional[ProcessPoolExecutor] = None
+
+_MIME_BY_FORMAT = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+def find_receipt_box(gray: np.ndarray, threshold1: int, threshold2: int) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Bounding box (x, y, w, h) around all edge contours (the receipt and its text), if it
+    covers a sensible part of the photo. Only empty margins are cut: a close-up whose text
+    blocks form separate contours (names, prices) keeps all of them.
+    """
+    edges = cv2.Canny(cv2.GaussianBlur(gray, (5, 5), 0), threshold1, threshold2)
+    edges = cv2.dilate(edges, np.ones((5, 5), np.uint8), iterations=2)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    image_area = gray.shape[0] * gray.shape[1]
+    # Ignore specks (dust, sensor noise)
+    boxes = [cv2.boundingRect(c) for c in contours if cv2.contourArea(c) >= 0.0005 * image_area]
+    if not boxes:
+        return None
+
+    x0 = min(x for x, _, _, _ in boxes)
+    y0 = min(y for _, y, _, _ in boxes)
+    x1 = max(x + w for x, _, w, _ in boxes)
+    y1 = max(y + h for _, y, _, h in boxes)
+    if (x1 - x0) * (y1 - y0) < 0.2 * image_area:
+        return None
+    return x0, y0, x1 - x0, y1 - y0
+
+def preprocess_image(content: bytes, options: Dict) -> Tuple[bytes, str]:
+    """
+    Auto-rotates (EXIF), optionally crops to the receipt and converts to grayscale,
+    downsizes to options['max_edge'] and re-encodes. Returns (bytes, mime type);
+    the original bytes are returned if the image cannot be decoded or would not shrink.
+    """
+    # imdecode applies the EXIF orientation flag
+    image = cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return content, ""
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if options.get("grayscale", True):
+        image = gray
+
+    if options.get("crop", True):
+        box = find_receipt_box(gray, int(options.get("threshold1", 100)), int(options.get("threshold2", 200)))
+        if box:
+            x, y, w, h = box
+            margin = int(0.02 * max(w, h))
+            image = image[max(0, y - margin):y + h + margin, max(0, x - margin):x + w + margin]
+
+    max_edge = int(options.get("max_edge", 1600))
+    height, width = image.shape[:2]
+    if max(height, width) > max_edge:
+        scale = max_edge / max(height, width)
+        image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    fmt = options.get("format", "jpeg")
+    quality = int(options.get("quality", 80))
+    if fmt == "webp":
+        ok, encoded = cv2.imencode(".webp", image, [cv2.IMWRITE_WEBP_QUALITY, quality])
+    else:
+        fmt = "jpeg"
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+
+    if not ok or len(encoded) >= len(content):
+        return content, ""
+    return encoded.tobytes(), _MIME_BY_FORMAT[fmt]
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+async def preprocess_images(images: List[Tuple[bytes, str]], options: Dict, stats: Optional[Dict] = None) -> List[Tuple[bytes, str]]:
+    """
+    Preprocesses (bytes, mime) images concurrently in the process pool.
+    Fills stats with the sizes before/after, the time spent and the estimated upload
+    time saved (base64 payload at options['uplink_mbps']).
+    """
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    pool = _get_pool(int(options.get("workers", 2)))
+
+    results = await asyncio.gather(
+        *(loop.run_in_executor(pool, preprocess_image, content, options) for content, _ in images),
+        return_exceptions=True
+    )
+
+    processed = []
+    for (content, mime), result in zip(images, results):
+        if isinstance(result, Exception):
+            print(f"DEBUG: Image preprocessing failed, sending original: {result}")
+            processed.append((content, mime))
+        else:
+            new_content, new_mime = result
+            processed.append((new_content, new_mime or mime))
+
+    bytes_before = sum(len(content) for content, _ in images)
+    bytes_after = sum(len(content) for content, _ in processed)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    # base64 inflates the payload by 4/3; Mbit/s -> bytes per ms = mbps * 125
+    upload_ms_saved = (bytes_before - bytes_after) * 4 / 3 / (float(options.get("uplink_mbps", 20)) * 125)
+    print(
+        f"DEBUG: Preprocessed {len(images)} image(s): {bytes_before / 1024:.0f} KB -> {bytes_after / 1024:.0f} KB "
+        f"in {elapsed_ms:.0f} ms (est. upload saved: {upload_ms_saved:.0f} ms)"
+    )
+
+    if stats is not None:
+        stats.update({
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+            "preprocess_ms": round(elapsed_ms, 1),
+            "estimated_upload_ms_saved": round(upload_ms_saved, 1)
+        })
+    return processed
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
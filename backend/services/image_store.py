@@ -0,0 +1,153 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+import database
+from repositories import stored_file_repo
+
+# Uploaded images are stored content-addressed (storage.content_name), so an image is kept
+# once however often it is uploaded (an OCR scan followed by saving the purchase, the same
+# receipt in two purchases, ...). The stored_files table counts the rows referencing each
+# file: the repositories acquire references when receipt images, project images and OCR
+# jobs are created and release them when those are deleted. The garbage collector deletes
+# files (and their variants) that stayed unreferenced for storage.gc.grace_hours.
+_gc_started = False
+_gc_lock = threading.Lock()
+
+def _gc_config() -> Dict:
+    return ((database.config or {}).get("storage") or {}).get("gc") or {}
+
+def save(db: Session, fileobj, filename: Optional[str], variants: bool = False) -> str:
+    """
+    Stores an uploaded file and returns its storage name; the caller stores the name in a
+    row whose repository acquires the reference. With variants, thumbnails are scheduled
+    unless the content was stored (and rendered) before.
+    """
+    from storage import get_storage, file_extension
+    store = get_storage()
+    file_name, _ = store.store_content(
+        fileobj, file_extension(filename),
+        register=lambda name, size: stored_file_repo.register_file(db, name, size)
+    )
+    if variants and not store.get_variant_urls(file_name):
+        store.generate_variants(file_name)
+    return file_name
+
+async def save_upload(db: Session, upload, variants: bool = False) -> str:
+    """
+    save() for an UploadFile, streamed to storage without blocking the event loop.
+    Raises storage.UploadTooLargeError beyond storage.max_upload_size_mb.
+    """
+    from storage import get_storage, file_extension, max_upload_bytes
+    store = get_storage()
+    file_name, _ = await store.store_upload(
+        upload, file_extension(upload.filename),
+        register=lambda name, size: stored_file_repo.register_file(db, name, size),
+        max_bytes=max_upload_bytes()
+    )
+    if variants and not await asyncio.to_thread(store.get_variant_urls, file_name):
+        store.generate_variants(file_name)
+    return file_name
+
+async def save_uploads(db: Session, uploads: List, variants: bool = False) -> List[str]:
+    """Stores several uploads concurrently; returns their names in order, or raises the first error."""
+    results = await asyncio.gather(*(save_upload(db, upload, variants) for upload in uploads), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+def _delete_with_variants(store, file_name: str):
+    from storage import variant_name
+    from services import image_variants
+    store.delete_file(file_name)
+    for name in image_variants.sizes():
+        store.delete_file(variant_name(file_name, name))
+
+def _variant_original(file_name: str) -> Optional[str]:
+    """_variants/<name>/<original>.<ext> -> <original>"""
+    from storage import VARIANTS_DIR
+    parts = file_name.split("/", 2)
+    if len(parts) < 3 or parts[0] != VARIANTS_DIR:
+        return None
+    return os.path.splitext(parts[2])[0]
+
+def collect_garbage(db: Session) -> Dict[str, int]:
+    """
+    Releases the originals of archived receipt images once they are no longer kept, deletes
+    files unreferenced for longer than the grace period, then sweeps the storage
+    for files no row knows about (interrupted uploads, files of rows deleted before
+    reference counting) and variants whose original is gone.
+    """
+    from storage import get_storage, TMP_DIR
+    from services import image_archive
+    store = get_storage()
+    # Originals of archived receipt images past their retention become unreferenced first
+    released = image_archive.release_originals(db)
+    if released:
+        print(f"DEBUG: Released {released} original(s) of archived receipt images")
+    cutoff = datetime.utcnow() - timedelta(hours=float(_gc_config().get("grace_hours", 24)))
+    # Safety net against drifted counts: never delete what a row still points to
+    referenced = stored_file_repo.get_referenced_names(db)
+
+    deleted = 0
+    for file_name in stored_file_repo.get_unreferenced(db, cutoff):
+        if file_name in referenced:
+            print(f"DEBUG: Stored file {file_name} has no counted references but is still used; keeping it")
+            stored_file_repo.acquire(db, [file_name])
+            continue
+        # The row is deleted only once the file is gone, so a concurrent upload of the same
+        # content (register_file) waits for this transaction and then writes the file again
+        if stored_file_repo.delete_unreferenced(db, file_name, cutoff):
+            _delete_with_variants(store, file_name)
+            deleted += 1
+        db.commit()
+
+    known = stored_file_repo.get_file_names(db) | referenced
+    cutoff_time = time.time() - (datetime.utcnow() - cutoff).total_seconds()
+    swept = 0
+    for file_name, modified in list(store.list_files()):
+        if modified >= cutoff_time:
+            continue
+        original = _variant_original(file_name)
+        if original is not None:
+            orphan = original not in known and not store.exists(original)
+        else:
+            orphan = file_name.startswith(f"{TMP_DIR}/") or file_name not in known
+        if orphan:
+            store.delete_file(file_name)
+            swept += 1
+
+    if deleted or swept:
+        print(f"DEBUG: Image GC deleted {deleted} unreferenced and {swept} orphaned files")
+    return {"deleted": deleted, "swept": swept}
+
+def _run_gc():
+    db = database.SessionLocal()
+    try:
+        collect_garbage(db)
+    finally:
+        db.close()
+
+def start_gc():
+    """Starts the daemon thread running the GC every storage.gc.interval_hours (first run at startup)."""
+    global _gc_started
+    with _gc_lock:
+        if _gc_started or not _gc_config().get("enabled", True):
+            return
+        _gc_started = True
+
+    interval = float(_gc_config().get("interval_hours", 6)) * 3600
+
+    def _loop():
+        while True:
+            try:
+                _run_gc()
+            except Exception as e:
+                print(f"DEBUG: Error in image GC: {e}")
+            time.sleep(interval)
+
+    threading.Thread(target=_loop, name="image-gc", daemon=True).start()
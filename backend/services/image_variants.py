@@ -0,0 +1,158 @@
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+import cv2
+import numpy as np
+
+# Downscaled copies ("variants") of receipt and project images, so previews do not
+# download the original phone photos. Uploads schedule them; one background task renders
+# them in a process pool and stores them next to the originals (see storage.variant_name).
+_pool: Optional[ProcessPoolExecutor] = None
+_queue: Optional[asyncio.Queue] = None
+_worker: Optional[asyncio.Task] = None
+
+# Variant name -> maximum width in pixels
+DEFAULT_SIZES = {"thumb": 320, "medium": 1280}
+
+_ENCODINGS = {
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+}
+
+def _variants_config() -> Dict:
+    from database import config
+    return ((config or {}).get("storage") or {}).get("variants") or {}
+
+def enabled() -> bool:
+    return bool(_variants_config().get("enabled", True))
+
+def sizes() -> Dict[str, int]:
+    """Configured variants (name -> width), smallest first."""
+    configured = _variants_config().get("sizes") or DEFAULT_SIZES
+    return dict(sorted(((name, int(width)) for name, width in configured.items()), key=lambda pair: pair[1]))
+
+def extension() -> str:
+    return _ENCODINGS.get(_variants_config().get("format", "webp"), _ENCODINGS["webp"])[0].lstrip(".")
+
+def render_variants(content: bytes, widths: Dict[str, int], format: str = "webp", quality: int = 75) -> Dict[str, bytes]:
+    """
+    Renders the variants of one image (runs in the pool). Images are never upscaled:
+    variants wider than the original are skipped, except the smallest one.
+    """
+    # imdecode applies the EXIF orientation flag
+    image = cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Image could not be decoded")
+
+    suffix, quality_flag = _ENCODINGS.get(format, _ENCODINGS["webp"])
+    width = image.shape[1]
+    variants = {}
+    for name, max_width in sorted(widths.items(), key=lambda pair: pair[1]):
+        if max_width >= width and variants:
+            break
+        resized = image
+        if max_width < width:
+            scale = max_width / width
+            resized = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode(suffix, resized, [quality_flag, int(quality)])
+        if not ok:
+            raise ValueError(f"Could not encode {format} variant")
+        variants[name] = buffer.tobytes()
+    return variants
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=max(1, int(_variants_config().get("workers", 1))),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+async def generate(file_name: str) -> List[str]:
+    """Renders and stores the variants of a stored image; returns the stored variant names."""
+    from storage import get_storage, variant_name
+    store = get_storage()
+    loop = asyncio.get_running_loop()
+    config = _variants_config()
+
+    content = await loop.run_in_executor(None, store.read_file, file_name)
+    variants = await loop.run_in_executor(
+        _get_pool(), render_variants, content, sizes(), config.get("format", "webp"), int(config.get("quality", 75))
+    )
+    stored = []
+    for name, data in variants.items():
+        destination = variant_name(file_name, name)
+        await loop.run_in_executor(None, store.upload_fileobj, io.BytesIO(data), destination)
+        stored.append(destination)
+    print(f"DEBUG: Stored {len(stored)} variant(s) of {file_name}: {len(content) / 1024:.0f} KB -> "
+          f"{', '.join(f'{len(data) / 1024:.0f} KB' for data in variants.values())}")
+    return stored
+
+def schedule(file_name: str) -> bool:
+    """Queues variant generation for a stored image; False if the worker is not running."""
+    if _queue is None or not enabled():
+        return False
+    _queue.put_nowait(file_name)
+    return True
+
+def missing(db) -> List[str]:
+    """Images stored before variants existed (or whose generation was interrupted). Checks storage, so call it off the event loop."""
+    import models
+    from storage import get_storage
+    store = get_storage()
+    paths = [row.file_path for row in db.query(models.ReceiptImage.file_path)]
+    paths += [row.image_path for row in db.query(models.Project.image_path).filter(models.Project.image_path.isnot(None))]
+    return [path for path in paths if not store.get_variant_urls(path)]
+
+def _find_missing() -> List[str]:
+    import database
+    db = database.SessionLocal()
+    try:
+        return missing(db)
+    finally:
+        db.close()
+
+async def backfill() -> int:
+    """Schedules the missing variants, checking storage in a thread."""
+    scheduled = 0
+    for path in await asyncio.to_thread(_find_missing):
+        if schedule(path):
+            scheduled += 1
+    return scheduled
+
+async def _run():
+    try:
+        scheduled = await backfill()
+        if scheduled:
+            print(f"DEBUG: Scheduled variants for {scheduled} existing image(s)")
+    except Exception as e:
+        print(f"DEBUG: Variant backfill failed: {e}")
+    while True:
+        file_name = await _queue.get()
+        try:
+            await generate(file_name)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"DEBUG: Failed to generate variants of {file_name}: {e}")
+
+def start_worker():
+    """Starts the variant worker on the running loop and schedules missing variants."""
+    global _queue, _worker
+    if _worker is not None or not enabled():
+        return
+    _queue = asyncio.Queue()
+    _worker = asyncio.create_task(_run())
+
+async def stop_worker():
+    global _queue, _worker, _pool
+    if _worker is not None:
+        _worker.cancel()
+        await asyncio.gather(_worker, return_exceptions=True)
+    _queue = _worker = None
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
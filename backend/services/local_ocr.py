@@ -0,0 +1,148 @@
+import asyncio
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+from services.image_preprocessing import find_receipt_box
+
+# Offline receipt reading: OpenCV cleanup + Tesseract in a process pool, and a line
+# parser turning the recognized text into items. Used by the 'local' OCR engines.
+_pool: Optional[ProcessPoolExecutor] = None
+
+# Tesseract works best with text around 30px high; receipts narrower than this are upscaled
+MIN_WIDTH = 1200
+
+_PRICE = r"(-?\d{1,5}[.,]\d{2})"
+# "TORTELACCIO   35,00 €" / "Milk 2.50" / "Sugar 1,99 A"
+_ITEM_LINE = re.compile(r"^(?P<name>.*?[A-Za-z].*?)\s+" + _PRICE + r"\s*(?:€|EUR|\$|£|[A-Z])?\s*$")
+# "2X   17,50 €" / "2 x 17.50" / "2X" (quantity of the next line)
+_QUANTITY_LINE = re.compile(r"^(?P<qty>\d{1,3})\s*[xX*]\s*(?:" + _PRICE + r")?\s*(?:€|EUR|\$|£)?\s*$")
+# "2 x 3.50 Milk" (quantity and unit price in front of the name)
+_INLINE_QUANTITY = re.compile(r"^(?P<qty>\d{1,3})\s*[xX*]\s*" + _PRICE + r"\s+")
+# Lines that are about the receipt, not an item. Only keywords at the start of a line
+# count: "Granola Bar 1.99" or "Birthday Card 3.50" are items, "Bar 20,00" is a payment.
+_TOTAL_LINE = re.compile(
+    r"^\s*(sub-?total|total|zwischensumme|summe|sum|gesamt|balance|paid|amount due)\b",
+    re.IGNORECASE
+)
+# Tax and payment keywords followed by amounts only ("VAT 20% 1.20", "Card: 12.50"), not
+# by another word ("Tax Free Chips 2.00"); card brands followed by anything
+_PAYMENT_LINE = re.compile(
+    r"^\s*(?:(?:visa|mastercard|maestro|amex)\b.*\d|"
+    r"(?:tax|vat|tva|mwst|ust|card|karte|carte|cash|bar|change|rendu|tip)\b(?![\s:]*[A-Za-z]{2,}).*\d)",
+    re.IGNORECASE
+)
+
+def _to_float(value: str) -> float:
+    return float(value.replace(",", "."))
+
+def parse_receipt_text(text: str) -> List[Dict]:
+    """
+    Extracts items from OCR'd receipt text, in the same shape as the Vision AI's items
+    (extracted_name, price, quantity, discount). 'price' is the unit price when a
+    quantity line ("2X 17,50") precedes the item; negative lines are discounts of the
+    item above them.
+    """
+    items = []
+    pending_quantity = None
+    pending_unit_price = None
+
+    for line in (l.strip() for l in text.splitlines()):
+        if not line:
+            continue
+
+        quantity_match = _QUANTITY_LINE.match(line)
+        if quantity_match:
+            pending_quantity = int(quantity_match.group("qty"))
+            pending_unit_price = _to_float(quantity_match.group(2)) if quantity_match.group(2) else None
+            continue
+
+        if _TOTAL_LINE.match(line) or _PAYMENT_LINE.match(line):
+            pending_quantity = pending_unit_price = None
+            continue
+
+        item_match = _ITEM_LINE.match(line)
+        if not item_match:
+            continue
+
+        name = item_match.group("name")
+        price = _to_float(item_match.group(2))
+        if price < 0:
+            if items:
+                items[-1]["discount"] = round(items[-1]["discount"] - price, 2)
+            continue
+
+        quantity = pending_quantity or 1
+        inline = _INLINE_QUANTITY.match(name)
+        if inline:
+            quantity = int(inline.group("qty"))
+            pending_unit_price = _to_float(inline.group(2))
+            name = name[inline.end():]
+
+        if quantity > 1:
+            price = pending_unit_price if pending_unit_price is not None else round(price / quantity, 2)
+
+        name = re.sub(r"\s{2,}", " ", name).strip(" .:-*")
+        if name:
+            items.append({"extracted_name": name, "price": price, "quantity": quantity, "discount": 0.0})
+        pending_quantity = pending_unit_price = None
+
+    return items
+
+def ocr_image(content: bytes, options: Dict) -> Dict:
+    """
+    Reads one receipt photo with Tesseract (runs in the pool). Returns the text (one
+    line per recognized line) and the mean word confidence (0-100).
+    """
+    import pytesseract
+
+    gray = cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        raise ValueError("Image could not be decoded")
+
+    box = find_receipt_box(gray, int(options.get("threshold1", 100)), int(options.get("threshold2", 200)))
+    if box:
+        x, y, w, h = box
+        gray = gray[y:y + h, x:x + w]
+
+    if gray.shape[1] < MIN_WIDTH:
+        scale = MIN_WIDTH / gray.shape[1]
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    binary = cv2.threshold(cv2.GaussianBlur(gray, (3, 3), 0), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+
+    data = pytesseract.image_to_data(
+        binary, lang=options.get("lang", "eng"), config="--psm 6", output_type=pytesseract.Output.DICT
+    )
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        if not word.strip() or conf < 0:
+            continue
+        lines.setdefault((data["block_num"][i], data["par_num"][i], data["line_num"][i]), []).append(word)
+        confidences.append(conf)
+
+    return {
+        "text": "\n".join(" ".join(words) for _, words in sorted(lines.items())),
+        "confidence": sum(confidences) / len(confidences) if confidences else 0.0
+    }
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+async def ocr_images(images: List[Tuple[bytes, str]], options: Dict) -> List[Dict]:
+    """Runs ocr_image for all images concurrently in the process pool."""
+    loop = asyncio.get_running_loop()
+    pool = _get_pool(int(options.get("workers", 2)))
+    return await asyncio.gather(*(loop.run_in_executor(pool, ocr_image, content, options) for content, _ in images))
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -1,7 +1,35 @@
-from typing import List, Optional, Dict
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Dict, Tuple
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 import models
 from collections import Counter
+from database import dialect_insert
+from repositories import consensus_repo
+from services.friendly_name_automaton import FriendlyNameAutomaton
+
+# In-memory automata: one per user over their FriendlyName rows (kept in sync by
+# set_friendly_names), and one global automaton over the friendly_name_consensus
+# table. Writes mark substrings dirty; a background job re-materializes their
+# consensus rows and patches the global automaton.
+_automata_lock = threading.RLock()
+_user_automata: Dict[int, FriendlyNameAutomaton] = {}
+_global_automaton: Optional[FriendlyNameAutomaton] = None
+_dirty_substrings = set()
+_consensus_rebuild_pending = False
+
+# Category mappings: LRU of per-user friendly_name -> categories maps, plus a global
+# consensus map (most common categories per friendly name) refreshed in the background.
+_category_lock = threading.RLock()
+_user_categories: "OrderedDict[int, Dict[str, Dict[str, Optional[str]]]]" = OrderedDict()
+_global_categories: Optional[Dict[str, Dict[str, Optional[str]]]] = None
+_refresher_started = False
+
+def _mapping_config() -> Dict:
+    from database import config
+    return (config or {}).get("mapping") or {}
 
 def generate_all_substrings(text: str) -> List[str]:
     """
@@ -16,47 +44,134 @@ def generate_all_substrings(text: str) -> List[str]:
             substrings.append(" ".join(words[i:j]))
     return substrings
 
-def find_most_common_friendly_name(mappings: List[models.FriendlyName]) -> Optional[str]:
-    if not mappings:
+def pick_winner(counts: Counter) -> Optional[str]:
+    """Returns the friendly name with the highest count, or None if empty or tied."""
+    most_common = counts.most_common(2)
+    if not most_common:
         return None
-    
-    names = [m.friendly_name for m in mappings]
-    counts = Counter(names)
-    most_common = counts.most_common()
-    
     if len(most_common) > 1 and most_common[0][1] == most_common[1][1]:
         # It's a tie
         return None
-    
     return most_common[0][0]
 
+def find_most_common_friendly_name(mappings: List[models.FriendlyName]) -> Optional[str]:
+    counts = Counter()
+    for m in mappings:
+        counts[m.friendly_name] += m.hits or 1
+    return pick_winner(counts)
+
+def _get_user_automaton(db: Session, user_id: int) -> FriendlyNameAutomaton:
+    with _automata_lock:
+        automaton = _user_automata.get(user_id)
+        if automaton is None:
+            automaton = FriendlyNameAutomaton()
+            rows = db.query(
+                models.FriendlyName.substring, models.FriendlyName.friendly_name, models.FriendlyName.hits
+            ).filter(
+                models.FriendlyName.user_id == user_id
+            ).all()
+            for substring, friendly_name, hits in rows:
+                automaton.add(substring, friendly_name, hits)
+            _user_automata[user_id] = automaton
+        return automaton
+
+def _load_global_automaton(db: Session) -> FriendlyNameAutomaton:
+    if consensus_repo.count_consensus(db) == 0:
+        # First start on this database (or empty table): materialize it once
+        consensus_repo.rebuild_consensus(db)
+
+    automaton = FriendlyNameAutomaton()
+    for substring, friendly_name, hits in consensus_repo.get_consensus_winners(db):
+        automaton.add(substring, friendly_name, hits)
+    return automaton
+
+def _get_global_automaton(db: Session) -> FriendlyNameAutomaton:
+    global _global_automaton
+    with _automata_lock:
+        if _global_automaton is None:
+            _global_automaton = _load_global_automaton(db)
+        return _global_automaton
+
+def refresh_friendly_name_consensus(db: Optional[Session] = None, full: bool = False):
+    """
+    Applies pending friendly_names writes to the consensus table and the global automaton:
+    only the dirty substrings are recomputed, unless a full rebuild is requested or pending.
+    """
+    global _global_automaton, _consensus_rebuild_pending
+    with _automata_lock:
+        full = full or _consensus_rebuild_pending
+        dirty = list(_dirty_substrings)
+        _dirty_substrings.clear()
+        _consensus_rebuild_pending = False
+    if not full and not dirty:
+        return
+
+    own_session = db is None
+    if own_session:
+        from database import SessionLocal
+        db = SessionLocal()
+    try:
+        if full:
+            consensus_repo.rebuild_consensus(db)
+            automaton = _load_global_automaton(db)
+            with _automata_lock:
+                _global_automaton = automaton
+        else:
+            rows = consensus_repo.refresh_consensus(db, dirty)
+            with _automata_lock:
+                if _global_automaton is not None:
+                    for substring, row in rows.items():
+                        weights = {row["friendly_name"]: row["hits"]} if row and not row["is_tie"] else {}
+                        _global_automaton.set_weights(substring, weights)
+    except Exception:
+        # Keep the work for the next run
+        with _automata_lock:
+            _dirty_substrings.update(dirty)
+            _consensus_rebuild_pending = _consensus_rebuild_pending or full
+        raise
+    finally:
+        if own_session:
+            db.close()
+
+def invalidate_friendly_name_cache(user_id: Optional[int] = None):
+    """
+    Drops cached user automata so they are reloaded from the DB on next use, and schedules
+    a full consensus rebuild. Needed after FriendlyName rows change outside
+    set_friendly_names (e.g. user deletion).
+    """
+    global _consensus_rebuild_pending
+    with _automata_lock:
+        if user_id is None:
+            _user_automata.clear()
+        else:
+            _user_automata.pop(user_id, None)
+        _consensus_rebuild_pending = True
+
 def get_friendly_name(db: Session, original_name: str, user_id: int) -> str:
     """
     Logic from Section 9.1:
     1. Check user-specific mappings for all substrings.
     2. Check global mappings for all substrings.
     3. Default to original.
+
+    Instead of querying every word substring, the name is scanned once by the
+    cached automata, so a warm lookup needs no DB round trip. The global step votes
+    with the per-substring winners of the friendly_name_consensus table.
     """
     try:
-        substrings = generate_all_substrings(original_name)
-        
         # Step 1: Check user-specific mappings
-        user_mappings = db.query(models.FriendlyName).filter(
-            models.FriendlyName.user_id == user_id,
-            models.FriendlyName.substring.in_(substrings)
-        ).all()
+        with _automata_lock:
+            user_counts = _get_user_automaton(db, user_id).match(original_name)
         
-        winner = find_most_common_friendly_name(user_mappings)
+        winner = pick_winner(user_counts)
         if winner:
             return winner
             
-        # Step 2: Check global mappings
-        global_mappings = db.query(models.FriendlyName).filter(
-            models.FriendlyName.substring.in_(substrings),
-            models.FriendlyName.user_id != user_id
-        ).all()
+        # Step 2: Check global mappings (consensus across all users)
+        with _automata_lock:
+            global_counts = _get_global_automaton(db).match(original_name)
         
-        winner = find_most_common_friendly_name(global_mappings)
+        winner = pick_winner(global_counts)
         if winner:
             return winner
     except Exception as e:
@@ -65,35 +180,67 @@ def get_friendly_name(db: Session, original_name: str, user_id: int) -> str:
     # Step 3: Default
     return original_name
 
+def get_friendly_names(db: Session, original_names: List[str], user_id: int) -> Dict[str, str]:
+    """
+    Batch variant of get_friendly_name. Lookups run against the cached automata,
+    so resolving N names costs at most the two automaton loads, not N queries.
+    """
+    return {name: get_friendly_name(db, name, user_id) for name in dict.fromkeys(original_names) if name}
+
 def set_friendly_name(db: Session, original_name: str, friendly_name: str, user_id: int):
     """
     Logic from Section 9.2:
     Store mappings for each substring of the original name.
+    Every (user, substring, friendly_name) pair is one row; storing it again increments hits.
+    """
+    set_friendly_names(db, [(original_name, friendly_name)], user_id)
+
+def set_friendly_names(db: Session, pairs: List[Tuple[str, str]], user_id: int):
+    """
+    Batch variant of set_friendly_name for (original_name, friendly_name) pairs,
+    written with a single upsert statement.
     """
     try:
-        substrings = generate_all_substrings(original_name)
-        
-        for sub in substrings:
-            # Check if this exact mapping already exists for this user
-            existing = db.query(models.FriendlyName).filter(
-                models.FriendlyName.user_id == user_id,
-                models.FriendlyName.substring == sub,
-                models.FriendlyName.friendly_name == friendly_name
-            ).first()
-            
-            if not existing:
-                new_mapping = models.FriendlyName(
-                    user_id=user_id,
-                    substring=sub,
-                    friendly_name=friendly_name
-                )
-                db.add(new_mapping)
-        
+        # Aggregate first: a single upsert statement may not touch the same row twice
+        hits = Counter()
+        for original_name, friendly_name in pairs:
+            if not friendly_name:
+                continue
+            for sub in dict.fromkeys(generate_all_substrings(original_name)):
+                hits[(sub, friendly_name)] += 1
+        if not hits:
+            return
+
+        insert = dialect_insert(db)
+        stmt = insert(models.FriendlyName).values([
+            {"user_id": user_id, "substring": sub, "friendly_name": friendly_name, "hits": count}
+            for (sub, friendly_name), count in hits.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "substring", "friendly_name"],
+            set_={"hits": models.FriendlyName.hits + stmt.excluded.hits}
+        )
+        db.execute(stmt)
         db.commit()
+
+        # Keep the user's automaton in sync; the global consensus follows in the background
+        with _automata_lock:
+            automaton = _user_automata.get(user_id)
+            if automaton is not None:
+                for (sub, friendly_name), count in hits.items():
+                    automaton.add(sub, friendly_name, count)
+            _dirty_substrings.update(sub for sub, _ in hits)
     except Exception as e:
-        print(f"DEBUG: Error in set_friendly_name: {e}")
+        print(f"DEBUG: Error in set_friendly_names: {e}")
         db.rollback()
 
+def _categories_of(mapping: models.CategoryMapping) -> Dict[str, Optional[str]]:
+    return {
+        "category_level_1": mapping.category_level_1,
+        "category_level_2": mapping.category_level_2,
+        "category_level_3": mapping.category_level_3
+    }
+
 def get_category_mapping(db: Session, friendly_name: str, user_id: int) -> Optional[Dict[str, Optional[str]]]:
     """
     Retrieves stored categories for a given friendly name.
@@ -103,37 +250,150 @@ def get_category_mapping(db: Session, friendly_name: str, user_id: int) -> Optio
     """
     if not friendly_name:
         return None
-        
+    return get_category_mappings(db, [friendly_name], user_id).get(friendly_name)
+
+def _get_user_categories(db: Session, user_id: int) -> Dict[str, Dict[str, Optional[str]]]:
+    with _category_lock:
+        categories = _user_categories.get(user_id)
+        if categories is None:
+            categories = {}
+            mappings = db.query(models.CategoryMapping).filter(
+                models.CategoryMapping.user_id == user_id
+            ).order_by(models.CategoryMapping.mapping_id).all()
+            for mapping in mappings:
+                categories.setdefault(mapping.friendly_name, _categories_of(mapping))
+
+            _user_categories[user_id] = categories
+            max_users = int(_mapping_config().get("category_cache_users", 256))
+            while len(_user_categories) > max_users:
+                _user_categories.popitem(last=False)
+
+        _user_categories.move_to_end(user_id)
+        return categories
+
+def compute_global_category_consensus(db: Session) -> Dict[str, Dict[str, Optional[str]]]:
+    """
+    For every friendly name, the category triple used by most mappings across all users.
+    Ties go to the oldest mapping.
+    """
+    rows = db.query(
+        models.CategoryMapping.friendly_name,
+        models.CategoryMapping.category_level_1,
+        models.CategoryMapping.category_level_2,
+        models.CategoryMapping.category_level_3,
+        func.count(models.CategoryMapping.mapping_id),
+        func.min(models.CategoryMapping.mapping_id)
+    ).group_by(
+        models.CategoryMapping.friendly_name,
+        models.CategoryMapping.category_level_1,
+        models.CategoryMapping.category_level_2,
+        models.CategoryMapping.category_level_3
+    ).all()
+
+    best = {}
+    for friendly_name, c1, c2, c3, count, first_id in rows:
+        current = best.get(friendly_name)
+        if current is None or (count, -first_id) > (current[0], -current[1]):
+            best[friendly_name] = (count, first_id, {
+                "category_level_1": c1,
+                "category_level_2": c2,
+                "category_level_3": c3
+            })
+    return {name: entry[2] for name, entry in best.items()}
+
+def refresh_global_category_consensus(db: Optional[Session] = None):
+    global _global_categories
+    own_session = db is None
+    if own_session:
+        from database import SessionLocal
+        db = SessionLocal()
     try:
-        # Step 1: User-specific
-        mapping = db.query(models.CategoryMapping).filter(
-            models.CategoryMapping.user_id == user_id,
-            models.CategoryMapping.friendly_name == friendly_name
-        ).first()
-        
-        if mapping:
-            return {
-                "category_level_1": mapping.category_level_1,
-                "category_level_2": mapping.category_level_2,
-                "category_level_3": mapping.category_level_3
-            }
-            
-        # Step 2: Global (fallback)
-        global_mapping = db.query(models.CategoryMapping).filter(
-            models.CategoryMapping.friendly_name == friendly_name,
-            models.CategoryMapping.user_id != user_id
-        ).first()
-        
-        if global_mapping:
-            return {
-                "category_level_1": global_mapping.category_level_1,
-                "category_level_2": global_mapping.category_level_2,
-                "category_level_3": global_mapping.category_level_3
-            }
+        consensus = compute_global_category_consensus(db)
+        with _category_lock:
+            _global_categories = consensus
+    finally:
+        if own_session:
+            db.close()
+
+def _get_global_categories(db: Session) -> Dict[str, Dict[str, Optional[str]]]:
+    with _category_lock:
+        if _global_categories is None:
+            refresh_global_category_consensus(db)
+        return _global_categories
+
+def _run_periodically(name: str, interval: int, job):
+    def _loop():
+        while True:
+            try:
+                job()
+            except Exception as e:
+                print(f"DEBUG: Error in background job {name}: {e}")
+            time.sleep(interval)
+
+    threading.Thread(target=_loop, name=name, daemon=True).start()
+
+def start_background_jobs():
+    """
+    Starts the daemon threads that keep the global mapping data fresh:
+    - the category consensus map, rebuilt every mapping.global_refresh_seconds
+    - the friendly-name consensus table and automaton, rebuilt once at startup (picks up
+      writes that were pending when the last process stopped) and then refreshed
+      incrementally every mapping.consensus_refresh_seconds
+    """
+    global _refresher_started, _consensus_rebuild_pending
+    with _category_lock:
+        if _refresher_started:
+            return
+        _refresher_started = True
+
+    config = _mapping_config()
+    _run_periodically(
+        "category-consensus-refresher",
+        int(config.get("global_refresh_seconds", 300)),
+        refresh_global_category_consensus
+    )
+
+    with _automata_lock:
+        _consensus_rebuild_pending = True
+    _run_periodically(
+        "friendly-name-consensus-refresher",
+        int(config.get("consensus_refresh_seconds", 30)),
+        refresh_friendly_name_consensus
+    )
+
+def invalidate_category_cache(user_id: Optional[int] = None):
+    """Drops cached category maps (e.g. after user deletion); the global map is rebuilt on next use."""
+    global _global_categories
+    with _category_lock:
+        if user_id is None:
+            _user_categories.clear()
+        else:
+            _user_categories.pop(user_id, None)
+        _global_categories = None
+
+def get_category_mappings(db: Session, friendly_names: List[str], user_id: int) -> Dict[str, Dict[str, Optional[str]]]:
+    """
+    Batch variant of get_category_mapping, served from the cached maps.
+    Names without any mapping are absent from the result.
+    """
+    names = [n for n in dict.fromkeys(friendly_names) if n]
+    result = {}
+    if not names:
+        return result
+
+    try:
+        # Step 1: User-specific, Step 2: Global consensus (fallback)
+        user_categories = _get_user_categories(db, user_id)
+        global_categories = _get_global_categories(db)
+
+        for name in names:
+            categories = user_categories.get(name) or global_categories.get(name)
+            if categories:
+                result[name] = dict(categories)
     except Exception as e:
-        print(f"DEBUG: Error in get_category_mapping: {e}")
-    
-    return None
+        print(f"DEBUG: Error in get_category_mappings: {e}")
+
+    return result
 
 def set_category_mapping(db: Session, friendly_name: str, categories: Dict[str, Optional[str]], user_id: int):
     """
@@ -141,37 +401,109 @@ def set_category_mapping(db: Session, friendly_name: str, categories: Dict[str,
     """
     if not friendly_name:
         return
+    set_category_mappings(db, {friendly_name: categories}, user_id)
+
+def set_category_mappings(db: Session, categories_by_name: Dict[str, Dict[str, Optional[str]]], user_id: int):
+    """
+    Batch variant of set_category_mapping: one query for the existing rows, one commit.
+    """
+    categories_by_name = {n: c for n, c in categories_by_name.items() if n}
+    if not categories_by_name:
+        return
 
     try:
         # Check existing
-        mapping = db.query(models.CategoryMapping).filter(
+        existing = {}
+        mappings = db.query(models.CategoryMapping).filter(
             models.CategoryMapping.user_id == user_id,
-            models.CategoryMapping.friendly_name == friendly_name
-        ).first()
-        
-        c1 = categories.get("category_level_1")
-        c2 = categories.get("category_level_2")
-        c3 = categories.get("category_level_3")
+            models.CategoryMapping.friendly_name.in_(list(categories_by_name))
+        ).order_by(models.CategoryMapping.mapping_id).all()
+        for mapping in mappings:
+            existing.setdefault(mapping.friendly_name, mapping)
 
-        # Only update if at least one category is provided?
         # User requirement: "When he saves... category mapping is updated for all items that have any category."
         # If user clears categories, should we clear mapping? probably.
-        
-        if mapping:
-            mapping.category_level_1 = c1
-            mapping.category_level_2 = c2
-            mapping.category_level_3 = c3
-        else:
-            new_mapping = models.CategoryMapping(
-                user_id=user_id,
-                friendly_name=friendly_name,
-                category_level_1=c1,
-                category_level_2=c2,
-                category_level_3=c3
-            )
-            db.add(new_mapping)
-        
+        for friendly_name, categories in categories_by_name.items():
+            c1 = categories.get("category_level_1")
+            c2 = categories.get("category_level_2")
+            c3 = categories.get("category_level_3")
+
+            mapping = existing.get(friendly_name)
+            if mapping:
+                mapping.category_level_1 = c1
+                mapping.category_level_2 = c2
+                mapping.category_level_3 = c3
+            else:
+                db.add(models.CategoryMapping(
+                    user_id=user_id,
+                    friendly_name=friendly_name,
+                    category_level_1=c1,
+                    category_level_2=c2,
+                    category_level_3=c3
+                ))
+
         db.commit()
+
+        # Write through to the caches
+        with _category_lock:
+            user_categories = _user_categories.get(user_id)
+            for friendly_name, categories in categories_by_name.items():
+                entry = {
+                    "category_level_1": categories.get("category_level_1"),
+                    "category_level_2": categories.get("category_level_2"),
+                    "category_level_3": categories.get("category_level_3")
+                }
+                if user_categories is not None:
+                    user_categories[friendly_name] = entry
+                if _global_categories is not None:
+                    _global_categories.setdefault(friendly_name, entry)
     except Exception as e:
-        print(f"DEBUG: Error in set_category_mapping: {e}")
+        print(f"DEBUG: Error in set_category_mappings: {e}")
         db.rollback()
+
+def resolve_names(db: Session, original_names: List[str], user_id: int) -> Dict[str, Dict[str, Optional[str]]]:
+    """
+    Resolves friendly names and their category mappings for many extracted names at once
+    (Section 9.3 steps 5-6). Keyed by original name.
+    """
+    friendly_names = get_friendly_names(db, original_names, user_id)
+    categories = get_category_mappings(db, list(friendly_names.values()), user_id)
+
+    resolved = {}
+    for original_name, friendly_name in friendly_names.items():
+        cats = categories.get(friendly_name) or {}
+        resolved[original_name] = {
+            "friendly_name": friendly_name,
+            "category_level_1": cats.get("category_level_1"),
+            "category_level_2": cats.get("category_level_2"),
+            "category_level_3": cats.get("category_level_3")
+        }
+    return resolved
+
+def map_extracted_items(db: Session, items: List[Dict], user_id: int) -> List[Dict]:
+    """
+    Applies friendly-name and category mapping to items extracted from a receipt
+    (Section 9.3 steps 5-6), in place. Items keep their original name if mapping fails.
+    """
+    names = [item.get("extracted_name") for item in items if item.get("extracted_name")]
+    try:
+        resolved = resolve_names(db, names, user_id)
+    except Exception as me:
+        print(f"DEBUG: Mapping service error: {me}")
+        resolved = {}
+
+    for item in items:
+        original_name = item.get("extracted_name")
+        if original_name:
+            mapping = resolved.get(original_name)
+            if not mapping:
+                item["friendly_name"] = original_name
+                continue
+            item["friendly_name"] = mapping["friendly_name"]
+
+            # Auto-fill categories from database
+            if mapping["category_level_1"] or mapping["category_level_2"] or mapping["category_level_3"]:
+                item["category_level_1"] = mapping["category_level_1"]
+                item["category_level_2"] = mapping["category_level_2"]
+                item["category_level_3"] = mapping["category_level_3"]
+    return items
@@ -0,0 +1,204 @@
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional
+from sqlalchemy.orm import Session
+from repositories import ocr_metrics_repo
+
+# OCR instrumentation: timing spans per stage (read, preprocess, encode, model, parse,
+# mapping, ...) and counters (bytes, tokens, model requests, failures).
+#  - Per scan, spans and counters go into the scan's stats dict ("timings", "usage"),
+#    which ends up in the job result and, via record_scan, in the ocr_scan_metrics table.
+#  - Per process, they feed the in-memory totals returned by snapshot().
+# The stats dict of the scan (or image chunk) being processed is found through a context
+# variable, so deeper layers (the model call) can report without passing it around.
+_current_stats: ContextVar[Optional[Dict]] = ContextVar("ocr_stats", default=None)
+
+# Latest samples per stage used for the percentiles in snapshot()
+SAMPLES_PER_STAGE = 1000
+
+class _Stage:
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples: Deque[float] = deque(maxlen=SAMPLES_PER_STAGE)
+
+    def observe(self, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.samples.append(elapsed_ms)
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "p50_ms": round(_percentile(self.samples, 50), 1),
+            "p95_ms": round(_percentile(self.samples, 95), 1),
+            "max_ms": round(self.max_ms, 1)
+        }
+
+_stages: Dict[str, _Stage] = {}
+_counters: Counter = Counter()
+_started_at = datetime.utcnow()
+
+def _metrics_config() -> Dict:
+    from database import config
+    return ((config or {}).get("ocr") or {}).get("metrics") or {}
+
+def _percentile(values, percent: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+@contextmanager
+def collect(stats: Dict):
+    """Makes stats the target of span() and count() within the block (and tasks started in it)."""
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+@contextmanager
+def span(name: str, stats: Optional[Dict] = None):
+    """
+    Times the block as stage `name`: adds the milliseconds to stats["timings"][name + "_ms"]
+    (stats defaults to the collecting one) and to the process totals.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        target = stats if stats is not None else _current_stats.get()
+        if target is not None:
+            timings = target.setdefault("timings", {})
+            timings[f"{name}_ms"] = round(timings.get(f"{name}_ms", 0) + elapsed_ms, 1)
+        _stages.setdefault(name, _Stage()).observe(elapsed_ms)
+
+def count(name: str, value: int = 1, stats: Optional[Dict] = None):
+    """Adds value to stats["usage"][name] (stats defaults to the collecting one)."""
+    target = stats if stats is not None else _current_stats.get()
+    if target is not None:
+        usage = target.setdefault("usage", {})
+        usage[name] = usage.get(name, 0) + value
+
+def estimated_cost(prompt_tokens: int, completion_tokens: int) -> float:
+    """Token cost from ocr.metrics pricing (per million tokens)."""
+    config = _metrics_config()
+    return (
+        prompt_tokens * float(config.get("input_price_per_million", 0)) +
+        completion_tokens * float(config.get("output_price_per_million", 0))
+    ) / 1_000_000
+
+def record_scan(db: Session, stats: Dict, source: str, total_ms: float, user_id: Optional[int] = None,
+                job_id: Optional[int] = None, queue_ms: Optional[float] = None, error: Optional[str] = None):
+    """
+    Stores the per-scan record of a finished (or failed) scan and adds it to the process
+    counters. Never raises: metrics must not fail a scan.
+    """
+    usage = stats.setdefault("usage", {})
+    cache = stats.get("cache") or {}
+    engines = stats.get("engines") or {}
+    status = "failed" if error else ("partial" if stats.get("failed_images") else "done")
+    prompt_tokens = int(usage.get("prompt_tokens", 0))
+    completion_tokens = int(usage.get("completion_tokens", 0))
+    cost = estimated_cost(prompt_tokens, completion_tokens)
+    usage["cost"] = round(cost, 6)
+
+    _counters[f"scans_{status}"] += 1
+    _counters["cache_hits"] += int(cache.get("hits", 0))
+    _counters["cache_misses"] += int(cache.get("misses", 0))
+    for name in ("images", "image_bytes", "upload_bytes", "model_requests", "model_retries", "model_errors",
+                 "prompt_tokens", "completion_tokens"):
+        _counters[name] += int(usage.get(name, 0))
+    _counters["cost"] += cost
+
+    if not _metrics_config().get("enabled", True):
+        return
+    try:
+        ocr_metrics_repo.create_record(
+            db,
+            job_id=job_id,
+            user_id=user_id,
+            source=source,
+            status=status,
+            engine=",".join(sorted(engines)) or None,
+            images=int(usage.get("images", 0)),
+            image_bytes=int(usage.get("image_bytes", 0)),
+            upload_bytes=int(usage.get("upload_bytes", 0)),
+            model_requests=int(usage.get("model_requests", 0)),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost=cost,
+            cache_hit=bool(cache.get("hits")) and not cache.get("misses"),
+            queue_ms=round(queue_ms, 1) if queue_ms is not None else None,
+            total_ms=round(total_ms, 1),
+            timings=stats.get("timings"),
+            error=error
+        )
+    except Exception as e:
+        print(f"DEBUG: Failed to record OCR scan metrics: {e}")
+        db.rollback()
+
+def purge_records(db: Session) -> int:
+    return ocr_metrics_repo.delete_old_records(db, float(_metrics_config().get("retention_days", 90)))
+
+def snapshot() -> Dict:
+    """Totals of this backend process since it started."""
+    counters = dict(_counters)
+    if "cost" in counters:
+        counters["cost"] = round(counters["cost"], 6)
+    return {
+        "since": _started_at,
+        "counters": counters,
+        "stages": {name: stage.snapshot() for name, stage in sorted(_stages.items())}
+    }
+
+def summarize(db: Session, hours: float) -> Dict:
+    """Aggregates the stored scan records of the last `hours` (all backend processes)."""
+    records = ocr_metrics_repo.get_records_since(db, datetime.utcnow() - timedelta(hours=hours))
+    statuses = Counter(record.status for record in records)
+    stages: Dict[str, List[float]] = {}
+    for record in records:
+        for name, value in (record.timings or {}).items():
+            stages.setdefault(name[:-3] if name.endswith("_ms") else name, []).append(float(value))
+
+    def stats_of(values: List[float]) -> Dict:
+        return {
+            "mean": round(sum(values) / len(values), 1) if values else 0.0,
+            "p50": round(_percentile(values, 50), 1),
+            "p95": round(_percentile(values, 95), 1),
+            "max": round(max(values), 1) if values else 0.0
+        }
+
+    scans = len(records)
+    images = sum(record.images for record in records)
+    prompt_tokens = sum(record.prompt_tokens for record in records)
+    completion_tokens = sum(record.completion_tokens for record in records)
+    cost = sum(record.cost for record in records)
+    return {
+        "hours": hours,
+        "scans": scans,
+        "statuses": dict(statuses),
+        "cache_hits": sum(1 for record in records if record.cache_hit),
+        "images": images,
+        "image_bytes": sum(record.image_bytes for record in records),
+        "upload_bytes": sum(record.upload_bytes for record in records),
+        "model_requests": sum(record.model_requests for record in records),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost": round(cost, 6),
+        "cost_per_scan": round(cost / scans, 6) if scans else 0.0,
+        "tokens_per_image": round((prompt_tokens + completion_tokens) / images, 1) if images else 0.0,
+        "scans_per_hour": round(scans / hours, 2) if hours else 0.0,
+        "total_ms": stats_of([record.total_ms for record in records]),
+        "queue_ms": stats_of([record.queue_ms for record in records if record.queue_ms is not None]),
+        # Per stage, over the scans that ran it (e.g. model_ms only for cache misses)
+        "stages_ms": {name: stats_of(values) for name, values in sorted(stages.items())}
+    }
@@ -0,0 +1,237 @@
+import asyncio
+import time
+import traceback
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from fastapi import UploadFile
+from sqlalchemy.orm import Session
+import database
+from repositories import ocr_job_repo, purchase_repo, stored_file_repo, user_repo
+from services import image_store, mapping_service, ocr_metrics, ocr_service
+
+# OCR jobs live in the ocr_jobs table; a pool of asyncio worker tasks (started on app
+# startup) claims them one by one, so HTTP requests only store images and enqueue.
+_wakeup: Optional[asyncio.Event] = None
+_workers: List[asyncio.Task] = []
+
+def _ocr_config() -> Dict:
+    return (database.config or {}).get("ocr") or {}
+
+def batch_config() -> Dict:
+    return _ocr_config().get("batch") or {}
+
+async def _store_images(db: Session, files: List[UploadFile]) -> List[Dict]:
+    images = []
+    for file, file_name in zip(files, await image_store.save_uploads(db, files)):
+        images.append({"file_path": file_name, "content_type": file.content_type or "image/jpeg", "filename": file.filename})
+    return images
+
+def _wake_workers():
+    if _wakeup is not None:
+        _wakeup.set()
+
+async def submit_job(db: Session, files: List[UploadFile], user_id: int):
+    """Stores the uploaded images and enqueues an OCR job for them."""
+    with ocr_metrics.span("store"):
+        images = await _store_images(db, files)
+    job = ocr_job_repo.create_job(db, user_id, images)
+    _wake_workers()
+    return job
+
+async def submit_batch(db: Session, receipts: List[Tuple[Optional[str], List[UploadFile]]], user_id: int, project_id: int):
+    """
+    Stores the images of a bulk scan and enqueues one job per receipt ((label, files)
+    pairs). Each job that succeeds becomes a draft purchase in the project.
+    """
+    stored = await asyncio.gather(*(_store_images(db, files) for _, files in receipts))
+    batch = ocr_job_repo.create_batch(db, user_id, project_id)
+    for (label, _), images in zip(receipts, stored):
+        ocr_job_repo.create_job(db, user_id, images, batch_id=batch.batch_id, label=label, commit=False)
+    db.commit()
+    db.refresh(batch)
+    _wake_workers()
+    return batch
+
+def retry_job(db: Session, job_id: int) -> bool:
+    """Re-queues a failed job (its images are kept until the job is purged)."""
+    if not ocr_job_repo.retry_job(db, job_id):
+        return False
+    _wake_workers()
+    return True
+
+async def process_job(db: Session, job, stats: Optional[Dict] = None) -> Dict:
+    """
+    Runs Vision AI extraction and name/category mapping for one job. Stage timings and
+    usage counters are collected into stats (also when the job fails).
+    """
+    from storage import get_storage
+    store = get_storage()
+
+    stats = {} if stats is None else stats
+    with ocr_metrics.span("read", stats):
+        contents = await asyncio.gather(*(asyncio.to_thread(store.read_file, img["file_path"]) for img in job.images))
+        images = [(content, img["content_type"]) for content, img in zip(contents, job.images)]
+    items = await ocr_service.process_receipt_images(images, stats, db)
+    print(f"DEBUG: Extracted items from Pixtral: {items}")
+
+    # Step 4: Apply Friendly Name Mapping (Logic from Section 9.1)
+    if items and isinstance(items, list):
+        with ocr_metrics.span("mapping", stats):
+            mapping_service.map_extracted_items(db, items, job.user_id)
+
+    return {"items": items, **stats}
+
+def create_draft_purchase(db: Session, job, items: List[Dict], commit: bool = True):
+    """
+    Turns a finished bulk-scan job into a draft purchase with the job's images as receipt
+    images. With commit=False the draft is only flushed; call schedule_draft_images once
+    it is committed.
+    """
+    user = user_repo.get_user_by_id(db, job.user_id)
+    draft = purchase_repo.create_draft_purchase(
+        db,
+        creator_user_id=job.user_id,
+        project_id=job.batch.project_id,
+        purchase_name=job.label or f"Scan {date.today().isoformat()}",
+        purchase_date=date.today(),
+        items=[item for item in items if item.get("extracted_name")],
+        contributor_ids=[job.user_id],
+        images=job.images,
+        tax_rate=float(user.default_tax_rate or 0) if user else 0.0,
+        commit=commit
+    )
+    if commit:
+        schedule_draft_images(draft)
+    return draft
+
+def schedule_draft_images(draft):
+    """Queues the variants and archival copies of a committed draft's receipt images."""
+    from storage import get_storage
+    from services import image_archive
+    store = get_storage()
+    for img in draft.images:
+        store.generate_variants(img.file_path)
+        image_archive.schedule(img.image_id)
+
+def _release_job_images(db: Session, job, commit: bool = True):
+    """Drops the job's references to its images (files still used elsewhere stay, e.g. by a draft)."""
+    stored_file_repo.release(db, [img["file_path"] for img in job.images], commit=commit)
+
+async def _worker(worker_id: int):
+    config = _ocr_config()
+    poll_interval = float(config.get("poll_interval_seconds", 2))
+    max_batch_jobs = max(1, int(batch_config().get("max_parallel", int(config.get("workers", 2)) - 1)))
+    while True:
+        db = database.SessionLocal()
+        job = None
+        try:
+            job = ocr_job_repo.claim_next_job(db, max_batch_jobs)
+            if job is None:
+                db.close()
+                try:
+                    await asyncio.wait_for(_wakeup.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                _wakeup.clear()
+                continue
+
+            print(f"DEBUG: OCR worker {worker_id} processing job {job.job_id}")
+            started = time.perf_counter()
+            queue_ms = (job.started_at - job.created_at).total_seconds() * 1000 if job.started_at and job.created_at else None
+            stats = {}
+            draft = None
+            try:
+                result = await process_job(db, job, stats)
+                if job.batch_id:
+                    with ocr_metrics.span("draft", stats):
+                        draft = create_draft_purchase(db, job, result["items"], commit=False)
+                # The draft is committed together with the job's completion, so a job that
+                # fails is never retried into a second draft
+                _release_job_images(db, job, commit=False)
+                ocr_job_repo.complete_job(db, job.job_id, result, draft.purchase_id if draft else None)
+            except Exception as e:
+                # Images stay until the job is purged, so it can be retried
+                print(f"OCR Job {job.job_id} Error: {e}")
+                traceback.print_exc()
+                db.rollback()
+                ocr_metrics.record_scan(db, stats, "job", (time.perf_counter() - started) * 1000,
+                                        user_id=job.user_id, job_id=job.job_id, queue_ms=queue_ms, error=str(e))
+                ocr_job_repo.fail_job(db, job.job_id, str(e))
+            else:
+                if draft is not None:
+                    schedule_draft_images(draft)
+                ocr_metrics.record_scan(db, stats, "job", (time.perf_counter() - started) * 1000,
+                                        user_id=job.user_id, job_id=job.job_id, queue_ms=queue_ms)
+        except asyncio.CancelledError:
+            # Shutdown: the job is picked up again by the next process
+            if job is not None:
+                db.rollback()
+                ocr_job_repo.requeue_job(db, job.job_id)
+            raise
+        except Exception as e:
+            print(f"DEBUG: OCR worker {worker_id} error: {e}")
+            await asyncio.sleep(poll_interval)
+        finally:
+            db.close()
+
+def _housekeeping(requeue_after_seconds: int) -> Dict[str, int]:
+    """
+    Re-queues jobs processing for longer than requeue_after_seconds, purges jobs finished
+    more than ocr.job_retention_hours ago (releasing the images of failed ones), evicts
+    OCR cache entries and purges old scan metrics.
+    """
+    retention_hours = int(_ocr_config().get("job_retention_hours", 24))
+    db = database.SessionLocal()
+    try:
+        requeued = ocr_job_repo.requeue_stale_jobs(db, requeue_after_seconds)
+        for job in ocr_job_repo.get_expired_failed_jobs(db, retention_hours):
+            _release_job_images(db, job, commit=False)
+        return {
+            "requeued": requeued,
+            "purged": ocr_job_repo.delete_finished_jobs(db, retention_hours),
+            "evicted": ocr_service.evict_cache(db),
+            "purged_metrics": ocr_metrics.purge_records(db)
+        }
+    finally:
+        db.close()
+
+def _log_housekeeping(when: str, counts: Dict[str, int]):
+    if any(counts.values()):
+        print(f"DEBUG: OCR queue {when}: requeued {counts['requeued']}, purged {counts['purged']} jobs and "
+              f"{counts['purged_metrics']} metric records, evicted {counts['evicted']} cached results")
+
+async def _run_housekeeping():
+    """Runs _housekeeping every ocr.housekeeping_interval_seconds while the workers run."""
+    config = _ocr_config()
+    interval = float(config.get("housekeeping_interval_seconds", 300))
+    timeout = int(config.get("job_timeout_seconds", 600))
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            counts = await asyncio.to_thread(_housekeeping, timeout)
+            _log_housekeeping("housekeeping", counts)
+            if counts["requeued"]:
+                _wake_workers()
+        except Exception as e:
+            print(f"DEBUG: Error in OCR queue housekeeping: {e}")
+
+def start_workers():
+    """Recovers interrupted jobs and starts ocr.workers worker tasks on the running loop."""
+    global _wakeup
+    if _workers:
+        return
+
+    # One backend process works the queue, so every job still 'processing' was
+    # interrupted by the last shutdown or crash
+    _log_housekeeping("startup", _housekeeping(0))
+
+    _wakeup = asyncio.Event()
+    for worker_id in range(max(1, int(_ocr_config().get("workers", 2)))):
+        _workers.append(asyncio.create_task(_worker(worker_id)))
+    _workers.append(asyncio.create_task(_run_housekeeping()))
+
+async def stop_workers():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -1,10 +1,183 @@
+import asyncio
 import base64
+import hashlib
 import json
 import os
-from typing import List, Dict
+import random
+from abc import ABC, abstractmethod
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
+import cv2
+import httpx
+import numpy as np
 from fastapi import UploadFile
-from fastapi.concurrency import run_in_threadpool
 from mistralai import Mistral
+from mistralai.models import SDKError
+from sqlalchemy.orm import Session
+from repositories import ocr_cache_repo
+from services import image_preprocessing, local_ocr, ocr_metrics
+
+PIXTRAL_MODEL = "pixtral-12b-2409"
+
+# Limits concurrent Vision AI requests across all OCR jobs (ocr.max_concurrent_requests).
+# Created lazily because an asyncio.Semaphore belongs to the loop it is first used on.
+_request_limiter: Optional[asyncio.Semaphore] = None
+_request_limiter_loop = None
+
+# Long-lived Vision AI client (ocr.client): one pooled keep-alive HTTP client per event
+# loop, created at app startup, instead of a new client and TLS handshake per scan.
+_client: Optional[Mistral] = None
+_http_client: Optional[httpx.AsyncClient] = None
+_client_loop = None
+
+# HTTP statuses worth retrying: rate limiting and server-side failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def _ocr_config() -> Dict:
+    from database import config
+    return (config or {}).get("ocr") or {}
+
+def _client_config() -> Dict:
+    return _ocr_config().get("client") or {}
+
+def _api_key() -> str:
+    return (os.environ.get("MISTRAL_API_KEY") or "").strip()
+
+def get_client() -> Mistral:
+    """The shared Mistral client; built on first use on the running event loop."""
+    global _client, _http_client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        client_config = _client_config()
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                float(client_config.get("timeout_seconds", 120)),
+                connect=float(client_config.get("connect_timeout_seconds", 10))
+            ),
+            limits=httpx.Limits(
+                max_connections=int(client_config.get("max_connections", 10)),
+                max_keepalive_connections=int(client_config.get("max_keepalive_connections", 10)),
+                keepalive_expiry=float(client_config.get("keepalive_seconds", 60))
+            )
+        )
+        # MISTRAL_BASE_URL points the client at another server (e.g. a local mock)
+        base_url = os.environ.get("MISTRAL_BASE_URL") or client_config.get("base_url")
+        _client = Mistral(api_key=_api_key, server_url=base_url or None, async_client=_http_client)
+        _client_loop = loop
+        print(f"DEBUG: Vision AI client created (base URL: {base_url or 'default'})")
+    return _client
+
+def start_client():
+    """Creates the shared Vision AI client; called on app startup."""
+    get_client()
+
+async def close_client():
+    global _client, _http_client, _client_loop
+    if _http_client is not None:
+        await _http_client.aclose()
+    _client = _http_client = _client_loop = None
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.TransportError):  # Timeouts, connection resets, DNS, ...
+        return True
+    return isinstance(error, SDKError) and error.status_code in RETRY_STATUSES
+
+async def _with_retries(request):
+    """
+    Awaits request() and retries transient failures up to ocr.client.max_retries times,
+    sleeping a random time up to backoff_seconds * 2^attempt (full jitter) in between.
+    """
+    client_config = _client_config()
+    max_retries = int(client_config.get("max_retries", 3))
+    backoff = float(client_config.get("backoff_seconds", 1))
+    max_backoff = float(client_config.get("max_backoff_seconds", 20))
+
+    attempt = 0
+    while True:
+        try:
+            ocr_metrics.count("model_requests")
+            return await request()
+        except Exception as e:
+            if attempt >= max_retries or not _is_retryable(e):
+                ocr_metrics.count("model_errors")
+                raise
+            delay = random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+            attempt += 1
+            ocr_metrics.count("model_retries")
+            print(f"DEBUG: Vision AI request failed ({e}), retry {attempt}/{max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+def _cache_config() -> Dict:
+    return _ocr_config().get("cache") or {}
+
+def _get_request_limiter() -> asyncio.Semaphore:
+    global _request_limiter, _request_limiter_loop
+    loop = asyncio.get_running_loop()
+    if _request_limiter is None or _request_limiter_loop is not loop:
+        _request_limiter = asyncio.Semaphore(max(1, int(_ocr_config().get("max_concurrent_requests", 4))))
+        _request_limiter_loop = loop
+    return _request_limiter
+
+@asynccontextmanager
+async def _model_slot():
+    """Holds one of the ocr.max_concurrent_requests slots; the wait is timed as 'request_wait'."""
+    limiter = _get_request_limiter()
+    with ocr_metrics.span("request_wait"):
+        await limiter.acquire()
+    try:
+        yield
+    finally:
+        limiter.release()
+
+def content_hash(content: bytes) -> str:
+    """
+    SHA-256 of an image's decoded pixels (turned upright per EXIF), so the same photo
+    saved in another format or with other metadata has the same hash. A lossy re-encoding
+    changes the pixels and thus the hash. Content that does not decode is hashed as is.
+    """
+    pixels = cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR)
+    if pixels is None:
+        return hashlib.sha256(content).hexdigest()
+    digest = hashlib.sha256(repr(pixels.shape).encode("utf-8"))
+    digest.update(np.ascontiguousarray(pixels).tobytes())
+    return digest.hexdigest()
+
+def image_hashes(images: List[Tuple[bytes, str]]) -> List[str]:
+    return [content_hash(content) for content, _ in images]
+
+def cache_key(hashes: List[str]) -> str:
+    """Key of a set of images: the same photos uploaded in any order share one cache entry."""
+    return hashlib.sha256(",".join(sorted(hashes)).encode("utf-8")).hexdigest()
+
+def evict_cache(db: Session) -> int:
+    cache_config = _cache_config()
+    max_mb = cache_config.get("max_mb")
+    return ocr_cache_repo.evict_results(
+        db,
+        ttl_hours=float(cache_config.get("ttl_hours", 720)),
+        max_entries=int(cache_config.get("max_entries", 5000)),
+        max_bytes=int(float(max_mb) * 1024 * 1024) if max_mb else None
+    )
+
+def _with_thresholds(options: Dict) -> Dict:
+    # Edge detection thresholds for cropping to the receipt
+    from database import config
+    extract_config = (config or {}).get("receipt_extract") or {}
+    options.setdefault("threshold1", extract_config.get("threshold1", 100))
+    options.setdefault("threshold2", extract_config.get("threshold2", 200))
+    return options
+
+def _preprocess_options() -> Optional[Dict]:
+    """Options for image_preprocessing from config.yaml, or None if disabled."""
+    options = dict(_ocr_config().get("preprocess") or {})
+    if not options.get("enabled", True):
+        return None
+    return _with_thresholds(options)
+
+def _local_options() -> Dict:
+    """Options for the local OpenCV + Tesseract engine (ocr.local)."""
+    return _with_thresholds(dict(_ocr_config().get("local") or {}))
 
 async def process_receipts_with_pixtral(files: List[UploadFile]) -> List[Dict]:
     """
@@ -12,31 +185,266 @@ async def process_receipts_with_pixtral(files: List[UploadFile]) -> List[Dict]:
     Replaces the old OpenCV -> Tesseract -> Text LLM pipeline.
     """
     # 1. Read files (Async I/O)
-    images_content = []
-    for file in files:
-        content = await file.read()
-        b64 = base64.b64encode(content).decode('utf-8')
-        mime = file.content_type or "image/jpeg"
-        images_content.append(f"data:{mime};base64,{b64}")
-        await file.seek(0)
-
-    # 2. Call Mistral (Blocking I/O) -> Offload to thread pool
-    return await run_in_threadpool(_call_pixtral, images_content)
-
-def _call_pixtral(images_content: List[str]) -> List[Dict]:
-    api_key = os.environ.get("MISTRAL_API_KEY")
-    if api_key:
-        api_key = api_key.strip()
-        
-    # DEBUG: Checking MISTRAL_API_KEY presence
-    print(f"DEBUG: Checking MISTRAL_API_KEY. Exists: {bool(api_key)}, Length: {len(api_key) if api_key else 0}")
-    
-    if not api_key:
+    images = []
+    with ocr_metrics.span("read"):
+        for file in files:
+            content = await file.read()
+            images.append((content, file.content_type or "image/jpeg"))
+            await file.seek(0)
+
+    return await process_receipt_images(images)
+
+async def process_receipt_images(images: List[Tuple[bytes, str]], stats: Optional[Dict] = None, db: Optional[Session] = None,
+                                 on_item: Optional[Callable[[Dict], Awaitable]] = None) -> List[Dict]:
+    """
+    Same as process_receipts_with_pixtral, for images already in memory as (bytes, mime type).
+    Used by the OCR job workers, which read the images back from storage.
+
+    By default all images go to the model in one request. With ocr.parallel enabled they
+    are split into chunks of ocr.parallel.images_per_request that are extracted
+    concurrently; items are merged across chunks, and if some chunks fail the items of
+    the others are returned and the failed image indexes are reported in stats.
+
+    Extraction uses the ocr.engine (see get_extractor). With a db session, results are
+    cached by image content (ocr.cache), so a repeat scan of the same images skips the
+    engine. Cache, preprocessing and engine numbers go into stats.
+
+    With on_item, every item is also passed to on_item as soon as it is extracted
+    (streamed from the model where the engine supports it), with the same merging.
+
+    Stage timings ("timings") and sizes, model requests and tokens ("usage") are
+    summed over the chunks into stats (see ocr_metrics).
+    """
+    parallel_config = _ocr_config().get("parallel") or {}
+    if parallel_config.get("enabled", False):
+        size = max(1, int(parallel_config.get("images_per_request", 1)))
+    else:
+        size = max(1, len(images))
+    chunks = [list(range(start, min(start + size, len(images)))) for start in range(0, len(images), size)]
+
+    # Streamed items are merged like merge_items does, as they arrive
+    kept = Counter()
+
+    def chunk_callback():
+        if on_item is None:
+            return None
+        seen = Counter()
+
+        async def emit(item: Dict):
+            key = _item_key(item)
+            seen[key] += 1
+            if seen[key] > kept[key]:
+                kept[key] += 1
+                await on_item(item)
+        return emit
+
+    chunk_stats = [{} for _ in chunks]
+    results = await asyncio.gather(
+        *(_extract_chunk([images[i] for i in chunk], chunk_stats[n], db, chunk_callback()) for n, chunk in enumerate(chunks)),
+        return_exceptions=True
+    )
+
+    failed = [(chunk, result) for chunk, result in zip(chunks, results) if isinstance(result, Exception)]
+    if failed and len(failed) == len(chunks):
+        raise failed[0][1]
+
+    if stats is not None:
+        _merge_stats(stats, chunk_stats)
+        if failed:
+            stats["failed_images"] = [i for chunk, _ in failed for i in chunk]
+            stats["errors"] = [str(error) for _, error in failed]
+    for chunk, error in failed:
+        print(f"DEBUG: OCR failed for images {chunk}, returning partial results: {error}")
+
+    return merge_items([result for result in results if not isinstance(result, Exception)])
+
+async def _extract_chunk(images: List[Tuple[bytes, str]], stats: Dict, db: Optional[Session],
+                         on_item: Optional[Callable[[Dict], Awaitable]] = None) -> List[Dict]:
+    """Cache lookup and extraction (ocr.engine) for a group of images."""
+    # Spans and counters of this chunk (including the model call) go into its stats
+    with ocr_metrics.collect(stats):
+        return await _extract_chunk_items(images, stats, db, on_item)
+
+async def _extract_chunk_items(images: List[Tuple[bytes, str]], stats: Dict, db: Optional[Session],
+                               on_item: Optional[Callable[[Dict], Awaitable]] = None) -> List[Dict]:
+    ocr_metrics.count("images", len(images))
+    ocr_metrics.count("image_bytes", sum(len(content) for content, _ in images))
+
+    extractor = get_extractor()
+    cache_config = _cache_config()
+    use_cache = db is not None and cache_config.get("enabled", True)
+    if use_cache:
+        with ocr_metrics.span("cache"):
+            # Decoding takes a while for large photos; cv2 releases the GIL
+            hashes = await asyncio.to_thread(image_hashes, images)
+            key = cache_key(hashes)
+            cached = ocr_cache_repo.get_result(
+                db, key, float(cache_config.get("ttl_hours", 720)), engines=extractor.accepted_engines
+            )
+        stats["cache"] = {"hits": int(cached is not None), "misses": int(cached is None)}
+        if cached is not None:
+            print(f"DEBUG: OCR cache hit {key}")
+            if on_item is not None:
+                for item in cached.items:
+                    await on_item(dict(item))
+            # Copies, so that mapping the items does not touch the cached ones
+            return [dict(item) for item in cached.items]
+
+    if on_item is not None:
+        items, raw_content, engine = await extractor.stream(images, stats, on_item)
+    else:
+        items, raw_content, engine = await extractor.extract(images, stats)
+    if engine:
+        stats.setdefault("engines", {})[engine] = 1
+
+    # Empty extractions are not cached, so a retry gets a fresh attempt
+    if use_cache and items and engine:
+        try:
+            ocr_cache_repo.store_result(db, key, hashes, engine, raw_content, items)
+            evict_cache(db)
+        except Exception as e:
+            print(f"DEBUG: Failed to cache OCR result {key}: {e}")
+            db.rollback()
+    return [dict(item) for item in items]
+
+def _merge_stats(stats: Dict, chunk_stats: List[Dict]):
+    """Sums the numeric per-chunk stats into stats (e.g. stats['cache']['hits'])."""
+    for chunk in chunk_stats:
+        for section, values in chunk.items():
+            merged = stats.setdefault(section, {})
+            for name, value in values.items():
+                merged[name] = merged.get(name, 0) + value
+
+def _item_key(item: Dict) -> Tuple:
+    return (
+        " ".join(item["extracted_name"].lower().split()),
+        item.get("price"), item.get("quantity"), item.get("discount")
+    )
+
+def merge_items(chunk_items: List[List[Dict]]) -> List[Dict]:
+    """
+    Concatenates the items of several chunks, dropping lines that show up on more than
+    one photo (overlapping shots of a long receipt). Identical lines within one chunk
+    are real repeat purchases, so an item is kept as often as its most frequent chunk has it.
+    """
+    if len(chunk_items) == 1:
+        return chunk_items[0]
+
+    kept = Counter()
+    merged = []
+    for items in chunk_items:
+        seen = Counter()
+        for item in items:
+            key = _item_key(item)
+            seen[key] += 1
+            if seen[key] > kept[key]:
+                kept[key] += 1
+                merged.append(item)
+    return merged
+
+def _normalize_item(item: Dict) -> Optional[Dict]:
+    """One Pixtral item as an item dict, or None if it has no name."""
+    name = item.get("extracted_name")
+    if not name:
+        return None
+    return {
+        "extracted_name": str(name).strip(),
+        "price": float(item.get("price") or 0.0),
+        "quantity": int(item.get("quantity") or 1),
+        "discount": float(item.get("discount") or 0.0)
+    }
+
+def parse_pixtral_response(raw_content: str) -> List[Dict]:
+    """Turns Pixtral's JSON answer into item dicts (extracted_name, price, quantity, discount)."""
+    try:
+        data = json.loads(raw_content)
+        items_data = data.get("items", [])
+
+        items = []
+        for item in items_data:
+            normalized = _normalize_item(item)
+            if normalized:
+                items.append(normalized)
+
+        return items
+
+    except Exception as e:
+        print(f"Pixtral Analysis Error: {e}")
+        # Re-raise the exception so the caller knows something went wrong
+        raise e
+
+class ItemStreamParser:
+    """
+    Incremental parser for a streamed {"items": [{...}, ...]} answer: feed() returns the
+    items whose JSON object was completed by the new text.
+    """
+
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._buffer: List[str] = []
+
+    def feed(self, text: str) -> List[Dict]:
+        items = []
+        for char in text:
+            if self._depth >= 3:
+                self._buffer.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 3:
+                    # An element of the items list: {"items": [ {...} ]}
+                    self._buffer = [char]
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 2 and self._buffer:
+                    try:
+                        normalized = _normalize_item(json.loads("".join(self._buffer)))
+                        if normalized:
+                            items.append(normalized)
+                    except (ValueError, TypeError, AttributeError) as e:
+                        print(f"DEBUG: Skipping unparsable streamed item: {e}")
+                    self._buffer = []
+        return items
+
+def reparse_cached_results(db: Session) -> Dict:
+    """Re-runs the engines' parsers over all cached raw responses (no model calls)."""
+    updated = failed = 0
+    for result in ocr_cache_repo.get_all_results(db):
+        extractor = EXTRACTORS.get(result.model)
+        try:
+            if extractor is None:
+                raise ValueError(f"Unknown OCR engine {result.model}")
+            items = extractor.parse(result.raw_response)
+        except Exception:
+            failed += 1
+            continue
+        if items != result.items:
+            ocr_cache_repo.update_items(db, result.cache_key, items)
+            updated += 1
+    return {"updated": updated, "failed": failed}
+
+async def _call_pixtral(images_content: List[str], on_delta: Optional[Callable[[str], Awaitable]] = None) -> str:
+    """
+    Sends the images to Pixtral and returns the raw JSON answer. With on_delta, the answer
+    is streamed and every text fragment is passed to on_delta as it arrives.
+    """
+    if not _api_key():
         # Raise exception to ensure visibility
         raise Exception("MISTRAL_API_KEY not found in environment")
 
-    client = Mistral(api_key=api_key)
-    model = "pixtral-12b-2409"
+    client = get_client()
+    model = PIXTRAL_MODEL
 
     # Prepare message content
     content = [
@@ -60,32 +468,190 @@ def _call_pixtral(images_content: List[str]) -> List[Dict]:
     ]
 
     try:
-        response = client.chat.complete(
-            model=model,
-            messages=messages,
-            response_format={"type": "json_object"}
-        )
-        
-        raw_content = response.choices[0].message.content
+        if on_delta is None:
+            with ocr_metrics.span("model"):
+                response = await _with_retries(lambda: client.chat.complete_async(
+                    model=model,
+                    messages=messages,
+                    response_format={"type": "json_object"}
+                ))
+            _count_tokens(response.usage)
+            raw_content = response.choices[0].message.content
+        else:
+            # Retries only cover opening the stream: fragments already passed on cannot be taken back
+            with ocr_metrics.span("model"):
+                stream = await _with_retries(lambda: client.chat.stream_async(
+                    model=model,
+                    messages=messages,
+                    response_format={"type": "json_object"}
+                ))
+                parts = []
+                async with stream:
+                    async for event in stream:
+                        # The last event reports the token usage
+                        _count_tokens(getattr(event.data, "usage", None))
+                        if not event.data.choices:
+                            continue
+                        delta = event.data.choices[0].delta.content
+                        if isinstance(delta, str) and delta:
+                            parts.append(delta)
+                            await on_delta(delta)
+            raw_content = "".join(parts)
         print(f"DEBUG: Pixtral Raw Response: {raw_content}")
-        
-        data = json.loads(raw_content)
-        items_data = data.get("items", [])
-        
-        items = []
-        for item in items_data:
-            name = item.get("extracted_name")
-            if name:
-                items.append({
-                    "extracted_name": str(name).strip(),
-                    "price": float(item.get("price") or 0.0),
-                    "quantity": int(item.get("quantity") or 1),
-                    "discount": float(item.get("discount") or 0.0)
-                })
-        
-        return items
+        return raw_content
 
     except Exception as e:
         print(f"Pixtral Analysis Error: {e}")
         # Re-raise the exception so the caller knows something went wrong
         raise e
+
+def _count_tokens(usage):
+    """Adds the token usage reported by the API to the scan's counters."""
+    if usage is None:
+        return
+    ocr_metrics.count("prompt_tokens", int(getattr(usage, "prompt_tokens", 0) or 0))
+    ocr_metrics.count("completion_tokens", int(getattr(usage, "completion_tokens", 0) or 0))
+
+class ReceiptExtractor(ABC):
+    """A generic contract for receipt extraction engines."""
+    name = ""
+    # Engines whose cached results this extractor may serve
+    accepted_engines: List[str] = []
+
+    @abstractmethod
+    async def extract(self, images: List[Tuple[bytes, str]], stats: Dict) -> Tuple[List[Dict], str, Optional[str]]:
+        """
+        Extracts items from (bytes, mime type) images. Returns (items, raw response,
+        name of the engine that produced them); no engine name means "do not cache".
+        """
+
+    async def stream(self, images: List[Tuple[bytes, str]], stats: Dict, on_item: Callable[[Dict], Awaitable]):
+        """Like extract, but also passes every item to on_item as soon as it is known."""
+        items, raw_response, engine = await self.extract(images, stats)
+        for item in items:
+            await on_item(dict(item))
+        return items, raw_response, engine
+
+    @abstractmethod
+    def parse(self, raw_response: str) -> List[Dict]:
+        """Turns a raw response of this engine into items."""
+
+class PixtralExtractor(ReceiptExtractor):
+    """Mistral Pixtral Vision model: preprocessed images in, JSON items out."""
+    name = PIXTRAL_MODEL
+    accepted_engines = [PIXTRAL_MODEL]
+
+    async def _images_content(self, images, stats) -> List[str]:
+        options = _preprocess_options()
+        if options is not None:
+            preprocess_stats = {}
+            with ocr_metrics.span("preprocess"):
+                images = await image_preprocessing.preprocess_images(images, options, preprocess_stats)
+            stats["preprocessing"] = preprocess_stats
+
+        images_content = []
+        with ocr_metrics.span("encode"):
+            for content, mime in images:
+                b64 = base64.b64encode(content).decode('utf-8')
+                images_content.append(f"data:{mime};base64,{b64}")
+        ocr_metrics.count("upload_bytes", sum(len(image_url) for image_url in images_content))
+        return images_content
+
+    async def extract(self, images, stats):
+        images_content = await self._images_content(images, stats)
+        # 2. Call Mistral, at most ocr.max_concurrent_requests at a time across all jobs of this process
+        async with _model_slot():
+            raw_content = await _call_pixtral(images_content)
+        with ocr_metrics.span("parse"):
+            items = parse_pixtral_response(raw_content)
+        return items, raw_content, self.name
+
+    async def stream(self, images, stats, on_item):
+        images_content = await self._images_content(images, stats)
+        parser = ItemStreamParser()
+
+        async def on_delta(text: str):
+            for item in parser.feed(text):
+                await on_item(item)
+
+        async with _model_slot():
+            raw_content = await _call_pixtral(images_content, on_delta)
+        with ocr_metrics.span("parse"):
+            items = parse_pixtral_response(raw_content)
+        return items, raw_content, self.name
+
+    def parse(self, raw_response):
+        return parse_pixtral_response(raw_response)
+
+class LocalExtractor(ReceiptExtractor):
+    """OpenCV + Tesseract in a process pool; needs no network."""
+    name = "tesseract"
+    accepted_engines = ["tesseract", PIXTRAL_MODEL]
+
+    async def read(self, images: List[Tuple[bytes, str]]) -> Tuple[List[Dict], str, float]:
+        """Returns (items, OCR text, lowest per-image confidence 0-100)."""
+        with ocr_metrics.span("local_ocr"):
+            results = await local_ocr.ocr_images(images, _local_options())
+        text = "\n".join(result["text"] for result in results)
+        confidence = min((result["confidence"] for result in results), default=0.0)
+        with ocr_metrics.span("parse"):
+            items = local_ocr.parse_receipt_text(text)
+        return items, text, confidence
+
+    async def extract(self, images, stats):
+        items, text, _ = await self.read(images)
+        return items, text, self.name
+
+    def parse(self, raw_response):
+        return local_ocr.parse_receipt_text(raw_response)
+
+class EscalatingExtractor(ReceiptExtractor):
+    """
+    Local first pass; receipts it reads poorly (no items, or a Tesseract confidence
+    below ocr.local.min_confidence) are sent to the remote engine. If the remote engine
+    fails, the local items are returned uncached.
+    """
+    name = "local_first"
+
+    def __init__(self, local: LocalExtractor, remote: ReceiptExtractor):
+        self.local = local
+        self.remote = remote
+        self.accepted_engines = sorted(set(local.accepted_engines) | set(remote.accepted_engines))
+
+    async def extract(self, images, stats):
+        min_confidence = float(_local_options().get("min_confidence", 75))
+        items, text, confidence = await self.local.read(images)
+        if items and confidence >= min_confidence:
+            return items, text, self.local.name
+
+        print(f"DEBUG: Local OCR found {len(items)} items at confidence {confidence:.0f}, escalating to {self.remote.name}")
+        stats["escalations"] = {"count": 1}
+        try:
+            return await self.remote.extract(images, stats)
+        except Exception as e:
+            if not items:
+                raise
+            print(f"DEBUG: {self.remote.name} failed ({e}), using the local result")
+            return items, text, None
+
+    def parse(self, raw_response, engine: Optional[str] = None):
+        """Parses with the engine that produced the response (cached results store it as model)."""
+        if engine is None:
+            # The remote engine answers JSON, Tesseract plain text
+            remote = raw_response.lstrip().startswith(("{", "```"))
+            engine = self.remote.name if remote else self.local.name
+        return (self.remote if engine == self.remote.name else self.local).parse(raw_response)
+
+EXTRACTORS: Dict[str, ReceiptExtractor] = {
+    PixtralExtractor.name: PixtralExtractor(),
+    LocalExtractor.name: LocalExtractor(),
+}
+
+def get_extractor() -> ReceiptExtractor:
+    """The extraction engine selected by ocr.engine: 'pixtral', 'local' or 'local_first'."""
+    engine = _ocr_config().get("engine", "pixtral")
+    if engine == "local":
+        return EXTRACTORS[LocalExtractor.name]
+    if engine == "local_first":
+        return EscalatingExtractor(EXTRACTORS[LocalExtractor.name], EXTRACTORS[PixtralExtractor.name])
+    return EXTRACTORS[PixtralExtractor.name]
@@ -0,0 +1,102 @@
+import asyncio
+import multiprocessing
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Deque, Dict, Optional, Tuple
+from passlib.context import CryptContext
+
+# bcrypt hashing and verification (~100-300 ms of CPU each) run in a small process pool
+# instead of on the event loop, so logins do not stall the other requests of the worker.
+# At most auth.hashing.workers calls run at once and max_queue more wait; beyond that
+# calls fail fast with HashingBusyError (routers answer 503) instead of piling up.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_in_flight = 0
+_counters: Counter = Counter()
+# Latest samples for the percentiles in snapshot()
+_samples: Dict[str, Deque[float]] = {"wait_ms": deque(maxlen=1000), "compute_ms": deque(maxlen=1000)}
+_started_at = datetime.utcnow()
+
+class HashingBusyError(RuntimeError):
+    """More password hashing calls are pending than auth.hashing.max_queue allows."""
+
+def _hashing_config() -> Dict:
+    from database import config
+    return ((config or {}).get("auth") or {}).get("hashing") or {}
+
+def _verify(plain_password: str, hashed_password: str) -> Tuple[bool, float]:
+    started = time.perf_counter()
+    try:
+        valid = pwd_context.verify(plain_password, hashed_password)
+    except ValueError:
+        # Not a bcrypt hash (e.g. anonymized users)
+        valid = False
+    return valid, (time.perf_counter() - started) * 1000
+
+def _hash(password: str) -> Tuple[str, float]:
+    started = time.perf_counter()
+    hashed = pwd_context.hash(password)
+    return hashed, (time.perf_counter() - started) * 1000
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    """The pool, or None with workers 0 (calls then run in the default thread pool)."""
+    global _pool
+    workers = int(_hashing_config().get("workers", 2))
+    if _pool is None and workers > 0:
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+async def _run(operation: str, function, *args):
+    global _in_flight
+    config = _hashing_config()
+    capacity = max(1, int(config.get("workers", 2))) + int(config.get("max_queue", 32))
+    if _in_flight >= capacity:
+        _counters["rejected"] += 1
+        raise HashingBusyError("Too many concurrent password checks, please retry")
+
+    _in_flight += 1
+    _counters["max_in_flight"] = max(_counters["max_in_flight"], _in_flight)
+    started = time.perf_counter()
+    try:
+        result, compute_ms = await asyncio.get_running_loop().run_in_executor(_get_pool(), function, *args)
+    finally:
+        _in_flight -= 1
+    total_ms = (time.perf_counter() - started) * 1000
+    _counters[operation] += 1
+    _samples["compute_ms"].append(compute_ms)
+    _samples["wait_ms"].append(max(0.0, total_ms - compute_ms))
+    return result
+
+async def verify(plain_password: str, hashed_password: str) -> bool:
+    return await _run("verifications", _verify, plain_password, hashed_password)
+
+async def hash(password: str) -> str:
+    return await _run("hashes", _hash, password)
+
+def _percentile(values, percent: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+def snapshot() -> Dict:
+    """Totals of this backend process since it started."""
+    return {
+        "since": _started_at,
+        "in_flight": _in_flight,
+        "counters": dict(_counters),
+        **{name: {
+            "p50": round(_percentile(samples, 50), 1),
+            "p95": round(_percentile(samples, 95), 1),
+            "max": round(max(samples), 1) if samples else 0.0
+        } for name, samples in _samples.items()}
+    }
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
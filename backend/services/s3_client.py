@@ -0,0 +1,282 @@
+import asyncio
+import hashlib
+import hmac
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+import httpx
+
+# Minimal S3 client (AWS Signature Version 4 over httpx) for the "s3" storage provider.
+# Works with AWS S3 and S3-compatible servers (MinIO, Ceph, R2, tests/mock_s3_server.py).
+# A pooled sync client serves reads, deletes and listings (called from threads and the
+# GC); a pooled async client streams uploads from request handlers.
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+_NS = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+# Objects known to exist; stored objects are immutable (content-addressed), so
+# existence checks (e.g. of image variants) need one HEAD request per process. Objects
+# found missing are remembered for missing_cache_seconds (they may be written later,
+# e.g. a variant rendered by another process).
+KNOWN_KEYS = 10000
+
+class S3Error(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"S3 error {status_code}: {message}")
+        self.status_code = status_code
+
+def _quote(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+def _canonical_query(params: Dict[str, str]) -> str:
+    return "&".join(f"{_quote(k)}={_quote(str(v))}" for k, v in sorted(params.items()))
+
+def _find(element, name: str) -> Optional[str]:
+    found = element.find(f"{_NS}{name}")
+    if found is None:
+        found = element.find(name)
+    return found.text if found is not None else None
+
+def _findall(element, name: str):
+    return element.findall(f"{_NS}{name}") or element.findall(name)
+
+def _error_message(response: httpx.Response) -> str:
+    try:
+        root = ET.fromstring(response.content)
+        return f"{_find(root, 'Code')}: {_find(root, 'Message')}"
+    except ET.ParseError:
+        return response.text[:200] or response.reason_phrase
+
+class S3Client:
+    def __init__(self, endpoint_url: str, bucket: str, access_key: str, secret_key: str,
+                 region: str = "us-east-1", path_style: bool = True, public_url: Optional[str] = None,
+                 max_connections: int = 20, timeout_seconds: float = 30.0, missing_cache_seconds: float = 60.0):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.public_url = (public_url or endpoint_url).rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.path_style = path_style
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._timeout = httpx.Timeout(timeout_seconds)
+        self._client = httpx.Client(limits=self._limits, timeout=self._timeout)
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop = None
+        self._known: "OrderedDict[str, None]" = OrderedDict()
+        self._missing: "OrderedDict[str, float]" = OrderedDict()
+        self.missing_cache_seconds = missing_cache_seconds
+
+    # --- Signing ---
+
+    def _object_url(self, key: Optional[str], endpoint: Optional[str] = None) -> Tuple[str, str, str]:
+        """(url, host, path) of an object (or of the bucket if key is None)."""
+        base = urlsplit(endpoint or self.endpoint_url)
+        key_path = _quote(key, safe="-_.~/") if key else ""
+        if self.path_style:
+            host = base.netloc
+            path = f"{base.path.rstrip('/')}/{self.bucket}" + (f"/{key_path}" if key else "")
+        else:
+            host = f"{self.bucket}.{base.netloc}"
+            path = f"{base.path.rstrip('/')}/{key_path}"
+        return f"{base.scheme}://{host}{path}", host, path
+
+    def _signing_key(self, datestamp: str) -> bytes:
+        key = _hmac(f"AWS4{self.secret_key}".encode("utf-8"), datestamp)
+        for part in (self.region, "s3", "aws4_request"):
+            key = _hmac(key, part)
+        return key
+
+    def _signature(self, method: str, path: str, params: Dict[str, str], headers: Dict[str, str],
+                   payload_hash: str, amz_date: str) -> Tuple[str, str, str]:
+        """(signature, signed headers, credential scope) of a request (headers lower-cased)."""
+        signed_headers = ";".join(sorted(headers))
+        canonical_headers = "".join(f"{name}:{str(headers[name]).strip()}\n" for name in sorted(headers))
+        canonical_request = "\n".join([
+            method, path, _canonical_query(params), canonical_headers, signed_headers, payload_hash
+        ])
+        scope = f"{amz_date[:8]}/{self.region}/s3/aws4_request"
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+        ])
+        signature = hmac.new(self._signing_key(amz_date[:8]), string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+        return signature, signed_headers, scope
+
+    def _signed(self, method: str, key: Optional[str], params: Optional[Dict[str, str]] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[str, Dict[str, str]]:
+        params = params or {}
+        url, host, path = self._object_url(key)
+        amz_date = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        signed = {name.lower(): value for name, value in (headers or {}).items()}
+        signed.update({"host": host, "x-amz-date": amz_date, "x-amz-content-sha256": UNSIGNED_PAYLOAD})
+        signature, signed_headers, scope = self._signature(method, path, params, signed, UNSIGNED_PAYLOAD, amz_date)
+        signed["authorization"] = (f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+                                   f"SignedHeaders={signed_headers}, Signature={signature}")
+        if params:
+            url = f"{url}?{_canonical_query(params)}"
+        return url, signed
+
+    def presigned_get_url(self, key: str, expires_seconds: int, signed_at: Optional[datetime] = None) -> str:
+        """A GET URL for the object that is valid for expires_seconds after signed_at (default: now)."""
+        url, host, path = self._object_url(key, self.public_url)
+        amz_date = (signed_at or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+        params = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(int(expires_seconds)),
+            "X-Amz-SignedHeaders": "host",
+        }
+        signature, _, _ = self._signature("GET", path, params, {"host": host}, UNSIGNED_PAYLOAD, amz_date)
+        return f"{url}?{_canonical_query(params)}&X-Amz-Signature={signature}"
+
+    # --- Transport ---
+
+    def _request(self, method: str, key: Optional[str], params=None, headers=None, content=None,
+                 expected=(200,)) -> httpx.Response:
+        url, signed = self._signed(method, key, params, headers)
+        response = self._client.request(method, url, headers=signed, content=content)
+        if response.status_code not in expected:
+            raise S3Error(response.status_code, _error_message(response))
+        return response
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        # httpx async clients are bound to the event loop they were first used on
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(limits=self._limits, timeout=self._timeout)
+            self._async_loop = loop
+        return self._async_client
+
+    async def _arequest(self, method: str, key: Optional[str], params=None, headers=None, content=None,
+                        expected=(200,)) -> httpx.Response:
+        url, signed = self._signed(method, key, params, headers)
+        response = await self._get_async_client().request(method, url, headers=signed, content=content)
+        if response.status_code not in expected:
+            raise S3Error(response.status_code, _error_message(response))
+        return response
+
+    def _remember(self, key: str):
+        self._missing.pop(key, None)
+        self._known[key] = None
+        self._known.move_to_end(key)
+        while len(self._known) > KNOWN_KEYS:
+            self._known.popitem(last=False)
+
+    def _remember_missing(self, key: str):
+        self._missing[key] = time.monotonic() + self.missing_cache_seconds
+        self._missing.move_to_end(key)
+        while len(self._missing) > KNOWN_KEYS:
+            self._missing.popitem(last=False)
+
+    def known_exists(self, key: str) -> Optional[bool]:
+        """Existence of an object as far as known without a request (None: unknown)."""
+        if key in self._known:
+            return True
+        expiry = self._missing.get(key)
+        if expiry is None:
+            return None
+        if expiry < time.monotonic():
+            self._missing.pop(key, None)
+            return None
+        return False
+
+    @staticmethod
+    def _check_body(response: httpx.Response):
+        # CopyObject and CompleteMultipartUpload can fail with a 200 and an <Error> body
+        if b"<Error>" in response.content[:512]:
+            raise S3Error(response.status_code, _error_message(response))
+
+    # --- Objects ---
+
+    def put_object(self, key: str, content: bytes, content_type: Optional[str] = None):
+        headers = {"content-type": content_type} if content_type else None
+        self._request("PUT", key, headers=headers, content=content)
+        self._remember(key)
+
+    async def put_object_async(self, key: str, content: bytes, content_type: Optional[str] = None):
+        headers = {"content-type": content_type} if content_type else None
+        await self._arequest("PUT", key, headers=headers, content=content)
+        self._remember(key)
+
+    def get_object(self, key: str) -> bytes:
+        return self._request("GET", key).content
+
+    def head_object(self, key: str, cached: bool = False) -> bool:
+        if cached and (known := self.known_exists(key)) is not None:
+            return known
+        exists = self._request("HEAD", key, expected=(200, 404)).status_code == 200
+        if exists:
+            self._remember(key)
+        else:
+            self._remember_missing(key)
+        return exists
+
+    async def head_object_async(self, key: str, cached: bool = False) -> bool:
+        if cached and (known := self.known_exists(key)) is not None:
+            return known
+        exists = (await self._arequest("HEAD", key, expected=(200, 404))).status_code == 200
+        if exists:
+            self._remember(key)
+        else:
+            self._remember_missing(key)
+        return exists
+
+    def delete_object(self, key: str):
+        self._known.pop(key, None)
+        self._request("DELETE", key, expected=(200, 204, 404))
+
+    async def delete_object_async(self, key: str):
+        self._known.pop(key, None)
+        await self._arequest("DELETE", key, expected=(200, 204, 404))
+
+    async def copy_object_async(self, source_key: str, key: str):
+        source = f"/{self.bucket}/{_quote(source_key, safe='-_.~/')}"
+        self._check_body(await self._arequest("PUT", key, headers={"x-amz-copy-source": source}))
+        self._remember(key)
+
+    def list_objects(self, prefix: str = "") -> Iterator[Tuple[str, float]]:
+        """Key and last-modified time (epoch seconds) of every object (ListObjectsV2, paged)."""
+        token = None
+        while True:
+            params = {"list-type": "2", "prefix": prefix}
+            if token:
+                params["continuation-token"] = token
+            root = ET.fromstring(self._request("GET", None, params=params).content)
+            for item in _findall(root, "Contents"):
+                modified = datetime.strptime(_find(item, "LastModified")[:19], "%Y-%m-%dT%H:%M:%S")
+                yield _find(item, "Key"), modified.replace(tzinfo=timezone.utc).timestamp()
+            if (_find(root, "IsTruncated") or "").lower() != "true":
+                return
+            token = _find(root, "NextContinuationToken")
+
+    # --- Multipart uploads ---
+
+    async def create_multipart_upload_async(self, key: str, content_type: Optional[str] = None) -> str:
+        headers = {"content-type": content_type} if content_type else None
+        response = await self._arequest("POST", key, params={"uploads": ""}, headers=headers)
+        return _find(ET.fromstring(response.content), "UploadId")
+
+    async def upload_part_async(self, key: str, upload_id: str, part_number: int, content: bytes) -> str:
+        response = await self._arequest(
+            "PUT", key, params={"partNumber": str(part_number), "uploadId": upload_id}, content=content
+        )
+        return response.headers["etag"]
+
+    async def complete_multipart_upload_async(self, key: str, upload_id: str, parts: List[Tuple[int, str]]):
+        body = "<CompleteMultipartUpload>" + "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>" for number, etag in parts
+        ) + "</CompleteMultipartUpload>"
+        response = await self._arequest("POST", key, params={"uploadId": upload_id}, content=body.encode("utf-8"))
+        self._check_body(response)
+        self._remember(key)
+
+    async def abort_multipart_upload_async(self, key: str, upload_id: str):
+        await self._arequest("DELETE", key, params={"uploadId": upload_id}, expected=(200, 204, 404))
+
+    def close(self):
+        self._client.close()
@@ -0,0 +1,55 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# Authenticated users by user_id, so requests with a token carrying user_id and auth
+# version (auth.create_access_token) are authenticated without a database round trip.
+# Entries are column snapshots (not ORM instances, which are bound to a request's session),
+# expire after auth.user_cache_seconds and are dropped by user_repo whenever a user row
+# changes. Other backend processes see such changes once their entry expires.
+_lock = threading.Lock()
+_users: "OrderedDict[int, Tuple[float, CachedUser]]" = OrderedDict()
+
+class CachedUser:
+    """The column values of a users row; used as current_user like a models.User."""
+    def __init__(self, user):
+        for column in user.__table__.columns:
+            setattr(self, column.key, getattr(user, column.key))
+
+def _auth_config() -> Dict:
+    from database import config
+    return (config or {}).get("auth") or {}
+
+def get(user_id: int) -> Optional[CachedUser]:
+    with _lock:
+        entry = _users.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _users[user_id]
+            return None
+        _users.move_to_end(user_id)
+        return entry[1]
+
+def put(user) -> CachedUser:
+    """Caches a snapshot of a models.User (if the cache is enabled) and returns it."""
+    cached = CachedUser(user)
+    config = _auth_config()
+    ttl = float(config.get("user_cache_seconds", 30))
+    if ttl <= 0:
+        return cached
+    with _lock:
+        _users[cached.user_id] = (time.monotonic() + ttl, cached)
+        _users.move_to_end(cached.user_id)
+        while len(_users) > int(config.get("user_cache_size", 1024)):
+            _users.popitem(last=False)
+    return cached
+
+def invalidate(user_id: Optional[int] = None):
+    """Drops the cached user (all users if user_id is None)."""
+    with _lock:
+        if user_id is None:
+            _users.clear()
+        else:
+            _users.pop(user_id, None)
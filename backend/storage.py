@@ -1,5 +1,90 @@
+import asyncio
+import hashlib
+import hmac
+import mimetypes
 import os
+import re
 import shutil
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Folder holding the downscaled variants of stored images (see services/image_variants.py)
+VARIANTS_DIR = "_variants"
+# Folder for uploads being written (moved to their content name once hashed)
+TMP_DIR = "_tmp"
+CHUNK_SIZE = 1024 * 1024
+
+class UploadTooLargeError(ValueError):
+    """An upload exceeded storage.max_upload_size_mb."""
+
+def max_upload_bytes() -> Optional[int]:
+    """storage.max_upload_size_mb in bytes (None: unlimited)."""
+    from database import config
+    size_mb = ((config or {}).get("storage") or {}).get("max_upload_size_mb")
+    return int(float(size_mb) * 1024 * 1024) if size_mb else None
+
+async def read_upload(source, max_bytes: Optional[int] = None) -> bytes:
+    """
+    Reads an upload (`await source.read(n)`, e.g. an UploadFile) into memory in chunks.
+    Raises UploadTooLargeError as soon as more than max_bytes were read.
+    """
+    chunks = []
+    size = 0
+    while chunk := await source.read(CHUNK_SIZE):
+        size += len(chunk)
+        if max_bytes is not None and size > max_bytes:
+            raise UploadTooLargeError(f"File exceeds the {max_bytes / (1024 * 1024):g} MB upload limit")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+# Storage traffic: counters (see metrics()) and hooks called as hook(operation, file_name,
+# size_bytes) with operation 'read' or 'write', e.g. to export them to a monitoring system
+_metrics = {"reads": 0, "bytes_read": 0, "writes": 0, "bytes_written": 0}
+_metrics_lock = threading.Lock()
+_metrics_hooks: List[Callable[[str, str, int], None]] = []
+
+def add_metrics_hook(hook: Callable[[str, str, int], None]):
+    _metrics_hooks.append(hook)
+
+def metrics() -> Dict[str, int]:
+    """Files and bytes read from and written to the storage by this process."""
+    with _metrics_lock:
+        return dict(_metrics)
+
+def _record(operation: str, file_name: str, size: int):
+    with _metrics_lock:
+        if operation == "read":
+            _metrics["reads"] += 1
+            _metrics["bytes_read"] += size
+        else:
+            _metrics["writes"] += 1
+            _metrics["bytes_written"] += size
+    for hook in _metrics_hooks:
+        try:
+            hook(operation, file_name, size)
+        except Exception as e:
+            print(f"DEBUG: Storage metrics hook failed: {e}")
+
+def content_name(digest: str, extension: str = "") -> str:
+    """Content-addressed storage name, sharded by hash prefix: ab/cd/abcd...<extension>"""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+def is_content_name(file_name: str) -> bool:
+    return re.fullmatch(r"[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.[a-z0-9]{1,5})?", file_name) is not None
+
+def file_extension(filename: Optional[str]) -> str:
+    """Lower-cased extension of an uploaded file name ('' if missing or unusual)."""
+    extension = os.path.splitext(filename or "")[1].lower()
+    return extension if re.fullmatch(r"\.[a-z0-9]{1,5}", extension) else ""
+
+def variant_name(file_name: str, variant: str) -> str:
+    """Storage name of a variant of a stored image, e.g. _variants/thumb/<file_name>.webp"""
+    from services import image_variants
+    return f"{VARIANTS_DIR}/{variant}/{file_name}.{image_variants.extension()}"
 
 class StorageInterface:
     """A generic contract for all storage operations."""
@@ -7,8 +92,40 @@ class StorageInterface:
         """Uploads & updates a file to the storage."""
         raise NotImplementedError
 
-    def upload_fileobj(self, fileobj, destination_name: str) -> str:
-        """Uploads a file-like object to the storage."""
+    def upload_fileobj(self, fileobj, destination_name: str, variants: bool = False) -> str:
+        """Uploads a file-like object to the storage (scheduling its image variants if variants is set)."""
+        raise NotImplementedError
+
+    def store_content(self, fileobj, extension: str = "",
+                      register: Optional[Callable[[str, int], None]] = None) -> Tuple[str, int]:
+        """
+        Stores a file-like object under its content hash (see content_name) and returns the
+        name and size. Identical content is stored once. register(name, size) is called
+        before the file is put in place.
+        """
+        raise NotImplementedError
+
+    async def store_upload(self, source, extension: str = "",
+                           register: Optional[Callable[[str, int], None]] = None,
+                           max_bytes: Optional[int] = None) -> Tuple[str, int]:
+        """
+        Async store_content for request uploads: reads chunks with `await source.read(n)`
+        (e.g. an UploadFile) and does the blocking writes off the event loop. Raises
+        UploadTooLargeError as soon as more than max_bytes were read. register is called on
+        the event loop.
+        """
+        raise NotImplementedError
+
+    def read_file(self, file_name: str) -> bytes:
+        """Reads the content of a stored file."""
+        raise NotImplementedError
+
+    def exists(self, file_name: str) -> bool:
+        """Whether a file is stored under this name."""
+        raise NotImplementedError
+
+    def list_files(self) -> Iterator[Tuple[str, float]]:
+        """Name and modification time (epoch seconds) of every stored file."""
         raise NotImplementedError
 
     def delete_file(self, file_name: str):
@@ -19,45 +136,453 @@ class StorageInterface:
         """Gets a publicly accessible URL for a file."""
         raise NotImplementedError
 
+    def generate_variants(self, file_name: str) -> bool:
+        """Schedules the thumbnail/medium variants of a stored image."""
+        from services import image_variants
+        return image_variants.schedule(file_name)
+
+    def get_variant_urls(self, file_name: str) -> List[Dict]:
+        """Name, width and URL of the generated variants of an image, smallest first."""
+        return []
+
 class LocalStorage(StorageInterface):
-    """Implementation of storage using local filesystem."""
-    def __init__(self, base_path: str):
+    """
+    Implementation of storage using local filesystem. Files are served by routers/images.py;
+    with a url_secret their URLs are signed, so only clients the API handed them to can load them.
+    """
+    def __init__(self, base_path: str, url_secret: Optional[str] = None, url_expiry_seconds: int = 86400,
+                 serve: str = "backend", accel_prefix: str = "/_images/"):
         self.base_path = base_path
+        self.url_secret = url_secret
+        self.url_expiry_seconds = url_expiry_seconds
+        # 'backend' (routers/images.py streams files) or 'x-accel' (nginx sends them)
+        self.serve = serve
+        self.accel_prefix = "/" + accel_prefix.strip("/") + "/"
         os.makedirs(self.base_path, exist_ok=True)
 
     def upload_file(self, source_path: str, destination_name: str) -> str:
         dest_path = os.path.join(self.base_path, destination_name)
         os.makedirs(os.path.dirname(dest_path), exist_ok=True)
         shutil.copy2(source_path, dest_path)
+        _record("write", destination_name, os.path.getsize(dest_path))
         return destination_name
 
-    def upload_fileobj(self, fileobj, destination_name: str) -> str:
+    def upload_fileobj(self, fileobj, destination_name: str, variants: bool = False) -> str:
         dest_path = os.path.join(self.base_path, destination_name)
         os.makedirs(os.path.dirname(dest_path), exist_ok=True)
         with open(dest_path, "wb") as buffer:
             shutil.copyfileobj(fileobj, buffer)
+            size = buffer.tell()
+        _record("write", destination_name, size)
+        if variants:
+            self.generate_variants(destination_name)
         return destination_name
 
+    def _open_tmp(self):
+        tmp_dir = os.path.join(self.base_path, TMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        return tmp_path, os.fdopen(fd, "wb")
+
+    def _place(self, tmp_path: str, file_name: str):
+        """Moves a written temp file to its content name (dropping it if the content is stored already)."""
+        dest_path = os.path.join(self.base_path, file_name)
+        if os.path.exists(dest_path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            os.replace(tmp_path, dest_path)
+
+    @staticmethod
+    def _discard(tmp_path: str):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    @staticmethod
+    def _write_chunk(buffer, digest, chunk: bytes):
+        digest.update(chunk)
+        buffer.write(chunk)
+
+    def store_content(self, fileobj, extension: str = "",
+                      register: Optional[Callable[[str, int], None]] = None) -> Tuple[str, int]:
+        tmp_path, buffer = self._open_tmp()
+        try:
+            digest = hashlib.sha256()
+            size = 0
+            with buffer:
+                while chunk := fileobj.read(CHUNK_SIZE):
+                    size += len(chunk)
+                    self._write_chunk(buffer, digest, chunk)
+            file_name = content_name(digest.hexdigest(), extension)
+            if register is not None:
+                register(file_name, size)
+            self._place(tmp_path, file_name)
+            _record("write", file_name, size)
+            return file_name, size
+        except BaseException:
+            self._discard(tmp_path)
+            raise
+
+    async def store_upload(self, source, extension: str = "",
+                           register: Optional[Callable[[str, int], None]] = None,
+                           max_bytes: Optional[int] = None) -> Tuple[str, int]:
+        tmp_path, buffer = await asyncio.to_thread(self._open_tmp)
+        try:
+            digest = hashlib.sha256()
+            size = 0
+            try:
+                while chunk := await source.read(CHUNK_SIZE):
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise UploadTooLargeError(f"File exceeds the {max_bytes / (1024 * 1024):g} MB upload limit")
+                    # Hashing and writing release the GIL; other requests keep being served
+                    await asyncio.to_thread(self._write_chunk, buffer, digest, chunk)
+            finally:
+                await asyncio.to_thread(buffer.close)
+            file_name = content_name(digest.hexdigest(), extension)
+            if register is not None:
+                register(file_name, size)
+            await asyncio.to_thread(self._place, tmp_path, file_name)
+            _record("write", file_name, size)
+            return file_name, size
+        except BaseException:
+            await asyncio.to_thread(self._discard, tmp_path)
+            raise
+
+    def read_file(self, file_name: str) -> bytes:
+        with open(os.path.join(self.base_path, file_name), "rb") as f:
+            content = f.read()
+        _record("read", file_name, len(content))
+        return content
+
+    def exists(self, file_name: str) -> bool:
+        return os.path.isfile(os.path.join(self.base_path, file_name))
+
+    def list_files(self) -> Iterator[Tuple[str, float]]:
+        for root, _, files in os.walk(self.base_path):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    modified = os.path.getmtime(path)
+                except OSError:
+                    continue
+                yield os.path.relpath(path, self.base_path).replace(os.sep, "/"), modified
+
     def delete_file(self, file_name: str):
         file_path = os.path.join(self.base_path, file_name)
         if os.path.exists(file_path):
             os.remove(file_path)
 
+    def file_path(self, file_name: str) -> Optional[str]:
+        """Absolute path of a stored file name, or None if the name points outside the storage."""
+        if not file_name or file_name.startswith("/") or "\\" in file_name or ".." in file_name.split("/"):
+            return None
+        return os.path.join(self.base_path, file_name)
+
+    def _signature(self, file_name: str, expires: int) -> str:
+        message = f"{file_name}:{expires}".encode("utf-8")
+        return hmac.new(self.url_secret.encode("utf-8"), message, hashlib.sha256).hexdigest()[:32]
+
+    def verify_file_url(self, file_name: str, expires: Optional[int], signature: Optional[str]) -> bool:
+        """Whether the expires/signature query parameters of a file URL are valid (always True unsigned)."""
+        if not self.url_secret:
+            return True
+        if expires is None or not signature or expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(file_name, expires), signature)
+
     def get_file_url(self, file_name: str) -> str:
         # Return relative URL to backend API to support mobile devices and reverse proxies
-        return f"/api/purchases/images/{file_name}"
+        url = f"/api/purchases/images/{file_name}"
+        if not self.url_secret:
+            return url
+        # Like S3Storage: the expiry is rounded up to the end of the next half-expiry window,
+        # so the URL stays the same (and cached by browsers) for a while
+        window = max(1, self.url_expiry_seconds // 2)
+        expires = (int(time.time()) // window + 2) * window
+        return f"{url}?expires={expires}&signature={self._signature(file_name, expires)}"
 
-def get_storage():
-    from database import config
-    storage_config = config.get("storage", {})
-    
+    def get_variant_urls(self, file_name: str) -> List[Dict]:
+        from services import image_variants
+        variants = []
+        for name, width in image_variants.sizes().items():
+            stored_name = variant_name(file_name, name)
+            if os.path.exists(os.path.join(self.base_path, stored_name)):
+                variants.append({"name": name, "width": width, "url": self.get_file_url(stored_name)})
+        return variants
+
+class S3Storage(StorageInterface):
+    """
+    Implementation of storage on an S3-compatible object store (services/s3_client.py).
+    Clients load images straight from the store through presigned URLs.
+    """
+    def __init__(self, client, url_expiry_seconds: int = 3600, part_size: int = 8 * 1024 * 1024):
+        self.client = client
+        self.url_expiry_seconds = url_expiry_seconds
+        # S3 requires at least 5 MB per multipart part (except the last)
+        self.part_size = max(part_size, 5 * 1024 * 1024)
+        # Variant existence checks running in the background (see get_variant_urls)
+        self._checking: set = set()
+        self._check_tasks: set = set()
+
+    @staticmethod
+    def _content_type(file_name: str) -> str:
+        return mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+
+    def upload_file(self, source_path: str, destination_name: str) -> str:
+        with open(source_path, "rb") as f:
+            content = f.read()
+        self.client.put_object(destination_name, content, self._content_type(destination_name))
+        _record("write", destination_name, len(content))
+        return destination_name
+
+    def upload_fileobj(self, fileobj, destination_name: str, variants: bool = False) -> str:
+        content = fileobj.read()
+        self.client.put_object(destination_name, content, self._content_type(destination_name))
+        _record("write", destination_name, len(content))
+        if variants:
+            self.generate_variants(destination_name)
+        return destination_name
+
+    def store_content(self, fileobj, extension: str = "",
+                      register: Optional[Callable[[str, int], None]] = None) -> Tuple[str, int]:
+        content = fileobj.read()
+        file_name = content_name(hashlib.sha256(content).hexdigest(), extension)
+        if register is not None:
+            register(file_name, len(content))
+        if not self.client.head_object(file_name):
+            self.client.put_object(file_name, content, self._content_type(file_name))
+            _record("write", file_name, len(content))
+        return file_name, len(content)
+
+    async def store_upload(self, source, extension: str = "",
+                           register: Optional[Callable[[str, int], None]] = None,
+                           max_bytes: Optional[int] = None) -> Tuple[str, int]:
+        # Files up to part_size are sent with one PUT under their content name. Larger ones
+        # are streamed part by part (at most one part in memory) to a temporary key that is
+        # copied server-side once the hash is known.
+        tmp_key = f"{TMP_DIR}/{uuid.uuid4().hex}"
+        upload_id = None
+        parts: List[Tuple[int, str]] = []
+        buffer = bytearray()
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            while chunk := await source.read(CHUNK_SIZE):
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLargeError(f"File exceeds the {max_bytes / (1024 * 1024):g} MB upload limit")
+                digest.update(chunk)
+                buffer += chunk
+                if len(buffer) >= self.part_size:
+                    if upload_id is None:
+                        upload_id = await self.client.create_multipart_upload_async(tmp_key)
+                    parts.append((len(parts) + 1, await self.client.upload_part_async(tmp_key, upload_id, len(parts) + 1, bytes(buffer))))
+                    buffer.clear()
+
+            file_name = content_name(digest.hexdigest(), extension)
+            if register is not None:
+                register(file_name, size)
+            if upload_id is None:
+                if not await self.client.head_object_async(file_name):
+                    await self.client.put_object_async(file_name, bytes(buffer), self._content_type(file_name))
+                    _record("write", file_name, size)
+                return file_name, size
+
+            if buffer:
+                parts.append((len(parts) + 1, await self.client.upload_part_async(tmp_key, upload_id, len(parts) + 1, bytes(buffer))))
+            await self.client.complete_multipart_upload_async(tmp_key, upload_id, parts)
+            upload_id = None
+            _record("write", file_name, size)
+            try:
+                if not await self.client.head_object_async(file_name):
+                    await self.client.copy_object_async(tmp_key, file_name)
+            finally:
+                await self.client.delete_object_async(tmp_key)
+            return file_name, size
+        except BaseException:
+            if upload_id is not None:
+                try:
+                    await self.client.abort_multipart_upload_async(tmp_key, upload_id)
+                except Exception as e:
+                    print(f"DEBUG: Failed to abort multipart upload {upload_id}: {e}")
+            raise
+
+    def read_file(self, file_name: str) -> bytes:
+        content = self.client.get_object(file_name)
+        _record("read", file_name, len(content))
+        return content
+
+    def exists(self, file_name: str) -> bool:
+        return self.client.head_object(file_name)
+
+    def list_files(self) -> Iterator[Tuple[str, float]]:
+        return self.client.list_objects()
+
+    def delete_file(self, file_name: str):
+        self.client.delete_object(file_name)
+
+    def close(self):
+        self.client.close()
+
+    def get_file_url(self, file_name: str) -> str:
+        # Signed at the start of the current half-expiry window: the URL stays the same (and
+        # cacheable by browsers) for a while and is valid for at least half the expiry
+        window = max(1, self.url_expiry_seconds // 2)
+        signed_at = datetime.fromtimestamp(int(time.time()) // window * window, tz=timezone.utc)
+        return self.client.presigned_get_url(file_name, self.url_expiry_seconds, signed_at)
+
+    def get_variant_urls(self, file_name: str) -> List[Dict]:
+        """
+        On the event loop (request handlers) no request is made: variants not known to the
+        client yet are left out and checked in the background, so the next call has them.
+        Elsewhere (threads, scripts) unknown variants are checked with a HEAD request.
+        """
+        from services import image_variants
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        variants = []
+        unknown = []
+        for name, width in image_variants.sizes().items():
+            stored_name = variant_name(file_name, name)
+            exists = self.client.known_exists(stored_name)
+            if exists is None:
+                if loop is not None:
+                    unknown.append(stored_name)
+                    continue
+                exists = self.client.head_object(stored_name, cached=True)
+            if exists:
+                variants.append({"name": name, "width": width, "url": self.get_file_url(stored_name)})
+        if unknown:
+            self._check_later(loop, unknown)
+        return variants
+
+    def _check_later(self, loop, keys: List[str]):
+        keys = [key for key in keys if key not in self._checking]
+        if not keys:
+            return
+        self._checking.update(keys)
+
+        async def check():
+            try:
+                await asyncio.gather(*(self.client.head_object_async(key, cached=True) for key in keys),
+                                     return_exceptions=True)
+            finally:
+                self._checking.difference_update(keys)
+
+        task = loop.create_task(check())
+        self._check_tasks.add(task)
+        task.add_done_callback(self._check_tasks.discard)
+
+def get_image_urls(storage: StorageInterface, file_name: str) -> Dict:
+    """
+    URLs to render a stored image: the original, the smallest variant as thumbnail and a
+    srcset of the variants (empty until they are generated; clients fall back to the original).
+    """
+    url = storage.get_file_url(file_name)
+    variants = storage.get_variant_urls(file_name)
+    return {
+        "url": url,
+        "thumbnail_url": variants[0]["url"] if variants else url,
+        "srcset": ", ".join(f"{variant['url']} {variant['width']}w" for variant in variants)
+    }
+
+def _local_storage(storage_config: Dict) -> LocalStorage:
     # Check for 'local' settings specifically as per Section 13
-    local_config = storage_config.get("local", {})
+    local_config = storage_config.get("local") or {}
     image_path = local_config.get("image_path", "/app/images")
-    
+
     # Convert relative paths to absolute paths relative to current working directory
     if not os.path.isabs(image_path):
         image_path = os.path.abspath(image_path)
-    
+
+    url_secret = os.getenv("SECRET_KEY") if local_config.get("signed_urls", True) else None
     print(f"DEBUG: Using storage path: {image_path}")
-    return LocalStorage(image_path)
+    return LocalStorage(
+        image_path, url_secret, int(local_config.get("url_expiry_seconds", 86400)),
+        serve=os.getenv("IMAGE_SERVING", local_config.get("serve", "backend")),
+        accel_prefix=local_config.get("accel_prefix", "/_images/")
+    )
+
+def _s3_storage(storage_config: Dict) -> S3Storage:
+    from services.s3_client import S3Client
+    s3_config = storage_config.get("s3") or {}
+    client = S3Client(
+        endpoint_url=os.getenv("S3_ENDPOINT_URL", s3_config.get("endpoint_url")),
+        public_url=s3_config.get("public_url") or None,
+        bucket=s3_config.get("bucket", "moneyflow-images"),
+        access_key=os.getenv("S3_ACCESS_KEY_ID", s3_config.get("access_key", "")),
+        secret_key=os.getenv("S3_SECRET_ACCESS_KEY", s3_config.get("secret_key", "")),
+        region=s3_config.get("region", "us-east-1"),
+        path_style=bool(s3_config.get("path_style", True)),
+        max_connections=int(s3_config.get("max_connections", 20)),
+        timeout_seconds=float(s3_config.get("timeout_seconds", 30)),
+        missing_cache_seconds=float(s3_config.get("missing_cache_seconds", 60)),
+    )
+    print(f"DEBUG: Using S3 storage: {client.endpoint_url}/{client.bucket}")
+    return S3Storage(
+        client,
+        url_expiry_seconds=int(s3_config.get("url_expiry_seconds", 3600)),
+        part_size=int(float(s3_config.get("multipart_part_mb", 8)) * 1024 * 1024)
+    )
+
+# Storage providers by name (storage.provider, env STORAGE_PROVIDER): factory(storage_config)
+_providers: Dict[str, Callable[[Dict], StorageInterface]] = {
+    "local": _local_storage,
+    "s3": _s3_storage,
+}
+
+# The process-wide storage, built once (init_storage at startup, or on first use)
+_storage: Optional[StorageInterface] = None
+_storage_lock = threading.Lock()
+
+def register_provider(name: str, factory: Callable[[Dict], StorageInterface]):
+    """Makes a storage backend selectable by storage.provider (e.g. for an environment or tests)."""
+    _providers[name] = factory
+
+def build_storage(storage_config: Optional[Dict] = None) -> StorageInterface:
+    """A new storage for the given storage config section (default: the loaded config)."""
+    if storage_config is None:
+        from database import config
+        storage_config = (config or {}).get("storage") or {}
+    provider = os.getenv("STORAGE_PROVIDER", storage_config.get("provider", "local"))
+    if provider not in _providers:
+        raise ValueError(f"Unknown storage provider '{provider}'")
+    return _providers[provider](storage_config)
+
+def init_storage(instance: Optional[StorageInterface] = None) -> StorageInterface:
+    """Sets the process-wide storage: the given instance, or one built from the config."""
+    global _storage
+    with _storage_lock:
+        previous, _storage = _storage, instance or build_storage()
+    if previous is not None and previous is not _storage:
+        close_storage(previous)
+    return _storage
+
+def get_storage() -> StorageInterface:
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = build_storage()
+    return _storage
+
+def reset_storage():
+    """Drops the process-wide storage; the next get_storage() builds it from the config again."""
+    global _storage
+    with _storage_lock:
+        previous, _storage = _storage, None
+    if previous is not None:
+        close_storage(previous)
+
+def close_storage(instance: Optional[StorageInterface] = None):
+    """Releases the connections of a storage (default: the process-wide one)."""
+    instance = instance or _storage
+    close = getattr(instance, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception as e:
+            print(f"DEBUG: Failed to close storage: {e}")
@@ -0,0 +1,35 @@
+from collections import Counter
+from backend.services.friendly_name_automaton import FriendlyNameAutomaton
+from backend.services.mapping_service import generate_all_substrings
+
+def _brute_force(patterns, text):
+    substrings = set(generate_all_substrings(text))
+    counts = Counter()
+    for substring, friendly_name in patterns:
+        if substring in substrings:
+            counts[friendly_name] += 1
+    return counts
+
+def test_automaton_matches_substring_lookup():
+    patterns = []
+    for original, friendly in [
+        ("Milk Frsh Alpine", "Milk"),
+        ("Alpine Cheese", "Cheese"),
+        ("Frsh Bread Roll", "Bread"),
+        ("Milk Choc Bar", "Chocolate"),
+    ]:
+        for sub in generate_all_substrings(original):
+            patterns.append((sub, friendly))
+
+    automaton = FriendlyNameAutomaton()
+    for substring, friendly_name in patterns:
+        automaton.add(substring, friendly_name)
+
+    for text in ["Milk Frsh Alpine", "milk frsh", "Alpine Cheese 200g", "Bread", "MILK milk choc", "Frsh Alpine Cheese"]:
+        assert automaton.match(text) == _brute_force(patterns, text), text
+
+    # Patterns added after a lookup are picked up without a full reload
+    automaton.add("sourdough", "Bread")
+    patterns.append(("sourdough", "Bread"))
+    assert automaton.match("Sourdough Roll") == _brute_force(patterns, "Sourdough Roll")
+    assert automaton.match("Sourdough Roll")["Bread"] == 2
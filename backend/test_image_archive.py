@@ -0,0 +1,67 @@
+import asyncio
+import io
+import uuid
+from datetime import date, datetime, timedelta
+import cv2
+import numpy as np
+from backend.database import SessionLocal, engine
+from backend.repositories import user_repo, project_repo, purchase_repo
+import database
+from db_base import Base
+from repositories import stored_file_repo
+from services import image_archive, image_store
+from storage import init_storage, reset_storage
+
+def _receipt_photo():
+    image = np.random.default_rng(1).integers(150, 220, size=(4000, 3000, 3), dtype=np.uint8)
+    cv2.putText(image, "TOTAL 12.50", (200, 2000), cv2.FONT_HERSHEY_SIMPLEX, 8, (20, 20, 20), 16)
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes()
+
+def test_receipts_are_archived_and_originals_released(tmp_path):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    original_config = database.config
+    database.config = dict(original_config, storage={
+        "local": {"image_path": str(tmp_path)},
+        "variants": {"enabled": False},
+        "archive": {"enabled": True, "format": "webp", "max_width": 1200, "keep_originals_days": 1}
+    })
+    try:
+        store = init_storage()
+        user = user_repo.create_user(db, name=f"archive_{uuid.uuid4().hex[:8]}", password_hash="hash")
+        project = project_repo.create_project(db, "Shared house", "", None, user.user_id)
+        purchase = purchase_repo.create_purchase(db, user.user_id, user.user_id, "Groceries", date.today(),
+                                                 project_id=project.project_id)
+        photo = _receipt_photo()
+        original = image_store.save(db, io.BytesIO(photo), "receipt.jpg")
+        image = purchase_repo.create_receipt_image(db, purchase.purchase_id, original, "receipt.jpg")
+
+        archived = asyncio.run(image_archive.archive_image(image.image_id))
+        assert archived.endswith(".webp") and archived != original
+        db.refresh(image)
+        assert image.file_path == archived and image.original_path == original and image.archived_at
+        content = store.read_file(archived)
+        assert cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR).shape[1] == 1200
+        assert len(content) * 2 < len(photo)
+        assert stored_file_repo.get_file(db, archived).ref_count == 1
+        assert stored_file_repo.get_file(db, original).ref_count == 1
+        assert asyncio.run(image_archive.archive_image(image.image_id)) is None
+
+        usage = stored_file_repo.get_project_usage(db, [project.project_id])[project.project_id]
+        assert usage == {"images": 1, "files": 1, "bytes": len(content), "originals": 1, "original_bytes": len(photo)}
+
+        # The original is kept for keep_originals_days, then released to the GC
+        assert image_archive.release_originals(db) == 0
+        image.archived_at = datetime.utcnow() - timedelta(days=2)
+        db.commit()
+        assert image_archive.release_originals(db) == 1
+        assert stored_file_repo.get_file(db, original).ref_count == 0
+        assert stored_file_repo.get_project_usage(db, [project.project_id])[project.project_id]["originals"] == 0
+
+        purchase_repo.delete_purchase(db, purchase.purchase_id)
+        assert stored_file_repo.get_file(db, archived).ref_count == 0
+    finally:
+        asyncio.run(image_archive.stop_worker())
+        database.config = original_config
+        reset_storage()
+        db.close()
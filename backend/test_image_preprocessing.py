@@ -0,0 +1,43 @@
+import cv2
+import numpy as np
+from backend.services.image_preprocessing import preprocess_image
+
+def _receipt_photo():
+    """A white 'receipt' with text lines on a dark, noisy table, as a large JPEG."""
+    rng = np.random.default_rng(0)
+    photo = rng.integers(20, 80, size=(4000, 3000, 3), dtype=np.uint8)
+    cv2.rectangle(photo, (800, 400), (2200, 3600), (245, 245, 245), -1)
+    for y in range(600, 3400, 120):
+        cv2.putText(photo, "MILK FRSH ALPINE 1.99", (900, y), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 4)
+    ok, encoded = cv2.imencode(".jpg", photo, [cv2.IMWRITE_JPEG_QUALITY, 95])
+    assert ok
+    return encoded.tobytes()
+
+def test_preprocess_shrinks_and_crops():
+    original = _receipt_photo()
+    content, mime = preprocess_image(original, {"max_edge": 1600, "format": "jpeg", "quality": 80})
+    assert mime == "image/jpeg"
+    assert len(content) < len(original) / 4
+
+    image = cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_UNCHANGED)
+    assert image.ndim == 2  # grayscale
+    height, width = image.shape
+    assert max(height, width) <= 1600
+    # Cropped to the receipt: portrait, roughly the receipt's aspect ratio (1400x3200)
+    assert 0.35 < width / height < 0.55
+
+def test_preprocess_webp():
+    content, mime = preprocess_image(_receipt_photo(), {"format": "webp", "crop": False})
+    assert mime == "image/webp"
+
+def test_undecodable_input_is_returned_unchanged():
+    assert preprocess_image(b"not an image", {}) == (b"not an image", "")
+
+def test_close_up_keeps_all_columns():
+    # Names and prices form separate text blocks; cropping must not drop the prices
+    with open("tests/fixtures/test_receipt2.png", "rb") as f:
+        original = f.read()
+    content, _ = preprocess_image(original, {"max_edge": 1600})
+    original_width = cv2.imdecode(np.frombuffer(original, np.uint8), cv2.IMREAD_COLOR).shape[1]
+    width = cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_UNCHANGED).shape[1]
+    assert width > 0.9 * original_width
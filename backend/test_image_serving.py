@@ -0,0 +1,45 @@
+import io
+import os
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import storage
+from routers import images
+
+def test_signed_urls_cache_headers_and_x_accel(tmp_path):
+    store = storage.init_storage(storage.LocalStorage(str(tmp_path), url_secret="secret", url_expiry_seconds=3600))
+    file_name, _ = store.store_content(io.BytesIO(b"receipt-bytes"), ".jpg")
+    digest = os.path.splitext(os.path.basename(file_name))[0]
+    app = FastAPI()
+    app.include_router(images.router, prefix="/api")
+    client = TestClient(app)
+    try:
+        _check_serving(client, store, file_name, digest)
+    finally:
+        storage.reset_storage()
+
+def _check_serving(client, store, file_name, digest):
+    # Only URLs handed out by the API (signed, unexpired) are served
+    url = store.get_file_url(file_name)
+    assert url == store.get_file_url(file_name)
+    assert client.get(f"/api/purchases/images/{file_name}").status_code == 403
+    assert client.get(url.replace("signature=", "signature=0")).status_code == 403
+    assert client.get(f"/api/purchases/images/../{file_name}?expires=1&signature=x").status_code == 404
+
+    response = client.get(url)
+    assert response.status_code == 200 and response.content == b"receipt-bytes"
+    assert response.headers["etag"] == f'"{digest}"'
+    assert "immutable" in response.headers["cache-control"]
+    assert client.get(url, headers={"If-None-Match": f'"{digest}"'}).status_code == 304
+
+    # x-accel: the backend only answers with the internal location for nginx
+    store.serve = "x-accel"
+    response = client.get(url)
+    assert response.status_code == 200 and response.content == b""
+    assert response.headers["x-accel-redirect"] == f"/_images/{file_name}"
+    assert response.headers["content-type"] == "image/jpeg"
+
+    # Legacy names may be replaced, so they are revalidated
+    store.upload_fileobj(io.BytesIO(b"old"), "legacy.jpg")
+    response = client.get(store.get_file_url("legacy.jpg"))
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert response.headers["etag"].startswith('W/"')
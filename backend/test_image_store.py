@@ -0,0 +1,121 @@
+import asyncio
+import io
+import os
+import uuid
+import pytest
+from datetime import date
+from backend.database import SessionLocal, engine
+from backend.repositories import user_repo, project_repo, purchase_repo
+import database
+from db_base import Base
+from repositories import stored_file_repo
+from services import image_store
+from storage import init_storage, reset_storage, is_content_name, UploadTooLargeError, TMP_DIR
+
+class _Upload:
+    """The part of UploadFile the storage uses."""
+    def __init__(self, content: bytes, filename: str):
+        self.file = io.BytesIO(content)
+        self.filename = filename
+
+    async def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+def test_identical_images_are_stored_once_and_collected(tmp_path):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    original_config = database.config
+    database.config = dict(original_config, storage={
+        "local": {"image_path": str(tmp_path)},
+        "variants": {"enabled": False},
+        "gc": {"grace_hours": 0}
+    })
+    try:
+        store = init_storage()
+        user = user_repo.create_user(db, name=f"image_store_{uuid.uuid4().hex[:8]}", password_hash="hash")
+        project = project_repo.create_project(db, "Trip", "", None, user.user_id)
+        content = uuid.uuid4().bytes * 1000
+
+        # 1. The same receipt uploaded for two purchases is one file with two references
+        first = image_store.save(db, io.BytesIO(content), "receipt.JPG")
+        second = image_store.save(db, io.BytesIO(content), "scan.jpg")
+        assert first == second and is_content_name(first) and first.endswith(".jpg")
+        purchases = []
+        for name in ("Groceries", "Groceries again"):
+            purchase = purchase_repo.create_purchase(db, user.user_id, user.user_id, name, date.today(),
+                                                     project_id=project.project_id)
+            purchase_repo.create_receipt_image(db, purchase.purchase_id, first, "receipt.jpg")
+            purchases.append(purchase.purchase_id)
+        assert stored_file_repo.get_file(db, first).ref_count == 2
+        assert store.read_file(first) == content
+
+        # 2. Files live until their last reference is gone
+        purchase_repo.delete_purchase(db, purchases[0])
+        image_store.collect_garbage(db)
+        assert store.exists(first)
+        purchase_repo.delete_purchase(db, purchases[1])
+        image_store.collect_garbage(db)
+        assert not store.exists(first) and stored_file_repo.get_file(db, first) is None
+
+        # 3. Files no row knows about are swept once older than the grace period
+        store.upload_fileobj(io.BytesIO(b"legacy"), "purchase_999_old.jpg")
+        os.utime(tmp_path / "purchase_999_old.jpg", (1, 1))
+        assert image_store.collect_garbage(db)["swept"] >= 1
+        assert not store.exists("purchase_999_old.jpg")
+    finally:
+        database.config = original_config
+        reset_storage()
+        db.close()
+
+def test_uploads_are_streamed_concurrently_within_the_size_limit(tmp_path):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    original_config = database.config
+    database.config = dict(original_config, storage={
+        "max_upload_size_mb": 3,
+        "local": {"image_path": str(tmp_path)},
+        "variants": {"enabled": False}
+    })
+    try:
+        store = init_storage()
+        contents = [uuid.uuid4().bytes * 100_000, uuid.uuid4().bytes * 100_000]  # 1.6 MB each, several chunks
+        names = asyncio.run(image_store.save_uploads(db, [_Upload(c, f"r{i}.png") for i, c in enumerate(contents)]))
+        assert [store.read_file(name) for name in names] == contents
+        assert all(name.endswith(".png") for name in names)
+
+        # Rejected as soon as the limit is passed; the partial file is removed
+        too_large = _Upload(b"x" * (6 * 1024 * 1024), "huge.jpg")
+        with pytest.raises(UploadTooLargeError):
+            asyncio.run(image_store.save_uploads(db, [_Upload(b"small", "ok.jpg"), too_large]))
+        assert too_large.file.tell() < 6 * 1024 * 1024
+        assert os.listdir(tmp_path / TMP_DIR) == []
+    finally:
+        database.config = original_config
+        reset_storage()
+        db.close()
+
+def test_concurrent_references_are_all_counted():
+    Base.metadata.create_all(bind=engine)
+    file_name = f"{uuid.uuid4().hex}.jpg"
+
+    def reference(_):
+        db = SessionLocal()
+        try:
+            stored_file_repo.acquire(db, [file_name])
+        finally:
+            db.close()
+
+    async def run():
+        await asyncio.gather(*(asyncio.to_thread(reference, i) for i in range(8)))
+
+    asyncio.run(run())
+    db = SessionLocal()
+    try:
+        assert stored_file_repo.get_file(db, file_name).ref_count == 8
+        stored_file_repo.release(db, [file_name] * 3)
+        assert stored_file_repo.get_file(db, file_name).ref_count == 5
+        stored_file_repo.release(db, [file_name] * 9)
+        db_file = stored_file_repo.get_file(db, file_name)
+        assert db_file.ref_count == 0 and db_file.unreferenced_since is not None
+    finally:
+        db.close()
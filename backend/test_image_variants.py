@@ -0,0 +1,31 @@
+import cv2
+import numpy as np
+from storage import LocalStorage, get_image_urls, variant_name
+from services import image_variants
+
+def _photo(width, height):
+    image = np.random.default_rng(0).integers(20, 80, size=(height, width, 3), dtype=np.uint8)
+    cv2.putText(image, "TOTAL 12.50", (50, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 4, (255, 255, 255), 8)
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes()
+
+def test_variants_are_downscaled_and_listed(tmp_path):
+    original = _photo(3000, 4000)
+    variants = image_variants.render_variants(original, {"thumb": 320, "medium": 1280})
+
+    thumb = cv2.imdecode(np.frombuffer(variants["thumb"], np.uint8), cv2.IMREAD_COLOR)
+    medium = cv2.imdecode(np.frombuffer(variants["medium"], np.uint8), cv2.IMREAD_COLOR)
+    assert thumb.shape[:2] == (427, 320) and medium.shape[1] == 1280
+    assert len(variants["thumb"]) * 10 < len(original)
+
+    # Small images are not upscaled: only the smallest variant is kept
+    assert list(image_variants.render_variants(_photo(600, 400), {"thumb": 320, "medium": 1280})) == ["thumb"]
+
+    store = LocalStorage(str(tmp_path))
+    assert get_image_urls(store, "purchase_1_r.jpg")["srcset"] == ""
+    for name, data in variants.items():
+        (tmp_path / variant_name("purchase_1_r.jpg", name)).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / variant_name("purchase_1_r.jpg", name)).write_bytes(data)
+    urls = get_image_urls(store, "purchase_1_r.jpg")
+    assert urls["url"] == "/api/purchases/images/purchase_1_r.jpg"
+    assert urls["thumbnail_url"] == "/api/purchases/images/_variants/thumb/purchase_1_r.jpg.webp"
+    assert urls["srcset"].endswith("_variants/medium/purchase_1_r.jpg.webp 1280w")
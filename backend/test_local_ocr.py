@@ -0,0 +1,93 @@
+import asyncio
+import json
+import shutil
+import pytest
+from backend.services import ocr_service
+import database
+
+# The module ocr_service uses (imported as services.local_ocr)
+local_ocr = ocr_service.local_ocr
+parse_receipt_text = local_ocr.parse_receipt_text
+
+RECEIPT_TEXT = """2X 17,50 €
+TORTELACCIO 35,00 €
+FRITURE POISSONS 31,00 €
+ZILIA 1.5L 3,50 €
+Rabatt -2,00
+3 x 1.20 Banana 3.60
+8 No
+TOTAL 112.00 €
+CARD 112.00"""
+
+def test_parse_receipt_text():
+    items = parse_receipt_text(RECEIPT_TEXT)
+    assert [(i["extracted_name"], i["price"], i["quantity"], i["discount"]) for i in items] == [
+        ("TORTELACCIO", 17.5, 2, 0.0),
+        ("FRITURE POISSONS", 31.0, 1, 0.0),
+        ("ZILIA 1.5L", 3.5, 1, 2.0),
+        ("Banana", 1.2, 3, 0.0),
+    ]
+
+def test_items_named_like_payment_words_are_kept():
+    text = "Granola Bar 1.99\nBirthday Card 3.50\nMilk 1.00\nTax Free Chips 2.00\nVAT 20% 1.42\nBar 8,49\nSubtotal 8.49"
+    assert [i["extracted_name"] for i in parse_receipt_text(text)] == [
+        "Granola Bar", "Birthday Card", "Milk", "Tax Free Chips"
+    ]
+
+def test_local_first_escalates_poor_reads():
+    remote_calls = []
+
+    async def fake_ocr_images(images, options):
+        confidence = 90.0 if images[0][0] == b"clear" else 40.0
+        return [{"text": RECEIPT_TEXT, "confidence": confidence} for _ in images]
+
+    async def fake_pixtral(images_content):
+        remote_calls.append(len(images_content))
+        return json.dumps({"items": [{"extracted_name": "Remote", "price": 1.0}]})
+
+    original = (local_ocr.ocr_images, ocr_service._call_pixtral, ocr_service._preprocess_options, database.config)
+    local_ocr.ocr_images = fake_ocr_images
+    ocr_service._call_pixtral = fake_pixtral
+    ocr_service._preprocess_options = lambda: None
+    database.config = dict(original[3], ocr={"engine": "local_first", "local": {"min_confidence": 75}})
+    try:
+        stats = {}
+        items = asyncio.run(ocr_service.process_receipt_images([(b"clear", "image/png")], stats))
+        assert items[0]["extracted_name"] == "TORTELACCIO"
+        assert stats["engines"] == {"tesseract": 1} and not remote_calls
+
+        stats = {}
+        items = asyncio.run(ocr_service.process_receipt_images([(b"blurry", "image/png")], stats))
+        assert [i["extracted_name"] for i in items] == ["Remote"]
+        assert stats["escalations"] == {"count": 1} and remote_calls == [1]
+
+        # Offline: the remote engine fails, the local items are used
+        async def offline(images_content):
+            raise Exception("network unreachable")
+        ocr_service._call_pixtral = offline
+        items = asyncio.run(ocr_service.process_receipt_images([(b"blurry", "image/png")], {}))
+        assert items[0]["extracted_name"] == "TORTELACCIO"
+
+        # Raw responses are parsed by the engine that produced them
+        extractor = ocr_service.get_extractor()
+        assert extractor.parse(RECEIPT_TEXT)[0]["extracted_name"] == "TORTELACCIO"
+        remote_response = json.dumps({"items": [{"extracted_name": "Remote", "price": 1.0}]})
+        assert extractor.parse(remote_response)[0]["extracted_name"] == "Remote"
+        assert extractor.parse(RECEIPT_TEXT, engine="tesseract")[0]["extracted_name"] == "TORTELACCIO"
+    finally:
+        local_ocr.ocr_images, ocr_service._call_pixtral, ocr_service._preprocess_options, database.config = original
+
+@pytest.mark.skipif(shutil.which("tesseract") is None, reason="tesseract not installed")
+def test_tesseract_reads_fixture():
+    with open("tests/fixtures/test_receipt.png", "rb") as f:
+        result = local_ocr.ocr_image(f.read(), {})
+    items = parse_receipt_text(result["text"])
+    assert [(i["extracted_name"], i["price"]) for i in items] == [("Milk", 2.5), ("Bread", 1.0)]
+
+def test_incomplete_engines_fail_when_created():
+    class ExtractOnly(ocr_service.ReceiptExtractor):
+        async def extract(self, images, stats):
+            return [], "", None
+
+    with pytest.raises(TypeError):
+        ExtractOnly()
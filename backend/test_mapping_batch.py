@@ -0,0 +1,51 @@
+import uuid
+from backend.database import SessionLocal, engine
+from backend.repositories import user_repo
+from backend.services import mapping_service
+from db_base import Base
+
+def test_batch_mapping():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        # Fresh users each run, so mappings left by earlier runs don't interfere
+        suffix = uuid.uuid4().hex[:8]
+        user = user_repo.create_user(db, name=f"batch_map_{suffix}", password_hash="hash")
+
+        # 1. Store several mappings in one call
+        mapping_service.set_friendly_names(db, [
+            ("Bnna Chiquita", "Banana"),
+            ("Org Bnna", "Banana"),
+            ("Tomat Rispe", "Tomato"),
+        ], user.user_id)
+        mapping_service.set_category_mappings(db, {
+            "Banana": {"category_level_1": "Food", "category_level_2": "Fruit", "category_level_3": None},
+            "Tomato": {"category_level_1": "Food", "category_level_2": "Vegetables", "category_level_3": None},
+        }, user.user_id)
+
+        # 2. Resolve them together, including an unknown name
+        resolved = mapping_service.resolve_names(db, ["Bnna Chiquita 1kg", "Tomat Rispe", "Unknown Thing"], user.user_id)
+        assert resolved["Bnna Chiquita 1kg"]["friendly_name"] == "Banana"
+        assert resolved["Bnna Chiquita 1kg"]["category_level_2"] == "Fruit"
+        assert resolved["Tomat Rispe"]["friendly_name"] == "Tomato"
+        assert resolved["Tomat Rispe"]["category_level_2"] == "Vegetables"
+        assert resolved["Unknown Thing"]["friendly_name"] == "Unknown Thing"
+        assert resolved["Unknown Thing"]["category_level_1"] is None
+
+        # 3. Single-item helpers agree with the batch ones
+        assert mapping_service.get_friendly_name(db, "Org Bnna", user.user_id) == "Banana"
+        assert mapping_service.get_category_mapping(db, "Tomato", user.user_id)["category_level_1"] == "Food"
+
+        # 4. Other users fall back to the global consensus; own mappings win and are written through
+        other = user_repo.create_user(db, name=f"batch_other_{suffix}", password_hash="hash")
+        assert mapping_service.get_category_mapping(db, "Banana", other.user_id)["category_level_2"] == "Fruit"
+        mapping_service.set_category_mapping(db, "Banana", {"category_level_1": "Snacks"}, other.user_id)
+        assert mapping_service.get_category_mapping(db, "Banana", other.user_id)["category_level_1"] == "Snacks"
+        assert mapping_service.get_category_mapping(db, "Banana", user.user_id)["category_level_1"] == "Food"
+
+        # 5. Friendly names of other users reach the global consensus after a refresh
+        mapping_service.set_friendly_name(db, f"Zqx {suffix} Cola", "Cola", user.user_id)
+        mapping_service.refresh_friendly_name_consensus(db)
+        assert mapping_service.get_friendly_name(db, f"Zqx {suffix} Cola 1.5L", other.user_id) == "Cola"
+    finally:
+        db.close()
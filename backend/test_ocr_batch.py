@@ -0,0 +1,82 @@
+import uuid
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.database import SessionLocal, engine
+from backend.repositories import user_repo, ocr_job_repo, project_repo, payment_repo, purchase_repo
+from backend.services import ocr_queue
+from db_base import Base
+
+def test_batch_jobs_are_bounded_and_retryable(tmp_path):
+    # A database of its own: the test claims jobs and must not take those of the real queue
+    isolated_engine = create_engine(f"sqlite:///{tmp_path / 'ocr_batch.db'}")
+    Base.metadata.create_all(bind=isolated_engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=isolated_engine)()
+    try:
+        user = user_repo.create_user(db, name=f"ocr_batch_{uuid.uuid4().hex[:8]}", password_hash="hash")
+        project = project_repo.create_project(db, "Trip", "", None, user.user_id)
+
+        batch = ocr_job_repo.create_batch(db, user.user_id, project.project_id)
+        first = ocr_job_repo.create_job(db, user.user_id, [], batch_id=batch.batch_id, label="Dinner")
+        second = ocr_job_repo.create_job(db, user.user_id, [], batch_id=batch.batch_id)
+        single = ocr_job_repo.create_job(db, user.user_id, [])
+
+        # 1. Single scans go first; only one bulk-scan job runs at a time
+        assert ocr_job_repo.claim_next_job(db, max_batch_jobs=1).job_id == single.job_id
+        assert ocr_job_repo.claim_next_job(db, max_batch_jobs=1).job_id == first.job_id
+        assert ocr_job_repo.claim_next_job(db, max_batch_jobs=1) is None
+        ocr_job_repo.complete_job(db, first.job_id, {"items": []})
+        claimed = ocr_job_repo.claim_next_job(db, max_batch_jobs=1)
+        assert claimed.job_id == second.job_id and claimed.attempts == 1
+
+        # 2. Failed receipts can be retried, once per failure
+        ocr_job_repo.fail_job(db, second.job_id, "boom")
+        assert ocr_job_repo.retry_job(db, second.job_id)
+        assert not ocr_job_repo.retry_job(db, second.job_id)
+        retried = ocr_job_repo.claim_next_job(db, max_batch_jobs=1)
+        assert retried.job_id == second.job_id and retried.attempts == 2 and retried.error is None
+        ocr_job_repo.complete_job(db, retried.job_id, {"items": []})
+    finally:
+        db.close()
+
+def test_draft_purchases_do_not_count_until_saved():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = user_repo.create_user(db, name=f"ocr_draft_{uuid.uuid4().hex[:8]}", password_hash="hash")
+        friend = user_repo.create_user(db, name=f"ocr_friend_{uuid.uuid4().hex[:8]}", password_hash="hash")
+        project = project_repo.create_project(db, "Trip", "", None, user.user_id)
+        project_repo.add_participant(db, project.project_id, friend.user_id)
+
+        batch = ocr_job_repo.create_batch(db, user.user_id, project.project_id)
+        job = ocr_job_repo.create_job(
+            db, user.user_id, [{"file_path": "ocr_job_x_0_r.jpg", "content_type": "image/jpeg", "filename": "r.jpg"}],
+            batch_id=batch.batch_id, label="Supermarket"
+        )
+        items = [{"extracted_name": "Mlk", "friendly_name": "Milk", "price": 2.0, "quantity": 2, "discount": 0.0,
+                  "category_level_1": "Food"}]
+        # A draft that is not committed with its job's completion disappears with it
+        uncommitted = ocr_queue.create_draft_purchase(db, job, items, commit=False)
+        purchase_id = uncommitted.purchase_id
+        db.rollback()
+        assert purchase_repo.get_purchase_by_id(db, purchase_id) is None
+
+        draft = ocr_queue.create_draft_purchase(db, job, items)
+
+        assert draft.is_draft and draft.purchase_name == "Supermarket"
+        assert draft.payer_user_id == user.user_id
+        assert [(i.friendly_name, i.category_level_1) for i in draft.items] == [("Milk", "Food")]
+        assert [c.user_id for c in draft.items[0].contributors] == [user.user_id]
+        assert [img.original_filename for img in draft.images] == ["r.jpg"]
+        assert project_repo.get_project_stats(db, project.project_id)["total_spending"] == 0.0
+
+        # Sharing the item with the friend only creates a debt once the draft is saved
+        draft.items[0].contributors[0].user_id = friend.user_id
+        db.commit()
+        assert payment_repo.get_money_flow_balances(db, project_id=project.project_id) == []
+        purchase_repo.update_purchase(db, draft.purchase_id, draft.purchase_name, draft.purchase_date,
+                                      user.user_id, False, False)
+        assert not purchase_repo.get_purchase_by_id(db, draft.purchase_id).is_draft
+        assert project_repo.get_project_stats(db, project.project_id)["total_spending"] == 4.0
+        assert payment_repo.get_money_flow_balances(db, project_id=project.project_id) != []
+    finally:
+        db.close()
@@ -0,0 +1,77 @@
+import asyncio
+import json
+import uuid
+import cv2
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.repositories import ocr_cache_repo
+from backend.services import ocr_service
+from db_base import Base
+
+def test_ocr_result_cache(tmp_path):
+    # A database of its own: eviction and re-parsing work on all cached results
+    isolated_engine = create_engine(f"sqlite:///{tmp_path / 'ocr_cache.db'}")
+    Base.metadata.create_all(bind=isolated_engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=isolated_engine)()
+    calls = []
+    original_call = ocr_service._call_pixtral
+    original_options = ocr_service._preprocess_options
+
+    async def fake_pixtral(images_content):
+        calls.append(len(images_content))
+        return json.dumps({"items": [{"extracted_name": " Milk ", "price": "1.5", "quantity": None}]})
+
+    ocr_service._call_pixtral = fake_pixtral
+    ocr_service._preprocess_options = lambda: None
+    try:
+        # Unique content per run, so earlier runs' entries do not produce hits
+        images = [(uuid.uuid4().bytes, "image/png"), (uuid.uuid4().bytes, "image/png")]
+
+        # 1. First scan calls the model, a repeat (in any order) is served from the cache
+        stats = {}
+        items = asyncio.run(ocr_service.process_receipt_images(images, stats, db))
+        assert items == [{"extracted_name": "Milk", "price": 1.5, "quantity": 1, "discount": 0.0}]
+        assert stats["cache"] == {"hits": 0, "misses": 1}
+
+        items[0]["friendly_name"] = "mapped"  # Callers mutate the items; the cache must not see it
+        stats = {}
+        again = asyncio.run(ocr_service.process_receipt_images(list(reversed(images)), stats, db))
+        assert stats["cache"] == {"hits": 1, "misses": 0}
+        assert again == [{"extracted_name": "Milk", "price": 1.5, "quantity": 1, "discount": 0.0}]
+        assert calls == [2]
+
+        # 2. Re-parsing uses the stored raw response
+        key = ocr_service.cache_key(ocr_service.image_hashes(images))
+        ocr_cache_repo.update_items(db, key, [])
+        ocr_service.reparse_cached_results(db)
+        db.expire_all()
+        assert ocr_cache_repo.get_result(db, key, ttl_hours=1).items[0]["extracted_name"] == "Milk"
+        assert calls == [2]
+
+        # 3. Expired entries are not served, and eviction keeps the most recently used
+        assert ocr_cache_repo.get_result(db, key, ttl_hours=-1) is None
+        other = uuid.uuid4().hex
+        ocr_cache_repo.store_result(db, other, [], "test", "{}", [{"extracted_name": "x"}])
+        ocr_cache_repo.get_result(db, key, ttl_hours=1)
+        ocr_cache_repo.evict_results(db, ttl_hours=1, max_entries=1)
+        db.expire_all()
+        assert ocr_cache_repo.get_result(db, key, ttl_hours=1) is not None
+        assert ocr_cache_repo.get_result(db, other, ttl_hours=1) is None
+    finally:
+        ocr_service._call_pixtral = original_call
+        ocr_service._preprocess_options = original_options
+        db.close()
+
+def test_cache_key_ignores_format_and_metadata():
+    pixels = np.random.default_rng(3).integers(0, 255, size=(120, 80, 3), dtype=np.uint8)
+    jpeg = cv2.imencode(".jpg", pixels)[1].tobytes()
+    decoded = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+    # The JPEG's pixels saved losslessly, and the JPEG with an extra metadata segment
+    png = cv2.imencode(".png", decoded)[1].tobytes()
+    comment = b"Exported by a photo app"
+    with_metadata = jpeg[:2] + b"\xff\xfe" + (len(comment) + 2).to_bytes(2, "big") + comment + jpeg[2:]
+
+    hashes = ocr_service.image_hashes([(jpeg, "image/jpeg"), (png, "image/png"), (with_metadata, "image/jpeg")])
+    assert hashes[0] == hashes[1] == hashes[2]
+    assert ocr_service.content_hash(cv2.imencode(".png", pixels)[1].tobytes()) != hashes[0]
@@ -0,0 +1,82 @@
+import asyncio
+import uuid
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.repositories import user_repo, ocr_job_repo
+import database
+from db_base import Base
+from services import ocr_queue
+
+def _isolated_sessions(tmp_path):
+    """A session factory on a database of its own, so the test only sees its own jobs."""
+    isolated_engine = create_engine(f"sqlite:///{tmp_path / 'ocr_jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=isolated_engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=isolated_engine)
+
+def test_ocr_job_queue(tmp_path):
+    db = _isolated_sessions(tmp_path)()
+    try:
+        user = user_repo.create_user(db, name=f"ocr_job_{uuid.uuid4().hex[:8]}", password_hash="hash")
+
+        # 1. Jobs are claimed oldest first, and only once
+        first = ocr_job_repo.create_job(db, user.user_id, [{"file_path": "a.png", "content_type": "image/png"}])
+        second = ocr_job_repo.create_job(db, user.user_id, [{"file_path": "b.png", "content_type": "image/png"}])
+        claimed = ocr_job_repo.claim_next_job(db)
+        assert claimed.job_id == first.job_id
+        assert claimed.status == ocr_job_repo.STATUS_PROCESSING
+        assert ocr_job_repo.claim_next_job(db).job_id == second.job_id
+        assert ocr_job_repo.claim_next_job(db) is None
+
+        # 2. Results and errors are recorded
+        ocr_job_repo.complete_job(db, first.job_id, {"items": [{"extracted_name": "Milk"}]})
+        ocr_job_repo.fail_job(db, second.job_id, "boom")
+        db.expire_all()
+        assert ocr_job_repo.get_job(db, first.job_id).result["items"][0]["extracted_name"] == "Milk"
+        assert ocr_job_repo.get_job(db, second.job_id).status == ocr_job_repo.STATUS_FAILED
+
+        # 3. Jobs stuck in processing are re-queued
+        stuck = ocr_job_repo.create_job(db, user.user_id, [])
+        assert ocr_job_repo.claim_next_job(db).job_id == stuck.job_id
+        assert ocr_job_repo.requeue_stale_jobs(db, timeout_seconds=-1) == 1
+        assert ocr_job_repo.claim_next_job(db).job_id == stuck.job_id
+    finally:
+        db.close()
+
+def test_interrupted_jobs_are_requeued(tmp_path):
+    sessions = _isolated_sessions(tmp_path)
+    original = (database.SessionLocal, ocr_queue.process_job)
+    started = None
+
+    async def hanging_process_job(db, job, stats=None):
+        started.set()
+        await asyncio.Event().wait()
+
+    async def scenario():
+        nonlocal started
+        started = asyncio.Event()
+        db = sessions()
+        try:
+            user = user_repo.create_user(db, name=f"ocr_stop_{uuid.uuid4().hex[:8]}", password_hash="hash")
+            # Left 'processing' by a crash moments ago
+            crashed = ocr_job_repo.create_job(db, user.user_id, [])
+            ocr_job_repo.claim_next_job(db)
+
+            ocr_queue.start_workers()
+            await asyncio.wait_for(started.wait(), timeout=5)
+            db.expire_all()
+            assert ocr_job_repo.get_job(db, crashed.job_id).status == ocr_job_repo.STATUS_PROCESSING
+            assert ocr_job_repo.get_job(db, crashed.job_id).attempts == 2
+
+            # Stopping the workers puts the claimed job back into the queue
+            await ocr_queue.stop_workers()
+            db.expire_all()
+            assert ocr_job_repo.get_job(db, crashed.job_id).status == ocr_job_repo.STATUS_QUEUED
+        finally:
+            db.close()
+
+    database.SessionLocal = sessions
+    ocr_queue.process_job = hanging_process_job
+    try:
+        asyncio.run(scenario())
+    finally:
+        database.SessionLocal, ocr_queue.process_job = original
@@ -0,0 +1,55 @@
+import asyncio
+import json
+import uuid
+from types import SimpleNamespace
+from backend.database import SessionLocal, engine
+from backend.repositories import ocr_metrics_repo, user_repo
+from backend.services import ocr_service
+import database
+from db_base import Base
+from services import ocr_metrics
+
+def test_scan_timings_and_usage_are_recorded():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+
+    async def fake_pixtral(images_content, on_delta=None):
+        # What _call_pixtral reports for a real response
+        ocr_service._count_tokens(SimpleNamespace(prompt_tokens=1000, completion_tokens=40))
+        return json.dumps({"items": [{"extracted_name": "Milk", "price": 1.0}]})
+
+    original = (ocr_service._call_pixtral, ocr_service._preprocess_options, database.config)
+    ocr_service._call_pixtral = fake_pixtral
+    ocr_service._preprocess_options = lambda: None
+    database.config = dict(original[2], ocr={
+        "parallel": {"enabled": True, "images_per_request": 1},
+        "metrics": {"input_price_per_million": 2.0, "output_price_per_million": 5.0}
+    })
+    try:
+        user = user_repo.create_user(db, name=f"ocr_metrics_{uuid.uuid4().hex[:8]}", password_hash="hash")
+        stats = {}
+        with ocr_metrics.span("read", stats):
+            images = [(b"page-one", "image/png"), (b"page-two!", "image/png")]
+        asyncio.run(ocr_service.process_receipt_images(images, stats))
+
+        # Both chunks' spans and counters are summed into the scan's stats
+        assert {"read_ms", "encode_ms", "parse_ms", "request_wait_ms"} <= set(stats["timings"])
+        usage = stats["usage"]
+        assert usage["images"] == 2 and usage["image_bytes"] == 17
+        assert usage["prompt_tokens"] == 2000 and usage["completion_tokens"] == 80
+        assert usage["upload_bytes"] > usage["image_bytes"]
+
+        job_id = uuid.uuid4().int % 1000000 + 1000000
+        ocr_metrics.record_scan(db, stats, "job", 12.5, user_id=user.user_id, job_id=job_id, queue_ms=3.0)
+        assert stats["usage"]["cost"] == round((2000 * 2.0 + 80 * 5.0) / 1_000_000, 6)
+
+        record = ocr_metrics_repo.get_record_for_job(db, job_id)
+        assert record.status == "done" and record.prompt_tokens == 2000 and record.images == 2
+        assert "encode_ms" in record.timings
+
+        summary = ocr_metrics.summarize(db, hours=1)
+        assert summary["scans"] >= 1 and "encode" in summary["stages_ms"]
+        assert "encode" in ocr_metrics.snapshot()["stages"]
+    finally:
+        ocr_service._call_pixtral, ocr_service._preprocess_options, database.config = original
+        db.close()
@@ -0,0 +1,55 @@
+import asyncio
+import json
+from backend.services import ocr_service
+import database
+
+def _item(name, price=1.0, quantity=1):
+    return {"extracted_name": name, "price": price, "quantity": quantity, "discount": 0.0}
+
+def test_merge_items_drops_overlapping_lines():
+    page_1 = [_item("Milk"), _item("Bread", 2.5), _item("Bread", 2.5)]
+    page_2 = [_item("bread ", 2.5), _item("Cheese", 4.0), _item("Milk", 1.0, 2)]
+    merged = ocr_service.merge_items([page_1, page_2])
+    assert [(i["extracted_name"], i["quantity"]) for i in merged] == [
+        ("Milk", 1), ("Bread", 1), ("Bread", 1), ("Cheese", 1), ("Milk", 2)
+    ]
+
+def test_parallel_extraction_returns_partial_results():
+    in_flight = []
+    peak = []
+
+    async def fake_pixtral(images_content):
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.05)
+        in_flight.pop()
+        if "YmFk" in images_content[0]:  # base64 of b"bad"
+            raise Exception("unreadable")
+        return json.dumps({"items": [{"extracted_name": "Milk", "price": 1.0}]})
+
+    original_call = ocr_service._call_pixtral
+    original_options = ocr_service._preprocess_options
+    original_config = database.config
+    ocr_service._call_pixtral = fake_pixtral
+    ocr_service._preprocess_options = lambda: None
+    database.config = dict(original_config, ocr={
+        "max_concurrent_requests": 2, "parallel": {"enabled": True, "images_per_request": 1}
+    })
+    try:
+        images = [(b"page", "image/png"), (b"bad", "image/png"), (b"page", "image/png"), (b"page", "image/png")]
+        stats = {}
+        items = asyncio.run(ocr_service.process_receipt_images(images, stats))
+        assert [i["extracted_name"] for i in items] == ["Milk"]
+        assert stats["failed_images"] == [1]
+        assert max(peak) <= 2
+
+        # All chunks failing fails the job
+        try:
+            asyncio.run(ocr_service.process_receipt_images([(b"bad", "image/png")]))
+            assert False, "expected the extraction to fail"
+        except Exception as e:
+            assert str(e) == "unreadable"
+    finally:
+        ocr_service._call_pixtral = original_call
+        ocr_service._preprocess_options = original_options
+        database.config = original_config
@@ -0,0 +1,75 @@
+import asyncio
+import io
+import json
+import pytest
+from fastapi import HTTPException
+from backend.services import ocr_service
+import database
+from routers import ocr
+
+ANSWER = json.dumps({"items": [
+    {"extracted_name": "Milk {1L}", "price": 1.0},
+    {"extracted_name": "Bread \"Rustic\"", "price": 2.5, "quantity": 2},
+    {"extracted_name": None, "price": 9.9},
+]})
+
+def test_item_stream_parser():
+    parser = ocr_service.ItemStreamParser()
+    names = []
+    for start in range(0, len(ANSWER), 5):
+        names += [item["extracted_name"] for item in parser.feed(ANSWER[start:start + 5])]
+    assert names == ["Milk {1L}", 'Bread "Rustic"']
+
+def test_items_are_emitted_while_streaming():
+    events = []
+
+    async def fake_pixtral(images_content, on_delta=None):
+        for start in range(0, len(ANSWER), 10):
+            events.append("delta")
+            if on_delta:
+                await on_delta(ANSWER[start:start + 10])
+        return ANSWER
+
+    async def on_item(item):
+        events.append(item["extracted_name"])
+
+    original = (ocr_service._call_pixtral, ocr_service._preprocess_options, database.config)
+    ocr_service._call_pixtral = fake_pixtral
+    ocr_service._preprocess_options = lambda: None
+    database.config = dict(original[2], ocr={"parallel": {"enabled": True, "images_per_request": 1}})
+    try:
+        # Two pages with the same lines: each item is emitted once, before the answer is complete
+        items = asyncio.run(ocr_service.process_receipt_images(
+            [(b"page 1", "image/png"), (b"page 2", "image/png")], on_item=on_item
+        ))
+        emitted = [e for e in events if e != "delta"]
+        assert emitted == ["Milk {1L}", 'Bread "Rustic"']
+        assert events.index("Milk {1L}") < len(events) - 1 - events[::-1].index("delta")
+        assert [i["extracted_name"] for i in items] == emitted
+    finally:
+        ocr_service._call_pixtral, ocr_service._preprocess_options, database.config = original
+
+class _Upload:
+    """The part of UploadFile the stream endpoint uses."""
+    def __init__(self, content: bytes):
+        self.file = io.BytesIO(content)
+        self.content_type = "image/jpeg"
+
+    async def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+class _User:
+    user_id = 1
+
+def test_stream_uploads_respect_the_size_limit():
+    original = database.config
+    database.config = dict(original, storage={"max_upload_size_mb": 1})
+    try:
+        too_large = _Upload(b"x" * (3 * 1024 * 1024))
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(ocr.scan_receipt_stream(files=[too_large], current_user=_User()))
+        assert error.value.status_code == 413
+        # Rejected as soon as the limit is passed
+        assert too_large.file.tell() < 3 * 1024 * 1024
+    finally:
+        database.config = original
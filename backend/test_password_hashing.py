@@ -0,0 +1,38 @@
+import asyncio
+import database
+from services import password_hashing
+
+def test_bcrypt_runs_in_a_bounded_pool():
+    original_config = database.config
+    database.config = dict(original_config, auth={"hashing": {"workers": 1, "max_queue": 1}})
+
+    async def scenario():
+        hashed = await password_hashing.hash("secret")
+        assert await password_hashing.verify("secret", hashed)
+        assert not await password_hashing.verify("wrong", hashed)
+        assert not await password_hashing.verify("secret", "DELETED")
+
+        # The event loop keeps serving while bcrypt runs
+        ticks = 0
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+        task = asyncio.create_task(ticker())
+        # One running and one waiting call fit; the others are rejected at once
+        results = await asyncio.gather(*(password_hashing.verify("secret", hashed) for _ in range(4)),
+                                       return_exceptions=True)
+        task.cancel()
+        assert results[:2] == [True, True]
+        assert all(isinstance(result, password_hashing.HashingBusyError) for result in results[2:])
+        assert ticks > 5
+
+    try:
+        asyncio.run(scenario())
+        snapshot = password_hashing.snapshot()
+        assert snapshot["counters"]["rejected"] >= 2 and snapshot["counters"]["verifications"] >= 5
+        assert snapshot["in_flight"] == 0 and snapshot["compute_ms"]["max"] > 0
+    finally:
+        password_hashing.shutdown()
+        database.config = original_config
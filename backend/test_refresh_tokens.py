@@ -0,0 +1,63 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+import auth
+import database
+import models
+from db_base import Base
+from repositories import refresh_token_repo, user_repo
+from routers.auth import RefreshRequest, logout, refresh_access_token
+from services import user_cache
+
+def _refresh(db, token):
+    return asyncio.run(refresh_access_token(RefreshRequest(refresh_token=token), db=db))
+
+def test_refresh_tokens_rotate_and_detect_reuse():
+    Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        user = user_repo.create_user(db, name=f"refresh_{uuid.uuid4().hex[:8]}", password_hash="hash")
+        first, row = refresh_token_repo.create_token(db, user, timedelta(days=1))
+        assert row.token_hash == refresh_token_repo.hash_token(first) and first not in row.token_hash
+
+        issued = _refresh(db, first)
+        current = asyncio.run(auth.get_current_user(db=db, token=issued["access_token"]))
+        assert current.user_id == user.user_id
+        second = issued["refresh_token"]
+        assert second != first
+
+        # Presented again right away (a concurrent tab): rejected, the session survives
+        with pytest.raises(HTTPException):
+            _refresh(db, first)
+        third = _refresh(db, second)["refresh_token"]
+
+        # Presented again later: the token was copied, the whole session is revoked
+        db.query(models.RefreshToken).filter(models.RefreshToken.token_hash == refresh_token_repo.hash_token(second)) \
+            .update({models.RefreshToken.used_at: datetime.utcnow() - timedelta(minutes=5)})
+        db.commit()
+        with pytest.raises(HTTPException):
+            _refresh(db, second)
+        with pytest.raises(HTTPException):
+            _refresh(db, third)
+
+        # A password change ends all sessions
+        fourth, _ = refresh_token_repo.create_token(db, user, timedelta(days=1))
+        user_repo.update_user_password(db, user.user_id, "new-hash")
+        with pytest.raises(HTTPException):
+            _refresh(db, fourth)
+
+        # Logout revokes the session; expired tokens are rejected and purged
+        db.refresh(user)
+        fifth, _ = refresh_token_repo.create_token(db, user, timedelta(days=1))
+        asyncio.run(logout(RefreshRequest(refresh_token=fifth), db=db))
+        with pytest.raises(HTTPException):
+            _refresh(db, fifth)
+        expired, _ = refresh_token_repo.create_token(db, user, timedelta(seconds=-1))
+        with pytest.raises(HTTPException):
+            _refresh(db, expired)
+        assert refresh_token_repo.delete_expired_tokens(db) >= 1
+    finally:
+        user_cache.invalidate()
+        db.close()
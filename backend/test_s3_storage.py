@@ -0,0 +1,112 @@
+import asyncio
+import io
+import json
+import threading
+import httpx
+import pytest
+import database
+from services.s3_client import S3Client, S3Error
+from storage import (S3Storage, UploadTooLargeError, add_metrics_hook, get_storage, init_storage,
+                     is_content_name, metrics, reset_storage, variant_name)
+from tests.mock_s3_server import make_server
+
+class _Upload:
+    def __init__(self, content: bytes):
+        self.file = io.BytesIO(content)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+@pytest.fixture
+def mock_s3():
+    server = make_server(max_keys=1)  # Listings are paged
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def _stats(endpoint):
+    return json.loads(httpx.get(f"{endpoint}/stats").text)
+
+def test_s3_storage_against_mock(mock_s3):
+    client = S3Client(mock_s3, "receipts", "mock-access", "mock-secret")
+    store = S3Storage(client, url_expiry_seconds=600, part_size=5 * 1024 * 1024)
+    large = bytes(range(256)) * 48 * 1024  # 12 MB: three multipart parts
+
+    # 1. Large uploads are streamed as multipart, small ones as one PUT; both content-addressed
+    async def upload_all():
+        return await asyncio.gather(store.store_upload(_Upload(large), ".jpg"), store.store_upload(_Upload(b"tiny"), ".png"))
+    (large_name, large_size), (small_name, _) = asyncio.run(upload_all())
+    assert is_content_name(large_name) and large_size == len(large)
+    assert store.read_file(large_name) == large and store.read_file(small_name) == b"tiny"
+    assert _stats(mock_s3)["completed_multipart"] == 1
+
+    # 2. Same content again: same name, nothing new stored (temporary keys are removed)
+    assert asyncio.run(store.store_upload(_Upload(large), ".jpg"))[0] == large_name
+    assert sorted(name for name, _ in store.list_files()) == sorted([large_name, small_name])
+
+    # 3. Oversized uploads abort their multipart upload
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(store.store_upload(_Upload(large), ".jpg", max_bytes=11 * 1024 * 1024))
+    assert _stats(mock_s3)["pending_uploads"] == 0
+
+    # 4. Presigned URLs serve the object directly; they are stable within the window
+    url = store.get_file_url(small_name)
+    assert url == store.get_file_url(small_name)
+    assert httpx.get(url).content == b"tiny"
+    assert httpx.get(url.replace("X-Amz-Signature=", "X-Amz-Signature=0")).status_code == 403
+
+    store.delete_file(small_name)
+    assert not store.exists(small_name)
+    with pytest.raises(S3Error):
+        S3Client(mock_s3, "receipts", "mock-access", "wrong-secret").get_object(large_name)
+
+def test_provider_is_selected_from_config(mock_s3):
+    original_config = database.config
+    database.config = dict(original_config, storage={
+        "provider": "s3",
+        "s3": {"endpoint_url": mock_s3, "bucket": "receipts", "access_key": "mock-access", "secret_key": "mock-secret"}
+    })
+    try:
+        first = init_storage()
+        second = get_storage()
+        assert isinstance(first, S3Storage) and first is second  # built once, one connection pool
+        name, _ = first.store_content(io.BytesIO(b"receipt"), ".jpg")
+        assert second.exists(name)
+
+        read_before = metrics()["bytes_read"]
+        seen = []
+        add_metrics_hook(lambda operation, file_name, size: seen.append((operation, file_name, size)))
+        assert second.read_file(name) == b"receipt"
+        assert metrics()["bytes_read"] == read_before + 7 and ("read", name, 7) in seen
+    finally:
+        database.config = original_config
+        reset_storage()
+
+def test_variant_lookups_do_not_block_requests(mock_s3):
+    original_config = database.config
+    database.config = dict(original_config, storage={"variants": {"sizes": {"thumb": 320, "medium": 1280}}})
+    client = S3Client(mock_s3, "receipts", "mock-access", "mock-secret", missing_cache_seconds=60)
+    store = S3Storage(client)
+    try:
+        name, _ = store.store_content(io.BytesIO(b"receipt"), ".jpg")
+        # Rendered by another process: this client has not seen the variant
+        S3Client(mock_s3, "receipts", "mock-access", "mock-secret").put_object(variant_name(name, "thumb"), b"thumb")
+
+        async def request_handler():
+            first = store.get_variant_urls(name)
+            await asyncio.gather(*store._check_tasks)
+            return first, store.get_variant_urls(name)
+
+        requests_before = _stats(mock_s3)["requests"]
+        first, second = asyncio.run(request_handler())
+        # No answer from the store on the event loop; the background check fills the cache
+        assert first == [] and [variant["name"] for variant in second] == ["thumb"]
+        assert _stats(mock_s3)["requests"] - requests_before == 2
+
+        # The missing variant is not asked for again within missing_cache_seconds
+        assert [variant["name"] for variant in store.get_variant_urls(name)] == ["thumb"]
+        assert _stats(mock_s3)["requests"] - requests_before == 2
+    finally:
+        database.config = original_config
+        store.close()
@@ -0,0 +1,51 @@
+import asyncio
+import uuid
+import pytest
+from fastapi import HTTPException
+import auth
+import database
+from db_base import Base
+from repositories import user_repo
+from services import user_cache
+
+class _NoDatabase:
+    """A session that fails on use: the request must be authenticated from the cache."""
+    def __getattr__(self, name):
+        raise AssertionError(f"Unexpected database access ({name})")
+
+def _authenticate(db, token):
+    return asyncio.run(auth.get_current_user(db=db, token=token))
+
+def test_tokens_authenticate_from_the_user_cache():
+    Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        user = user_repo.create_user(db, name=f"tok_{uuid.uuid4().hex[:8]}", password_hash="hash")
+        token = auth.create_access_token(auth.token_claims(user))
+
+        assert _authenticate(db, token).user_id == user.user_id
+        cached = _authenticate(_NoDatabase(), token)
+        assert cached.name == user.name and cached.administrator is False
+
+        # Changes through the repository are visible at once; a rename keeps the token valid
+        user_repo.update_user_name(db, user.user_id, user.name + "_r")
+        user_repo.set_administrator_rights(db, user.user_id, True)
+        current = _authenticate(db, token)
+        assert current.name == user.name and current.administrator is True
+
+        # Tokens issued before the user's name-based claims are still accepted
+        assert _authenticate(db, auth.create_access_token({"sub": user.name})).user_id == user.user_id
+
+        # A password change revokes existing tokens
+        user_repo.update_user_password(db, user.user_id, "new-hash")
+        with pytest.raises(HTTPException):
+            _authenticate(db, token)
+        db.refresh(user)
+        assert _authenticate(db, auth.create_access_token(auth.token_claims(user))).user_id == user.user_id
+
+        user_repo.delete_user(db, user.user_id)
+        with pytest.raises(HTTPException):
+            _authenticate(db, auth.create_access_token(auth.token_claims(user)))
+    finally:
+        user_cache.invalidate()
+        db.close()
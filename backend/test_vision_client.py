@@ -0,0 +1,72 @@
+import asyncio
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from backend.services import ocr_service
+import database
+
+class _MockVisionHandler(BaseHTTPRequestHandler):
+    """Chat completions endpoint that fails the first request with a 503."""
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        _MockVisionHandler.requests.append((self.path, body, self.headers.get("Connection")))
+        if len(_MockVisionHandler.requests) == 1:
+            self.send_response(503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+            return
+
+        answer = json.dumps({
+            "id": "mock", "object": "chat.completion", "model": body["model"], "created": 0,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {
+                "role": "assistant", "content": json.dumps({"items": [{"extracted_name": "Milk", "price": 1.5}]})
+            }}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(answer)))
+        self.end_headers()
+        self.wfile.write(answer)
+
+    def log_message(self, *args):
+        pass
+
+def test_vision_client_uses_base_url_and_retries():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MockVisionHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    original_config = database.config
+    original_env = {name: os.environ.get(name) for name in ("MISTRAL_BASE_URL", "MISTRAL_API_KEY")}
+    database.config = dict(original_config, ocr={"client": {"max_retries": 2, "backoff_seconds": 0.01}})
+    os.environ["MISTRAL_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["MISTRAL_API_KEY"] = "test-key"
+
+    async def scan():
+        try:
+            raw = await ocr_service._call_pixtral(["data:image/png;base64,AAAA"])
+            return ocr_service.parse_pixtral_response(raw)
+        finally:
+            await ocr_service.close_client()
+
+    try:
+        items = asyncio.run(scan())
+        assert [i["extracted_name"] for i in items] == ["Milk"]
+        # One 503, then success on the retry
+        assert len(_MockVisionHandler.requests) == 2
+        path, body, _ = _MockVisionHandler.requests[-1]
+        assert path == "/v1/chat/completions"
+        assert body["model"] == ocr_service.PIXTRAL_MODEL
+    finally:
+        server.shutdown()
+        database.config = original_config
+        for name, value in original_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
@@ -18,6 +18,68 @@ api.interceptors.request.use(
   }
 );
 
+// Renew the 30 minute access token with the refresh token instead of asking for the
+// password again. Concurrent 401s share one /auth/refresh call; the request is retried once.
+// Requests not made with api (e.g. fetch for streamed responses) use renewSession.
+let refreshing = null;
+let onSessionExpired = () => {};
+
+export const setSessionExpiredHandler = (handler) => {
+  onSessionExpired = handler;
+};
+
+const refreshTokens = async () => {
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (!refreshToken) {
+    throw new Error('No refresh token');
+  }
+  // Plain axios: this call must not go through the interceptors of api
+  const response = await axios.post(`${api.defaults.baseURL}/auth/refresh`, { refresh_token: refreshToken });
+  localStorage.setItem('token', response.data.access_token);
+  localStorage.setItem('refresh_token', response.data.refresh_token);
+  return response.data.access_token;
+};
+
+// Called after a 401 for a request sent with the Authorization header usedToken. Resolves
+// true when a new access token is in localStorage (the request can be retried); otherwise
+// the session has ended and both tokens are removed.
+export const renewSession = async (usedToken) => {
+  try {
+    if (!refreshing) {
+      refreshing = refreshTokens().finally(() => {
+        refreshing = null;
+      });
+    }
+    await refreshing;
+    return true;
+  } catch (refreshError) {
+    // Another tab may have rotated the refresh token meanwhile: use its access token
+    const token = localStorage.getItem('token');
+    if (token && `Bearer ${token}` !== usedToken) {
+      return true;
+    }
+    localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
+    onSessionExpired();
+    return false;
+  }
+};
+
+api.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const config = error.config;
+    if (error.response?.status !== 401 || !config || config._retried || config.url?.startsWith('/auth/token')) {
+      return Promise.reject(error);
+    }
+    config._retried = true;
+    if (!(await renewSession(config.headers?.Authorization))) {
+      return Promise.reject(error);
+    }
+    return api(config);
+  }
+);
+
 export const getCategoriesByLevel = async (level) => {
   try {
     const response = await api.get(`/categories/${level}`);
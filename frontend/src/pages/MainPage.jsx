@@ -88,7 +88,7 @@ const MainPage = () => {
                 <div className="w-10 h-10 rounded-xl overflow-hidden bg-background flex-shrink-0 flex items-center justify-center border border-white/10">
                   {project.image_path ? (
                     <img 
-                      src={project.image_path.startsWith('http') || project.image_path.startsWith('/') ? project.image_path : `/api/purchases/images/${project.image_path}`} 
+                      src={project.image_thumbnail || (project.image_path.startsWith('http') || project.image_path.startsWith('/') ? project.image_path : `/api/purchases/images/${project.image_path}`)} 
                       alt={project.name} 
                       className="w-full h-full object-cover"
                       onError={(e) => { e.target.onerror = null; e.target.src = '' }}
@@ -252,6 +252,8 @@ const ProjectDetailsPage = () => {
         {currentProject.image_path ? (
           <img 
             src={currentProject.image_path.startsWith('http') || currentProject.image_path.startsWith('/') ? currentProject.image_path : `/api/purchases/images/${currentProject.image_path}`} 
+            srcSet={currentProject.image_srcset || undefined}
+            sizes="(min-width: 1152px) 1152px, 100vw"
             className="w-full h-full object-cover" 
             alt={currentProject.name}
           />
@@ -518,6 +520,8 @@ const ProjectDetailsPage = () => {
                             <>
                               <img 
                                 src={previewUrl || (currentProject.image_path?.startsWith('http') || currentProject.image_path?.startsWith('/') ? currentProject.image_path : `/api/purchases/images/${currentProject.image_path}`)} 
+                                srcSet={previewUrl ? undefined : currentProject.image_srcset || undefined}
+                                sizes="(min-width: 768px) 50vw, 100vw"
                                 className="w-full h-full object-cover" 
                                 alt="Preview" 
                               />
@@ -578,6 +582,8 @@ const ProjectDetailsPage = () => {
                       <div className="w-full md:w-48 aspect-video rounded-xl overflow-hidden border border-white/5">
                         <img 
                           src={currentProject.image_path.startsWith('http') || currentProject.image_path.startsWith('/') ? currentProject.image_path : `/api/purchases/images/${currentProject.image_path}`} 
+                          srcSet={currentProject.image_srcset || undefined}
+                          sizes="(min-width: 768px) 12rem, 100vw"
                           className="w-full h-full object-cover" 
                           alt={currentProject.name}
                         />
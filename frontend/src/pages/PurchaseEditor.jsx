@@ -519,9 +519,9 @@ const PurchaseEditor = () => {
               <div
                 key={i}
                 className="w-10 h-10 rounded-lg overflow-hidden flex-shrink-0 border border-white/10 cursor-pointer"
-                onClick={() => setViewImage(img.url)}
+                onClick={() => setViewImage(img)}
               >
-                <img src={img.url} className="w-full h-full object-cover" />
+                <img src={img.thumbnail_url || img.url} className="w-full h-full object-cover" />
               </div>
             ))}
           </div>
@@ -637,7 +637,7 @@ const PurchaseEditor = () => {
       {/* Image Viewer Modal */}
       {viewImage && (
         <div className="fixed inset-0 z-[70] flex items-center justify-center bg-black/95 p-4" onClick={() => setViewImage(null)}>
-          <img src={viewImage} className="max-w-full max-h-full object-contain" />
+          <img src={viewImage.url} srcSet={viewImage.srcset ? `${viewImage.srcset}, ${viewImage.url} 4096w` : undefined} sizes="100vw" className="max-w-full max-h-full object-contain" />
           <button className="absolute top-4 right-4 text-white p-2 bg-white/10 rounded-full"><X /></button>
         </div>
       )}
@@ -94,6 +94,9 @@ const PurchaseList = () => {
                     <div className="min-w-0 flex-1">
                       <h3 className="font-bold text-sm text-white truncate group-hover:text-primary transition">
                         {p.purchase_name}
+                        {p.is_draft && (
+                          <span className="ml-2 px-1.5 py-0.5 rounded bg-primary/20 text-primary text-[9px] font-bold uppercase align-middle">Draft</span>
+                        )}
                       </h3>
                       <div className="flex items-center gap-2 text-[10px] text-secondary mt-0.5">
                         <span className="flex items-center gap-0.5">
@@ -3,7 +3,7 @@ import { useNavigate, useLocation } from 'react-router-dom';
 import { Upload, X, RotateCw, Crop, Loader2, Check, RotateCcw } from 'lucide-react';
 import Cropper from 'react-cropper';
 import 'cropperjs/dist/cropper.css';
-import api from '../api/axios';
+import api, { renewSession } from '../api/axios';
 
 const ImageEditorModal = ({ image, onSave, onCancel }) => {
   const [cropper, setCropper] = useState(null);
@@ -112,11 +112,63 @@ const ImageEditorModal = ({ image, onSave, onCancel }) => {
   );
 };
 
+// POSTs the images to the streaming OCR endpoint and calls onItem for every item event.
+// Resolves with { items, failed_images } once the server sends 'done'. An expired access
+// token is renewed like in the axios interceptor and the upload sent once more.
+const postStream = (formData) => {
+  const token = localStorage.getItem('token');
+  return fetch(`${api.defaults.baseURL}/ocr/upload/stream`, {
+    method: 'POST',
+    headers: token ? { Authorization: `Bearer ${token}` } : {},
+    body: formData
+  });
+};
+
+const streamScan = async (formData, onItem) => {
+  const usedToken = localStorage.getItem('token');
+  let response = await postStream(formData);
+  if (response.status === 401 && await renewSession(usedToken ? `Bearer ${usedToken}` : undefined)) {
+    response = await postStream(formData);
+  }
+  if (!response.ok || !response.body) {
+    throw new Error(`OCR stream failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  const items = [];
+  let buffer = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line: "event: <name>\ndata: <json>"
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      const event = rawEvent.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(rawEvent.match(/^data: (.*)$/m)?.[1] || '{}');
+      if (event === 'item') {
+        items.push(data);
+        onItem(data);
+      } else if (event === 'done') {
+        return { items, failed_images: data.failed_images };
+      } else if (event === 'error') {
+        throw new Error(data.detail || 'OCR failed');
+      }
+    }
+  }
+  throw new Error('OCR stream ended unexpectedly');
+};
+
 const ScanReceiptPage = () => {
   const [images, setImages] = useState([]);
   const [isScanning, setIsScanning] = useState(false);
   const [error, setError] = useState(null);
   const [editingImage, setEditingImage] = useState(null);
+  const [streamedItems, setStreamedItems] = useState([]);
   const navigate = useNavigate();
   const location = useLocation();
 
@@ -181,6 +233,7 @@ const ScanReceiptPage = () => {
 
     setIsScanning(true);
     setError(null);
+    setStreamedItems([]);
 
     try {
       const formData = new FormData();
@@ -188,11 +241,13 @@ const ScanReceiptPage = () => {
         formData.append('files', img.file);
       });
 
-      const response = await api.post('/ocr/upload', formData, {
-        headers: { 'Content-Type': 'multipart/form-data' }
-      });
+      // Items are streamed (Server-Sent Events) while the receipt is being read
+      const result = await streamScan(formData, item => setStreamedItems(prev => [...prev, item]));
 
-      console.log("DEBUG: Scan response data:", response.data);
+      console.log("DEBUG: Scan result:", result);
+      if (result.failed_images?.length) {
+        alert(`Image(s) ${result.failed_images.map(i => i + 1).join(', ')} could not be read. Please check the extracted items.`);
+      }
       
       // Store the image blobs/urls for later use in PurchaseEditor
       const receiptImages = images.map(img => ({
@@ -206,7 +261,7 @@ const ScanReceiptPage = () => {
 
       navigate('/create-purchase', { 
         state: { 
-          extractedData: response.data,
+          extractedData: { items: result.items },
           receiptImages: receiptImages,
           project_id: projectId
         } 
@@ -316,13 +371,24 @@ const ScanReceiptPage = () => {
               {isScanning ? (
                 <>
                   <Loader2 className="animate-spin" size={16} />
-                  <span>Processing...</span>
+                  <span>{streamedItems.length ? `Processing... (${streamedItems.length} items)` : 'Processing...'}</span>
                 </>
               ) : (
                 <span>Scan Receipt</span>
               )}
             </button>
           </div>
+
+          {isScanning && streamedItems.length > 0 && (
+            <ul className="mt-3 space-y-1">
+              {streamedItems.map((item, index) => (
+                <li key={index} className="flex justify-between text-xs text-white bg-surface px-3 py-1.5 rounded-lg border border-white/5">
+                  <span>{item.friendly_name || item.extracted_name}</span>
+                  <span>{item.quantity > 1 ? `${item.quantity} x ` : ''}{Number(item.price).toFixed(2)}</span>
+                </li>
+              ))}
+            </ul>
+          )}
         </div>
       )}
 
@@ -19,7 +19,7 @@ import useAuthStore from '../store/authStore';
 import api from '../api/axios';
 
 const SettingsPage = () => {
-  const { user, logout, checkAuth } = useAuthStore();
+  const { user, checkAuth } = useAuthStore();
   const [loading, setLoading] = useState(false);
   const [nameLoading, setNameLoading] = useState(false);
   const [taxLoading, setTaxLoading] = useState(false);
@@ -96,11 +96,8 @@ const SettingsPage = () => {
 
     try {
       await api.post('/auth/update-name', { new_name: newName });
-      setNameSuccess('Username updated successfully! Redirecting to login...');
-      setTimeout(() => {
-        logout();
-        window.location.href = '/login';
-      }, 2000);
+      setNameSuccess('Username updated successfully!');
+      await checkAuth(); // Tokens stay valid after a rename; refresh user data in store
     } catch (err) {
       setNameError(err.response?.data?.detail || 'Failed to update username');
     } finally {
@@ -117,10 +114,14 @@ const SettingsPage = () => {
     setSuccess('');
 
     try {
-      await api.post('/auth/change-password', {
+      const response = await api.post('/auth/change-password', {
         current_password: formData.current_password,
         new_password: formData.new_password
       });
+      // The change revokes existing tokens; continue with the one issued for the new password
+      localStorage.setItem('token', response.data.access_token);
+      localStorage.setItem('refresh_token', response.data.refresh_token);
+      useAuthStore.setState({ token: response.data.access_token });
       setSuccess('Password changed successfully!');
       setFormData({ current_password: '', new_password: '', confirm_password: '' });
     } catch (err) {
@@ -1,5 +1,5 @@
 import { create } from 'zustand';
-import api from '../api/axios';
+import api, { setSessionExpiredHandler } from '../api/axios';
 
 const useAuthStore = create((set) => ({
   user: null,
@@ -23,9 +23,10 @@ const useAuthStore = create((set) => ({
         }
       });
       console.log('Login response:', response.data);
-      const { access_token } = response.data;
+      const { access_token, refresh_token } = response.data;
 
       localStorage.setItem('token', access_token);
+      localStorage.setItem('refresh_token', refresh_token);
       
       // Fetch user info after login
       console.log('Fetching user info...');
@@ -50,7 +51,13 @@ const useAuthStore = create((set) => ({
   },
 
   logout: () => {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (refreshToken) {
+      // Revoke the session server-side; logging out locally does not wait for it
+      api.post('/auth/logout', { refresh_token: refreshToken }).catch(() => {});
+    }
     localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
     set({
       user: null,
       token: null,
@@ -73,6 +80,7 @@ const useAuthStore = create((set) => ({
       });
     } catch (err) {
       localStorage.removeItem('token');
+      localStorage.removeItem('refresh_token');
       set({
         token: null,
         user: null,
@@ -82,4 +90,9 @@ const useAuthStore = create((set) => ({
   }
 }));
 
+// The refresh token was rejected (expired, revoked or password changed elsewhere)
+setSessionExpiredHandler(() => {
+  useAuthStore.setState({ user: null, token: null, isAuthenticated: false });
+});
+
 export default useAuthStore;
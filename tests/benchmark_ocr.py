@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+import httpx
+
+# Drives POST /api/ocr/upload (+ job polling) with the fixture receipts at rising
+# concurrency and reports throughput, p50/p99 latency and server memory per request.
+# Run the backend against tests/mock_vision_server.py to avoid real model calls.
+
+FIXTURES = ["tests/fixtures/test_receipt.png", "tests/fixtures/test_receipt2.png"]
+
+def _rss_kb(pid: int) -> int:
+    """Resident set size of a process in KB (Linux /proc)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(percent / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+async def _scan(client: httpx.AsyncClient, images, unique: bool, poll_interval: float) -> float:
+    """One upload + polling until the job is finished; returns the latency in seconds."""
+    files = []
+    for name, content in images:
+        if unique:
+            # Bytes after the PNG end chunk are ignored by decoders but defeat the OCR result cache
+            content = content + uuid.uuid4().bytes
+        files.append(("files", (os.path.basename(name), content, "image/png")))
+
+    started = time.perf_counter()
+    response = await client.post("/api/ocr/upload", files=files)
+    response.raise_for_status()
+    job = response.json()
+    while job["status"] in ("queued", "processing"):
+        await asyncio.sleep(poll_interval)
+        response = await client.get(f"/api/ocr/jobs/{job['job_id']}")
+        response.raise_for_status()
+        job = response.json()
+    if job["status"] != "done":
+        raise Exception(job.get("error") or "OCR job failed")
+    return time.perf_counter() - started
+
+async def _run_level(client, images, concurrency: int, requests: int, args) -> dict:
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            try:
+                latencies.append(await _scan(client, images, not args.allow_cache, args.poll_interval))
+            except Exception as e:
+                errors += 1
+                print(f"  request failed: {e}")
+
+    baseline_rss = _rss_kb(args.server_pid) if args.server_pid else 0
+    peak_rss = baseline_rss
+    started = time.perf_counter()
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    while not all(task.done() for task in workers):
+        if args.server_pid:
+            peak_rss = max(peak_rss, _rss_kb(args.server_pid))
+        await asyncio.sleep(0.1)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": _percentile(latencies, 50) if latencies else 0.0,
+        "p99": _percentile(latencies, 99) if latencies else 0.0,
+        "mean": statistics.mean(latencies) if latencies else 0.0,
+        # Growth of the server's RSS while this level ran, per concurrent request
+        "rss_kb_per_request": (peak_rss - baseline_rss) / concurrency if args.server_pid else None
+    }
+
+async def main_async(args):
+    images = []
+    for name in args.images:
+        with open(name, "rb") as f:
+            images.append((name, f.read()))
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        token = await client.post("/api/auth/token", data={"username": args.username, "password": args.password})
+        token.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {token.json()['access_token']}"
+
+        print(f"Benchmarking {args.base_url}/api/ocr/upload with {len(images)} image(s) per scan")
+        print(f"{'conc':>5} {'reqs':>5} {'errs':>5} {'scans/s':>8} {'p50 s':>7} {'p99 s':>7} {'mean s':>7} {'KB/req':>8}")
+        for concurrency in args.concurrency:
+            result = await _run_level(client, images, concurrency, max(concurrency, args.requests_per_level), args)
+            memory = f"{result['rss_kb_per_request']:8.0f}" if result["rss_kb_per_request"] is not None else f"{'-':>8}"
+            print(f"{result['concurrency']:>5} {result['requests']:>5} {result['errors']:>5} {result['throughput']:>8.2f} "
+                  f"{result['p50']:>7.2f} {result['p99']:>7.2f} {result['mean']:>7.2f} {memory}")
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR upload throughput benchmark.")
+    parser.add_argument("--base-url", type=str, default="http://localhost:8002")
+    parser.add_argument("--username", type=str, required=True)
+    parser.add_argument("--password", type=str, required=True)
+    parser.add_argument("--images", nargs="+", default=FIXTURES, help="Receipt images sent with every scan")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests-per-level", type=int, default=20)
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--server-pid", type=int, default=None, help="Backend PID, to report its memory growth")
+    parser.add_argument("--allow-cache", action="store_true", help="Send identical images, so repeat scans hit the OCR result cache")
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
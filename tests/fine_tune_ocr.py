@@ -1,21 +1,30 @@
 import cv2
+import numpy as np
 import os
 import argparse
+import asyncio
 import json
+import mimetypes
 import sys
 
 # Ensure backend is in the path
 sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "backend"))
 
-from backend.services.ocr_service import preprocess_image, extract_information, analyze_information
+from backend.services.image_preprocessing import preprocess_image
+from backend.services import ocr_service
 
 def main():
-    parser = argparse.ArgumentParser(description="Fine-tune OCR thresholds and verify Mistral extraction.")
+    parser = argparse.ArgumentParser(description="Fine-tune receipt preprocessing and verify Vision AI extraction.")
     parser.add_argument("--image", type=str, default="tests/fixtures/test_receipt2.png", help="Path to the test receipt image.")
-    parser.add_argument("--t1", type=int, default=100, help="Threshold 1 (Binary Thresholding)")
-    parser.add_argument("--t2", type=int, default=200, help="Threshold 2 (Contour Area Thresholding)")
-    parser.add_argument("--output", type=str, default="tests/outputs/filtered_image.png", help="Path to save the filtered image.")
-    parser.add_argument("--no-mistral", action="store_true", help="Skip Mistral extraction step.")
+    parser.add_argument("--t1", type=int, default=100, help="Threshold 1 (Canny edge detection, receipt crop)")
+    parser.add_argument("--t2", type=int, default=200, help="Threshold 2 (Canny edge detection, receipt crop)")
+    parser.add_argument("--max-edge", type=int, default=1600, help="Longest edge after downscaling")
+    parser.add_argument("--format", type=str, default="jpeg", choices=["jpeg", "webp"])
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--no-crop", action="store_true", help="Do not crop to the receipt outline.")
+    parser.add_argument("--output", type=str, default="tests/outputs/filtered_image.jpg", help="Path to save the preprocessed image.")
+    parser.add_argument("--no-mistral", action="store_true", help="Skip Vision AI extraction step.")
 
     args = parser.parse_args()
 
@@ -30,36 +39,50 @@ def main():
     print(f"Output: {args.output}")
     print("-----------------------")
 
-    # Load image
-    image = cv2.imread(args.image)
-    if image is None:
+    with open(args.image, "rb") as f:
+        original = f.read()
+    if cv2.imdecode(np.frombuffer(original, np.uint8), cv2.IMREAD_COLOR) is None:
         print("Error: Could not decode image.")
         return
 
-    # 1. Preprocess
+    # 1. Preprocess (the same step the OCR workers run before calling the Vision AI)
     print("Preprocessing image...")
-    filtered = preprocess_image(image, args.t1, args.t2, save_path=args.output)
-    print(f"Filtered image saved to {args.output}")
+    options = {
+        "threshold1": args.t1,
+        "threshold2": args.t2,
+        "max_edge": args.max_edge,
+        "format": args.format,
+        "quality": args.quality,
+        "crop": not args.no_crop
+    }
+    content, mime = preprocess_image(original, options)
+    if not mime:
+        print("Preprocessing would not shrink the image; the original is sent.")
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "wb") as f:
+        f.write(content)
+    print(f"Preprocessed image saved to {args.output} ({len(original) / 1024:.0f} KB -> {len(content) / 1024:.0f} KB)")
 
-    # 2. OCR
-    print("Extracting text (Tesseract)...")
-    raw_text = extract_information(filtered)
-    print("\n=== RAW OCR TEXT ===")
-    print(raw_text if raw_text.strip() else "[No text extracted]")
-    print("====================\n")
-
-    # 3. Mistral
+    # 2. Vision AI (MISTRAL_BASE_URL may point at tests/mock_vision_server.py)
     if not args.no_mistral:
         if "MISTRAL_API_KEY" not in os.environ:
-            print("Warning: MISTRAL_API_KEY not set. Skipping Mistral extraction.")
-        elif not raw_text.strip():
-            print("Skipping Mistral extraction because no text was found.")
+            print("Warning: MISTRAL_API_KEY not set. Skipping Vision AI extraction.")
         else:
-            print("Analyzing text with Mistral AI...")
-            structured_data = analyze_information(raw_text)
-            print("\n=== MISTRAL STRUCTURED DATA ===")
-            print(json.dumps(structured_data, indent=2))
-            print("===============================\n")
+            print("Analyzing image with the Vision AI...")
+            stats = {}
+            mime = mimetypes.guess_type(args.image)[0] or "image/jpeg"
+
+            async def extract():
+                try:
+                    return await ocr_service.process_receipt_images([(original, mime)], stats)
+                finally:
+                    await ocr_service.close_client()
+
+            items = asyncio.run(extract())
+            print("\n=== EXTRACTED ITEMS ===")
+            print(json.dumps(items, indent=2))
+            print(json.dumps(stats, indent=2))
+            print("=======================\n")
 
 if __name__ == "__main__":
     main()
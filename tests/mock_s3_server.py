@@ -0,0 +1,268 @@
+import argparse
+import hashlib
+import hmac
+import re
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, quote, unquote, urlsplit
+
+# In-memory stand-in for an S3-compatible object store (MinIO style, path-style URLs), for
+# tests and local runs of the "s3" storage provider without a real object store. Supports
+# PUT/GET/HEAD/DELETE, server-side copy, multipart uploads and ListObjectsV2, and checks
+# Signature V4 (headers and presigned URLs) against --access-key/--secret-key. Point the
+# backend at it with storage.provider: 's3' and storage.s3.endpoint_url.
+
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+class Store:
+    lock = threading.Lock()
+    objects = {}  # (bucket, key) -> (content, content_type, modified)
+    uploads = {}  # upload_id -> {"bucket", "key", "content_type", "parts": {number: content}}
+    requests = 0
+    completed_multipart = 0
+
+def _xml(root: str, fields) -> bytes:
+    body = "".join(f"<{name}>{value}</{name}>" for name, value in fields)
+    return (f'<?xml version="1.0" encoding="UTF-8"?>'
+            f'<{root} xmlns="http://s3.amazonaws.com/doc/2006-03-01/">{body}</{root}>').encode("utf-8")
+
+def _escape(value: str) -> str:
+    return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def _sign(secret_key: str, amz_date: str, region: str, canonical_request: str) -> str:
+    key = f"AWS4{secret_key}".encode("utf-8")
+    for part in (amz_date[:8], region, "s3", "aws4_request"):
+        key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+    scope = f"{amz_date[:8]}/{region}/s3/aws4_request"
+    string_to_sign = f"AWS4-HMAC-SHA256\n{amz_date}\n{scope}\n" + hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+    return hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+def _make_handler(args):
+    class MockS3Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        # --- Helpers ---
+
+        def _send(self, status, body=b"", headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def _error(self, status, code, message=""):
+            self._send(status, _xml("Error", [("Code", code), ("Message", _escape(message))]), {"Content-Type": "application/xml"})
+
+        def _canonical_request(self, path, query, signed_headers, payload_hash):
+            canonical_query = "&".join(
+                f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(query) if k != "X-Amz-Signature"
+            )
+            headers = "".join(f"{name}:{(self.headers.get(name) or '').strip()}\n" for name in signed_headers)
+            return "\n".join([self.command, path, canonical_query, headers, ";".join(signed_headers), payload_hash])
+
+        def _authorized(self, path, query) -> bool:
+            params = dict(query)
+            if "X-Amz-Signature" in params:
+                credential = params.get("X-Amz-Credential", "").split("/")
+                amz_date = params.get("X-Amz-Date", "")
+                signed_at = datetime.strptime(amz_date, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+                if time.time() > signed_at.timestamp() + int(params.get("X-Amz-Expires", "0")):
+                    return False
+                signed_headers = params.get("X-Amz-SignedHeaders", "").split(";")
+                signature = params["X-Amz-Signature"]
+                payload_hash = "UNSIGNED-PAYLOAD"
+            else:
+                match = re.match(r"AWS4-HMAC-SHA256 Credential=([^,]+), SignedHeaders=([^,]+), Signature=(\w+)",
+                                 self.headers.get("Authorization", ""))
+                if not match:
+                    return False
+                credential = match.group(1).split("/")
+                signed_headers = match.group(2).split(";")
+                signature = match.group(3)
+                amz_date = self.headers.get("x-amz-date", "")
+                payload_hash = self.headers.get("x-amz-content-sha256", "")
+            if len(credential) != 5 or credential[0] != args.access_key:
+                return False
+            canonical_request = self._canonical_request(path, query, signed_headers, payload_hash)
+            return hmac.compare_digest(_sign(args.secret_key, amz_date, credential[2], canonical_request), signature)
+
+        def _parse(self):
+            """(bucket, key, query) of the request, or None after answering an error."""
+            with Store.lock:
+                Store.requests += 1
+            url = urlsplit(self.path)
+            query = parse_qsl(url.query, keep_blank_values=True)
+            if not self._authorized(url.path, query):
+                self._read_body()
+                self._error(403, "SignatureDoesNotMatch", "The request signature does not match")
+                return None
+            bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+            return bucket, key, dict(query)
+
+        def _read_body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        # --- Verbs ---
+
+        def do_PUT(self):
+            parsed = self._parse()
+            if parsed is None:
+                return
+            bucket, key, query = parsed
+            body = self._read_body()
+            if "uploadId" in query:
+                with Store.lock:
+                    upload = Store.uploads.get(query["uploadId"])
+                    if upload is None:
+                        return self._error(404, "NoSuchUpload")
+                    upload["parts"][int(query["partNumber"])] = body
+                return self._send(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+            if self.headers.get("x-amz-copy-source"):
+                source_bucket, _, source_key = unquote(self.headers["x-amz-copy-source"]).lstrip("/").partition("/")
+                with Store.lock:
+                    source = Store.objects.get((source_bucket, source_key))
+                    if source is None:
+                        # Like S3: a 200 whose body is an error
+                        return self._send(200, _xml("Error", [("Code", "NoSuchKey"), ("Message", source_key)]))
+                    Store.objects[(bucket, key)] = (source[0], source[1], time.time())
+                return self._send(200, _xml("CopyObjectResult", [("ETag", f'"{hashlib.md5(source[0]).hexdigest()}"')]))
+            with Store.lock:
+                Store.objects[(bucket, key)] = (body, self.headers.get("Content-Type") or "binary/octet-stream", time.time())
+            self._send(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+        def do_POST(self):
+            parsed = self._parse()
+            if parsed is None:
+                return
+            bucket, key, query = parsed
+            body = self._read_body()
+            if "uploads" in query:
+                upload_id = uuid.uuid4().hex
+                with Store.lock:
+                    Store.uploads[upload_id] = {"bucket": bucket, "key": key, "parts": {},
+                                                "content_type": self.headers.get("Content-Type") or "binary/octet-stream"}
+                return self._send(200, _xml("InitiateMultipartUploadResult",
+                                            [("Bucket", bucket), ("Key", _escape(key)), ("UploadId", upload_id)]))
+            if "uploadId" in query:
+                numbers = [int(part.findtext("PartNumber")) for part in ET.fromstring(body).iter("Part")]
+                with Store.lock:
+                    upload = Store.uploads.get(query["uploadId"])
+                    if upload is None:
+                        return self._error(404, "NoSuchUpload")
+                    parts = [upload["parts"].get(number) for number in numbers]
+                    if any(part is None for part in parts):
+                        return self._error(400, "InvalidPart")
+                    if any(len(part) < MIN_PART_SIZE for part in parts[:-1]):
+                        return self._error(400, "EntityTooSmall", "Parts except the last must be at least 5 MB")
+                    Store.objects[(bucket, key)] = (b"".join(parts), upload["content_type"], time.time())
+                    del Store.uploads[query["uploadId"]]
+                    Store.completed_multipart += 1
+                return self._send(200, _xml("CompleteMultipartUploadResult", [("Bucket", bucket), ("Key", _escape(key))]))
+            self._error(400, "InvalidRequest")
+
+        def do_GET(self):
+            if self.path == "/stats":
+                with Store.lock:
+                    body = (f'{{"requests": {Store.requests}, "objects": {len(Store.objects)}, '
+                            f'"pending_uploads": {len(Store.uploads)}, "completed_multipart": {Store.completed_multipart}}}')
+                return self._send(200, body.encode("utf-8"), {"Content-Type": "application/json"})
+            parsed = self._parse()
+            if parsed is None:
+                return
+            bucket, key, query = parsed
+            if not key:
+                return self._list(bucket, query)
+            with Store.lock:
+                stored = Store.objects.get((bucket, key))
+            if stored is None:
+                return self._error(404, "NoSuchKey", key)
+            self._send(200, stored[0], {"Content-Type": stored[1], "ETag": f'"{hashlib.md5(stored[0]).hexdigest()}"'})
+
+        def do_HEAD(self):
+            parsed = self._parse()
+            if parsed is None:
+                return
+            bucket, key, _ = parsed
+            with Store.lock:
+                stored = Store.objects.get((bucket, key))
+            if stored is None:
+                return self._send(404)
+            self.send_response(200)
+            self.send_header("Content-Type", stored[1])
+            self.send_header("Content-Length", str(len(stored[0])))
+            self.end_headers()
+
+        def do_DELETE(self):
+            parsed = self._parse()
+            if parsed is None:
+                return
+            bucket, key, query = parsed
+            with Store.lock:
+                if "uploadId" in query:
+                    Store.uploads.pop(query["uploadId"], None)
+                else:
+                    Store.objects.pop((bucket, key), None)
+            self._send(204)
+
+        def _list(self, bucket, query):
+            prefix = query.get("prefix", "")
+            max_keys = int(query.get("max-keys", args.max_keys))
+            start = int(query.get("continuation-token") or 0)
+            with Store.lock:
+                keys = sorted((key, stored[2], len(stored[0])) for (b, key), stored in Store.objects.items()
+                              if b == bucket and key.startswith(prefix))
+            page = keys[start:start + max_keys]
+            truncated = start + max_keys < len(keys)
+            fields = [("Name", bucket), ("Prefix", _escape(prefix)), ("KeyCount", len(page)),
+                      ("IsTruncated", "true" if truncated else "false")]
+            if truncated:
+                fields.append(("NextContinuationToken", start + max_keys))
+            contents = "".join(
+                f"<Contents><Key>{_escape(key)}</Key><Size>{size}</Size><LastModified>"
+                f"{datetime.fromtimestamp(modified, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')}</LastModified></Contents>"
+                for key, modified, size in page
+            )
+            body = _xml("ListBucketResult", fields).replace(b"</ListBucketResult>", contents.encode("utf-8") + b"</ListBucketResult>")
+            self._send(200, body, {"Content-Type": "application/xml"})
+
+        def log_message(self, *log_args):
+            if args.verbose:
+                super().log_message(*log_args)
+
+    return MockS3Handler
+
+def make_server(host="127.0.0.1", port=0, access_key="mock-access", secret_key="mock-secret", max_keys=1000, verbose=False):
+    """A ThreadingHTTPServer (not started) serving the mock; port 0 picks a free port."""
+    args = argparse.Namespace(access_key=access_key, secret_key=secret_key, max_keys=max_keys, verbose=verbose)
+    server = ThreadingHTTPServer((host, port), _make_handler(args))
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local in-memory mock of an S3-compatible object store.")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--access-key", type=str, default="mock-access")
+    parser.add_argument("--secret-key", type=str, default="mock-secret")
+    parser.add_argument("--max-keys", type=int, default=1000, help="Objects per ListObjectsV2 page")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.access_key, args.secret_key, args.max_keys, args.verbose)
+    print(f"Mock S3 listening on http://{args.host}:{args.port} (access key {args.access_key})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {Store.requests} requests; {len(Store.objects)} objects stored")
+
+if __name__ == "__main__":
+    main()
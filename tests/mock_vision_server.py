@@ -0,0 +1,165 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stand-in for the Mistral chat-completions API, for load tests of the OCR path without
+# the real model. Point the backend at it with MISTRAL_BASE_URL=http://localhost:<port>
+# (and any non-empty MISTRAL_API_KEY).
+
+SAMPLE_ITEMS = [
+    {"extracted_name": "Milk Frsh Alpine", "quantity": 1, "price": 1.49, "total_price": 1.49, "discount": 0},
+    {"extracted_name": "Bnna Org", "quantity": 2, "price": 0.35, "total_price": 0.70, "discount": 0},
+    {"extracted_name": "Sourdough Brd", "quantity": 1, "price": 3.20, "total_price": 3.20, "discount": 0.5},
+    {"extracted_name": "Cheddr Mature 200g", "quantity": 1, "price": 2.99, "total_price": 2.99, "discount": 0},
+]
+
+class Stats:
+    lock = threading.Lock()
+    requests = 0
+    errors = 0
+    hangs = 0
+    images = 0
+
+def _make_handler(args):
+    rng = random.Random(args.seed)
+
+    class MockVisionHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                with Stats.lock:
+                    self._send_json(200, {"requests": Stats.requests, "errors": Stats.errors, "hangs": Stats.hangs, "images": Stats.images})
+            else:
+                self._send_json(404, {"detail": "Not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length))
+                content = body["messages"][0]["content"]
+                images = sum(1 for part in content if part.get("type") == "image_url")
+            except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                self._send_json(422, {"detail": "Invalid chat completion request"})
+                return
+
+            if self.path != "/v1/chat/completions":
+                self._send_json(404, {"detail": "Not found"})
+                return
+
+            with Stats.lock:
+                Stats.requests += 1
+                Stats.images += images
+                roll = rng.random()
+                latency = max(0.0, args.latency_ms + rng.uniform(-args.jitter_ms, args.jitter_ms)) / 1000
+
+            if roll < args.hang_rate:
+                # Never answers in time; exercises the client's read timeout
+                with Stats.lock:
+                    Stats.hangs += 1
+                time.sleep(args.hang_seconds)
+                return
+            if not body.get("stream"):
+                time.sleep(latency)
+            if roll < args.hang_rate + args.error_rate:
+                with Stats.lock:
+                    Stats.errors += 1
+                self._send_json(args.error_status, {"object": "error", "message": "Injected error"})
+                return
+
+            items = [dict(item) for _ in range(max(1, images)) for item in SAMPLE_ITEMS[:args.items_per_image]]
+            usage = {"prompt_tokens": 1000 * images, "completion_tokens": 50 * len(items), "total_tokens": 1000 * images + 50 * len(items)}
+            if body.get("stream"):
+                self._stream(body, json.dumps({"items": items}), latency, usage)
+                return
+            self._send_json(200, {
+                "id": f"mock-{Stats.requests}",
+                "object": "chat.completion",
+                "model": body.get("model", "mock"),
+                "created": int(time.time()),
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": json.dumps({"items": items})}
+                }],
+                "usage": usage
+            })
+
+        def _stream(self, body, content, latency, usage):
+            """Server-sent chat.completion.chunk events, spread over the latency."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            pieces = [content[i:i + args.stream_chunk_chars] for i in range(0, len(content), args.stream_chunk_chars)]
+            for index, piece in enumerate(pieces):
+                time.sleep(latency / len(pieces))
+                chunk = {
+                    "id": f"mock-{Stats.requests}",
+                    "object": "chat.completion.chunk",
+                    "model": body.get("model", "mock"),
+                    "created": int(time.time()),
+                    "choices": [{
+                        "index": 0,
+                        "delta": {"role": "assistant", "content": piece} if index == 0 else {"content": piece},
+                        "finish_reason": "stop" if index == len(pieces) - 1 else None
+                    }]
+                }
+                if index == len(pieces) - 1:
+                    chunk["usage"] = usage
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+
+        def _write_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def log_message(self, *log_args):
+            if args.verbose:
+                super().log_message(*log_args)
+
+    return MockVisionHandler
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Mistral chat-completions API (Vision AI).")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=1500, help="Mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=500, help="Uniform +/- jitter on the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Share of requests that are not answered for --hang-seconds")
+    parser.add_argument("--hang-seconds", type=float, default=300)
+    parser.add_argument("--items-per-image", type=int, default=len(SAMPLE_ITEMS))
+    parser.add_argument("--stream-chunk-chars", type=int, default=24, help="Answer size per streamed event (stream=true requests)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), _make_handler(args))
+    server.daemon_threads = True
+    print(f"Mock Vision AI listening on http://{args.host}:{args.port} "
+          f"(latency {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, errors {args.error_rate:.0%}, hangs {args.hang_rate:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {Stats.requests} requests ({Stats.images} images, {Stats.errors} errors, {Stats.hangs} hangs)")
+
+if __name__ == "__main__":
+    main()